@@ -1,43 +1,40 @@
-import json
-import sqlite3
-
-import requests
-from PyQt6.QtCore import QDate, QSize, Qt, QPoint
-from PyQt6.QtGui import QFont
+from PyQt6.QtCore import QDate, QSize, Qt, QPoint, QEvent, QTimer
+from PyQt6.QtGui import QFont, QColor
 from PyQt6.QtWidgets import (QWidget, QCalendarWidget,
                              QLabel, QVBoxLayout, QDialog, QSpacerItem, QHBoxLayout,
-                             QListWidgetItem)
+                             QListWidgetItem, QTableView)
 from qfluentwidgets import (FluentIcon,
                             PushButton,
                             ListWidget, LineEdit, RoundMenu, Action)
 
-with open("resources/misc/config.json") as config_file:
-    _config = json.load(config_file)
-
-API_KEY = _config["api-key"]
-COUNTRY = _config['country']
+from ChangeBus import EVENT, SERIES, TODO, REMINDER, SPECIAL_DATE
+from Config import get_config
+from EventStore import get_store, SUMMARY_COLUMNS
+from Holidays import HolidayCache, fetch_timeout_seconds
+from Recurrence import SeriesCache
+from Workers import ChangeRelay, run_in_background
+
+# Heatmap: a day with BUSY_FULL_MINUTES of events gets the strongest shade
+BUSY_FULL_MINUTES = 8 * 60
+HEAT_COLOR = QColor(0, 120, 212)
+BADGE_COLORS = {
+    "open_todos": QColor("#f59f00"),
+    "reminders": QColor("#37b24d"),
+    "special_dates": QColor("#e64980"),
+}
+# The festival popup waits this much longer than the slowest holiday fetch
+# Http allows (timeouts, retries and backoff) before calling it unavailable
+FESTIVAL_TIMEOUT_MARGIN_MS = 1000
+
+# QCalendarWidget always shows six weeks, starting on or before the 1st
+VISIBLE_DAYS = 42
 
 
 class TodoDialog(QDialog):
     def __init__(self, date):
         super().__init__()
-        self.date = date.toString()
-
-        # Set up the database connection
-        self.conn = sqlite3.connect('resources/misc/todos.db')
-        self.cursor = self.conn.cursor()
-
-        # Create a table to store todos if not exists
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS todos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT,
-                time TEXT,
-                description TEXT,
-                status TEXT
-            )
-        ''')
-        self.conn.commit()
+        self.date = date.toString(Qt.DateFormat.ISODate)
+        self.store = get_store()
 
         # Set up the dialog layout
         self.setWindowTitle(f"Todo List for {self.date}")
@@ -65,8 +62,7 @@ class TodoDialog(QDialog):
         self.load_todos()
 
     def load_todos(self):
-        self.cursor.execute('SELECT id, time, description, status FROM todos WHERE date = ?', (self.date,))
-        todos = self.cursor.fetchall()
+        todos = self.store.todos_for_date(self.date)
         for todo_id, time, description, status in todos:
             self.add_item_to_list(todo_id, time, description, status)
 
@@ -92,8 +88,7 @@ class TodoDialog(QDialog):
                 print("Error: No todo_id found for the selected item.")
 
     def remove_todo_from_database(self, todo_id):
-        self.cursor.execute('DELETE FROM todos WHERE id = ?', (todo_id,))
-        self.conn.commit()
+        self.store.delete_todo(todo_id)
         print(f"Deleted todo with id: {todo_id} from database")
 
     def add_item(self):
@@ -149,15 +144,12 @@ class TodoDialog(QDialog):
         self.list_widget.addItem(item)
 
     def add_todo(self, date, time, description, status):
-        self.cursor.execute('INSERT INTO todos (date, time, description, status) VALUES (?, ?, ?, ?)',
-                            (date, time, description, status))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        return self.store.add_todo(date, time, description, status)
 
 
 class FestivalDialog(QDialog):
 
-    def __init__(self, date, festivals):
+    def __init__(self, date, festivals=None):
         super().__init__()
         self.initUI(date, festivals)
         self.setObjectName("Popup")
@@ -178,7 +170,7 @@ class FestivalDialog(QDialog):
         date_label.setFont(QFont("Arial", 14, QFont.Weight.Bold))
         vbox.addWidget(date_label, alignment=Qt.AlignmentFlag.AlignTop)
 
-        festival_label = QLabel("")
+        self.festival_label = festival_label = QLabel("")
         festival_label.setFont(QFont("Consolas", 11, QFont.Weight.Bold))
         festival_label.setWordWrap(True)
         festival_label.setOpenExternalLinks(True)
@@ -200,21 +192,29 @@ class FestivalDialog(QDialog):
         hbox.addWidget(mark_remainder_button, alignment=Qt.AlignmentFlag.AlignTop)
         vbox.addWidget(self.mark_special_button)
 
-        if festivals:
-            for festival in festivals:
-                text = f"<a href='#'>{festival['name']}</a> - {festival['description']}"
-                festival_label.setText(text)
+        # None: the lookup is still running and fills this in later
+        if festivals is None:
+            festival_label.setText("Loading holidays…")
         else:
-            festival_label = QLabel(
-                "No festivals found. This could be because you haven't entered Calendarific API Key and Country."
-                "You can enter it in Settings.", self)
-            festival_label.setWordWrap(True)
-            vbox.addWidget(festival_label)
+            self.set_festivals(festivals)
 
         self.setLayout(vbox)
         self.setWindowTitle((date.toString()))
         self.setGeometry(400, 400, 300, 150)
 
+    def set_festivals(self, festivals):
+        if festivals:
+            self.festival_label.setText("<br>".join(
+                f"<a href='#'>{festival['name']}</a> - {festival['description']}" for festival in festivals
+            ))
+        else:
+            self.festival_label.setText(
+                "No festivals found. This could be because you haven't entered Calendarific API Key and Country."
+                "You can enter it in Settings.")
+
+    def set_unavailable(self):
+        self.festival_label.setText("Holidays are unavailable right now. Check your internet connection.")
+
     def add_todo(self):
         dialog = TodoDialog(self.date)
         dialog.exec()
@@ -236,14 +236,8 @@ class FestivalDialog(QDialog):
 class ReminderDialog(QDialog):
     def __init__(self, date):
         super().__init__()
-        self.date = date.toString()
-
-        # Set up the database connection
-        self.conn = sqlite3.connect('resources/misc/reminders.db')
-        self.cursor = self.conn.cursor()
-
-        # Create a table to store reminders if not exists
-        self.create_reminders_table()
+        self.date = date.toString(Qt.DateFormat.ISODate)
+        self.store = get_store()
 
         # Set up the dialog layout
         self.setWindowTitle(f"Reminders for {self.date}")
@@ -271,20 +265,8 @@ class ReminderDialog(QDialog):
         self.list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.list_widget.customContextMenuRequested.connect(self.show_context_menu)
 
-    def create_reminders_table(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reminders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT,
-                time TEXT,
-                description TEXT
-            )
-        ''')
-        self.conn.commit()
-
     def load_reminders(self):
-        self.cursor.execute('SELECT id, time, description FROM reminders WHERE date = ?', (self.date,))
-        reminders = self.cursor.fetchall()
+        reminders = self.store.reminders_for_date(self.date)
         for reminder_id, time, description in reminders:
             self.add_reminder_to_list(reminder_id, time, description)
 
@@ -324,14 +306,12 @@ class ReminderDialog(QDialog):
         time = line_edit_time.text()
         description = line_edit_description.text()
         if time and description:
-            self.add_reminder_to_db(self.date, time, description)
-            self.add_reminder_to_list(None, time, description)  # None for ID as it's a new item
+            reminder_id = self.add_reminder_to_db(self.date, time, description)
+            self.add_reminder_to_list(reminder_id, time, description)
             self.list_widget.takeItem(self.list_widget.row(item))  # Remove the editable item
 
     def add_reminder_to_db(self, date, time, description):
-        self.cursor.execute('INSERT INTO reminders (date, time, description) VALUES (?, ?, ?)',
-                            (date, time, description))
-        self.conn.commit()
+        return self.store.add_reminder(date, time, description)
 
     def add_reminder_to_list(self, reminder_id, time, description):
         # Create a new list widget item with the provided details
@@ -361,21 +341,14 @@ class ReminderDialog(QDialog):
                 print("Error: No reminder_id found for the selected item.")
 
     def remove_reminder_from_database(self, reminder_id):
-        self.cursor.execute('DELETE FROM reminders WHERE id = ?', (reminder_id,))
-        self.conn.commit()
+        self.store.delete_reminder(reminder_id)
 
 
 class SpecialDateDialog(QDialog):
     def __init__(self, date):
         super().__init__()
-        self.date = date.toString()
-
-        # Set up the database connection
-        self.conn = sqlite3.connect('resources/misc/special_dates.db')
-        self.cursor = self.conn.cursor()
-
-        # Create a table to store special dates if not exists
-        self.create_special_dates_table()
+        self.date = date.toString(Qt.DateFormat.ISODate)
+        self.store = get_store()
 
         # Set up the dialog layout
         self.setWindowTitle(f"Special Date: {self.date}")
@@ -396,9 +369,8 @@ class SpecialDateDialog(QDialog):
         # Create the clear button
         self.clear_button = PushButton()
 
-        self.cursor.execute('SELECT reason FROM special_dates WHERE date = ?', (self.date,))
-        result = self.cursor.fetchone()
-        if result:
+        self.reason = self.store.special_date_reason(self.date)
+        if self.reason is not None:
             self.clear_button.setText("Unmark as Special")
             self.layout.addWidget(self.clear_button)
         else:
@@ -411,32 +383,18 @@ class SpecialDateDialog(QDialog):
         # Load existing special date if any
         self.load_special_date()
 
-    def create_special_dates_table(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS special_dates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT,
-                reason TEXT
-            )
-        ''')
-        self.conn.commit()
-
     def load_special_date(self):
-        self.cursor.execute('SELECT reason FROM special_dates WHERE date = ?', (self.date,))
-        result = self.cursor.fetchone()
-        if result:
-            self.reason_input.setText(result[0])
+        if self.reason:
+            self.reason_input.setText(self.reason)
 
     def save_special_date(self):
         reason = self.reason_input.text()
         if reason:
-            self.cursor.execute('REPLACE INTO special_dates (date, reason) VALUES (?, ?)', (self.date, reason))
-            self.conn.commit()
+            self.store.set_special_date(self.date, reason)
             self.close()
 
     def clear_special_date(self):
-        self.cursor.execute('DELETE FROM special_dates WHERE date = ?', (self.date,))
-        self.conn.commit()
+        self.store.clear_special_date(self.date)
         self.reason_input.clear()
 
 
@@ -446,39 +404,182 @@ class Calendar(QCalendarWidget):
         self.setGridVisible(True)
         self.clicked[QDate].connect(self.showDate)
         self.hovered_date = None
-
-    def event(self, event):
-        if event.type() == event.Type.MouseMove:
-            pos = event.pos()
-            date = self.dateAt(pos)
-            if date != self.hovered_date:
-                self.hovered_date = date
-                self.update()
-        return super().event(event)
+        config = get_config()
+        self.holidays = HolidayCache(config["api-key"], config["country"])
+        # a new key or country from the settings applies to the next lookup
+        self.config_relay = ChangeRelay(config, {"api-key", "country"}, self)
+        self.config_relay.changed.connect(
+            lambda changed: self.holidays.configure(config["api-key"], config["country"]))
+        self.festival_dialog = None
+        self.festival_lookup = 0    # bumped per click; older lookups' results are dropped
+        self.festival_timeout_ms = None
+
+        # Per-day summary of the visible page, {iso date: {column: value}}.
+        # Loaded with one range query per page; paintCell only reads it.
+        self.store = get_store()
+        self.series = SeriesCache(self.store)
+        self.page_summary = {}
+        self.page_first = None
+        self.currentPageChanged.connect(self.load_page)
+        self.load_page(self.yearShown(), self.monthShown())
+
+        self.change_relay = ChangeRelay(self.store.changes, {EVENT, SERIES, TODO, REMINDER, SPECIAL_DATE}, self)
+        self.change_relay.changed.connect(self.on_store_change, Qt.ConnectionType.QueuedConnection)
+
+        # Hover is tracked on the internal table view so only two cells repaint
+        self.table_view = self.findChild(QTableView, "qt_calendar_calendarview")
+        self.table_view.setMouseTracking(True)
+        self.table_view.viewport().setMouseTracking(True)
+        self.table_view.viewport().installEventFilter(self)
+
+    def first_visible_date(self, year, month):
+        first = QDate(year, month, 1)
+        offset = (first.dayOfWeek() - self.firstDayOfWeek().value) % 7
+        # a month starting in the first column is pushed down a row
+        return first.addDays(-(offset or 7))
+
+    def load_page(self, year, month):
+        self.page_first = self.first_visible_date(year, month)
+        last = self.page_first.addDays(VISIBLE_DAYS - 1)
+        # read without flushing: queued Day View edits are committed by their own
+        # timer, and their COMMIT change repaints the cells once they land
+        self.page_summary = self.store.summary_between(
+            self.page_first.toString(Qt.DateFormat.ISODate), last.toString(Qt.DateFormat.ISODate)
+        )
+        for offset in range(VISIBLE_DAYS):
+            self.add_occurrences(self.page_first.addDays(offset))
+        self.updateCells()
+
+    def add_occurrences(self, date):
+        """ recurring events are not in daily_summary, so add date's occurrences on top """
+        occurrences = self.series.day_occurrences(date.toJulianDay())
+        if not occurrences:
+            return
+        summary = self.page_summary.setdefault(date.toString(Qt.DateFormat.ISODate),
+                                               dict.fromkeys(SUMMARY_COLUMNS, 0))
+        summary["events"] += len(occurrences)
+        summary["busy_minutes"] += sum(ev.end - ev.start for ev in occurrences.values())
+
+    def on_store_change(self, change):
+        if change.kind == SERIES:
+            # a series can touch any number of days
+            self.series = SeriesCache(self.store)
+            self.load_page(self.yearShown(), self.monthShown())
+        elif change.date is None:
+            self.load_page(self.yearShown(), self.monthShown())
+        else:
+            # one date changed: re-read its summary row and repaint its cell
+            date = QDate.fromString(change.date, Qt.DateFormat.ISODate)
+            rect = self.cell_rect(date)
+            if rect is None:
+                return
+            self.page_summary[change.date] = dict(self.store.day_summary(change.date))
+            self.add_occurrences(date)
+            self.table_view.viewport().update(rect)
+
+    def cell_rect(self, date):
+        """ viewport rect of date's cell on the visible page, or None """
+        if date is None or self.page_first is None:
+            return None
+        offset = self.page_first.daysTo(date)
+        if not 0 <= offset < VISIBLE_DAYS:
+            return None
+        row = offset // 7 + (self.horizontalHeaderFormat() != QCalendarWidget.HorizontalHeaderFormat.NoHorizontalHeader)
+        column = offset % 7 + (self.verticalHeaderFormat() != QCalendarWidget.VerticalHeaderFormat.NoVerticalHeader)
+        model = self.table_view.model()
+        return self.table_view.visualRect(model.index(row, column))
+
+    def date_at(self, pos):
+        """ date under a viewport position, or None """
+        index = self.table_view.indexAt(pos)
+        if not index.isValid():
+            return None
+        row = index.row() - (self.horizontalHeaderFormat() != QCalendarWidget.HorizontalHeaderFormat.NoHorizontalHeader)
+        column = index.column() - (self.verticalHeaderFormat() != QCalendarWidget.VerticalHeaderFormat.NoVerticalHeader)
+        if row < 0 or column < 0:
+            return None
+        return self.page_first.addDays(row * 7 + column)
+
+    def eventFilter(self, obj, event):
+        if obj is self.table_view.viewport():
+            if event.type() == QEvent.Type.MouseMove:
+                self.set_hovered(self.date_at(event.position().toPoint()))
+            elif event.type() == QEvent.Type.Leave:
+                self.set_hovered(None)
+        return super().eventFilter(obj, event)
+
+    def set_hovered(self, date):
+        if date == self.hovered_date:
+            return
+        old, self.hovered_date = self.hovered_date, date
+        for d in (old, date):
+            rect = self.cell_rect(d)
+            if rect is not None:
+                self.table_view.viewport().update(rect)
 
     def paintCell(self, painter, rect, date):
         super().paintCell(painter, rect, date)
+        summary = self.page_summary.get(date.toString(Qt.DateFormat.ISODate))
+        painter.save()
+        if summary and summary["events"]:
+            level = min(summary["busy_minutes"] / BUSY_FULL_MINUTES, 1.0)
+            shade = QColor(HEAT_COLOR)
+            shade.setAlpha(int(25 + 110 * level))
+            painter.fillRect(rect, shade)
+        if summary:
+            # one dot per kind along the bottom edge
+            size = max(4, rect.height() // 8)
+            x = rect.left() + 3
+            y = rect.bottom() - size - 2
+            painter.setPen(Qt.PenStyle.NoPen)
+            for column, color in BADGE_COLORS.items():
+                if summary[column]:
+                    painter.setBrush(color)
+                    painter.drawEllipse(x, y, size, size)
+                    x += size + 2
         if date == self.hovered_date:
-            painter.fillRect(rect, Qt.GlobalColor.lightGray)
+            hover = QColor(Qt.GlobalColor.lightGray)
+            hover.setAlpha(120)
+            painter.fillRect(rect, hover)
+        painter.restore()
 
     def showDate(self, date):
+        # open straight away; the holiday lookup runs on the thread pool and fills the dialog in
+        self.festival_lookup += 1
+        lookup = self.festival_lookup
+        if self.festival_dialog is not None:
+            self.festival_dialog.close()
+        self.festival_dialog = dialog = FestivalDialog(date)
+        dialog.show()
+
         date_str = date.toString("yyyy-MM-dd")
-        festivals = self.getFestivals(date_str)
-        dialog = FestivalDialog(date, festivals)
-        dialog.exec()
+        run_in_background(
+            self.getFestivals, date_str,
+            on_done=lambda festivals: self.on_festivals(lookup, festivals),
+            # HolidaysUnavailable (nothing cached and the fetch failed) lands here too
+            on_error=lambda error: self.on_festivals(lookup, None),
+        )
+        if self.festival_timeout_ms is None:
+            # loads Http (and requests) on the first click rather than with the calendar
+            self.festival_timeout_ms = int(fetch_timeout_seconds() * 1000) + FESTIVAL_TIMEOUT_MARGIN_MS
+        QTimer.singleShot(self.festival_timeout_ms, lambda: self.on_festival_timeout(lookup))
+
+    def on_festival_timeout(self, lookup):
+        # a result that still arrives for this lookup (after a long Retry-After, say) replaces the message
+        if lookup == self.festival_lookup and self.festival_dialog is not None:
+            self.festival_dialog.set_unavailable()
+
+    def on_festivals(self, lookup, festivals):
+        """ result (None on failure) of one lookup; stale ones are ignored """
+        if lookup != self.festival_lookup or self.festival_dialog is None:
+            return
+        # first answer wins; the timeout only shows a message until it arrives
+        self.festival_lookup += 1
+        if festivals is None:
+            self.festival_dialog.set_unavailable()
+        else:
+            self.festival_dialog.set_festivals(festivals)
 
     def getFestivals(self, date):
-        url = f'https://calendarific.com/api/v2/holidays'
-        params = {
-            'api_key': API_KEY,
-            'country': COUNTRY,
-            'year': date.split('-')[0],
-            'month': date.split('-')[1],
-            'day': date.split('-')[2]
-        }
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            return data['response']['holidays']
-        else:
-            return []
+        # served from the per-year holiday cache; only a year's first lookup goes to the API
+        return self.holidays.holidays_on(date)
@@ -0,0 +1,59 @@
+import threading
+import traceback
+from typing import NamedTuple, Optional
+
+# Change.op values
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+RELOAD = "reload"   # many rows changed at once (a bulk import, say), or a queued write was dropped
+COMMIT = "commit"   # queued writes for the date reached the database (EventStore.flush)
+
+# Change.kind values
+EVENT = "event"
+SERIES = "series"
+TODO = "todo"
+REMINDER = "reminder"
+SPECIAL_DATE = "special_date"
+
+
+class Change(NamedTuple):
+    """ one write to the store; date is ISO "YYYY-MM-DD", or None when any date may be affected """
+    kind: str
+    date: Optional[str]
+    id: Optional[int]
+    op: str
+
+
+class ChangeBus:
+    """
+    Minimal in-process pub/sub. publish() calls subscribers on the publishing
+    thread; Qt views go through Workers.ChangeRelay to be called on the GUI thread.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, kinds=None):
+        """ call callback(change) for changes of the given kinds (all kinds if None); returns an unsubscribe function """
+        entry = (callback, frozenset(kinds) if kinds is not None else None)
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+    def publish(self, change):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, kinds in subscribers:
+            if kinds is None or change.kind in kinds:
+                try:
+                    callback(change)
+                except Exception:
+                    # a broken view must not fail the write that triggered it
+                    traceback.print_exc()
@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import threading
+import traceback
+
+CONFIG_PATH = "resources/misc/config.json"
+
+
+class Config:
+    """
+    config.json, parsed once on first access. update() writes the whole file
+    atomically (temp file + rename) and tells subscribers which keys changed,
+    so modules read values when they need them instead of at import time.
+    """
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self._values = None
+        self._subscribers = []
+        self._lock = threading.RLock()
+
+    def _load(self):
+        with self._lock:
+            if self._values is None:
+                with open(self.path, encoding="utf-8") as config_file:
+                    self._values = json.load(config_file)
+            return self._values
+
+    def get(self, key, default=None):
+        return self._load().get(key, default)
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def update(self, values):
+        """ store values, write the file and notify subscribers; returns {key: new value} of the keys that changed """
+        with self._lock:
+            current = self._load()
+            changed = {key: value for key, value in values.items() if current.get(key) != value}
+            if not changed:
+                return changed
+            merged = {**current, **changed}
+            self._write(merged)
+            self._values = merged
+            subscribers = list(self._subscribers)
+        for callback, keys in subscribers:
+            relevant = changed if keys is None else {k: v for k, v in changed.items() if k in keys}
+            if relevant:
+                try:
+                    callback(relevant)
+                except Exception:
+                    # a broken view must not fail saving the settings
+                    traceback.print_exc()
+        return changed
+
+    def set(self, key, value):
+        return self.update({key: value})
+
+    def subscribe(self, callback, keys=None):
+        """ call callback({key: new value}) when any of keys (all keys if None) changes; returns an unsubscribe function """
+        entry = (callback, frozenset(keys) if keys is not None else None)
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+    def _write(self, values):
+        # a crash mid-write leaves the old file in place rather than a truncated one
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix=".config-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+                json.dump(values, temp_file)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_config():
+    """ shared Config, loaded on first access """
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = Config()
+        return _config
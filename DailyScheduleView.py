@@ -1,18 +1,31 @@
-import sqlite3  # Use SQlite for database operations
+from EventStore import get_store, SEARCH_CHUNK
+from EventCache import EventCache, EventRecord, format_hhmm, format_color
+from FreeSlots import find_free_slots
+from Recurrence import SeriesCache, is_occurrence, split_occurrence_id
+from ICSImport import import_ics
+from Export import export
+from Workers import run_in_background, ChangeRelay
+from ChangeBus import Change, EVENT, SERIES, INSERT, UPDATE, DELETE, RELOAD, COMMIT
+import StartupProfile
 
 from PyQt6.QtWidgets import (QWidget, QLabel, QVBoxLayout, QScrollArea, QFrame, QHBoxLayout,
                             QSizePolicy, QPushButton, QDialog, QFormLayout, QLineEdit, 
                             QColorDialog, QDialogButtonBox, QCalendarWidget,
-                            QGraphicsTextItem, QGraphicsRectItem,QMenu,QInputDialog)
+                            QGraphicsTextItem, QGraphicsRectItem,QMenu,QInputDialog,
+                            QMessageBox, QFileDialog, QProgressDialog, QComboBox, QListWidget,
+                            QListWidgetItem)
 
-from PyQt6.QtCore import Qt, QDate, QPoint, QPropertyAnimation, QEasingCurve
+from PyQt6.QtCore import Qt, QDate, QTime, QPoint, QPropertyAnimation, QEasingCurve, QTimer, pyqtSignal
 
 from PyQt6.QtGui import (QColor, QTextCharFormat, QFont, QBrush, QPen, QPainter, 
                          )
 
 
+import logging
 import random
 
+log = logging.getLogger(__name__)
+
 # 柔和色板，卡片背景随机选色
 PALETTE = [
     QColor("#FFD2D2"),
@@ -22,6 +35,35 @@ PALETTE = [
     QColor("#F2D2FD"),
 ]
 
+# 事件按周加载：当前日期前后各 LOAD_RADIUS_WEEKS 周常驻内存，
+# 超过 EVICT_RADIUS_WEEKS 周的数据会被释放
+LOAD_RADIUS_WEEKS = 2
+EVICT_RADIUS_WEEKS = 8
+
+# 重复规则（RRULE），None 表示单次事件
+REPEAT_OPTIONS = [
+    ("Never", None),
+    ("Daily", "FREQ=DAILY"),
+    ("Every Weekday", "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR"),
+    ("Weekly", "FREQ=WEEKLY"),
+    ("Monthly", "FREQ=MONTHLY"),
+    ("Yearly", "FREQ=YEARLY"),
+]
+
+# 搜索框：停止输入 SEARCH_DELAY_MS 后才查询
+SEARCH_DELAY_MS = 150
+SEARCH_ICONS = {
+    "event": "🗓",
+    "series": "🔁",
+    "todo": "✅",
+    "reminder": "⏰",
+    "special_date": "⭐",
+}
+
+# 编辑先进内存并写入日志，最多延迟 FLUSH_DELAY_MS 后合并成一个事务提交
+FLUSH_DELAY_MS = 500
+
+
 class EventItem(QGraphicsRectItem):
     def __init__(self, event_data, pixels_per_minute):
         super().__init__()
@@ -59,13 +101,13 @@ class EventCard(QFrame):
         color:      QColor,
         scheduler_view,  # 新增：指向 DailyScheduleView 实例
         date,            # 新增：所属 QDate
-        idx: int,        # 新增：该事件在列表中的索引
+        event_id: int,   # 该事件在 events 表中的主键
         parent=None
     ):
         super().__init__(parent)
         self.scheduler_view = scheduler_view
         self.date            = date
-        self.idx             = idx
+        self.event_id        = event_id
 
         # 如果没有传 color，则随机指定一个
         if color is None:
@@ -115,15 +157,15 @@ class EventCard(QFrame):
             
             action = menu.exec(self.mapToGlobal(pos))
             if action == act_nav:
-                self.scheduler_view.navigate_event(self.date, self.idx)
+                self.scheduler_view.navigate_event(self.event_id)
             elif action == act_del:
-                self.scheduler_view.delete_event(self.date, self.idx)
+                self.scheduler_view.delete_event(self.event_id)
             elif action == act_place:
-                self.scheduler_view.edit_event_place(self.date, self.idx)
+                self.scheduler_view.edit_event_place(self.event_id)
             elif action == act_time:
-                self.scheduler_view.edit_event_time_color(self.date, self.idx)
+                self.scheduler_view.edit_event_time_color(self.event_id)
             elif action == act_name:
-                self.scheduler_view.edit_event_name(self.date, self.idx)
+                self.scheduler_view.edit_event_name(self.event_id)
 
 
 # 网格画布类
@@ -157,6 +199,9 @@ class AddEventDialog(QDialog):
         self.start_time_input = QLineEdit(); layout.addRow("Start Time (HH:MM):", self.start_time_input)
         self.end_time_input   = QLineEdit(); layout.addRow("End Time   (HH:MM):", self.end_time_input)
         self.color_btn        = QPushButton("Pick Color"); layout.addRow("Color:", self.color_btn)
+        self.repeat_combo     = QComboBox(); layout.addRow("Repeat:", self.repeat_combo)
+        for label, rrule in REPEAT_OPTIONS:
+            self.repeat_combo.addItem(label, rrule)
         self.color = QColor("#0078d4")
         self.color_btn.clicked.connect(self.pick_color)
 
@@ -178,40 +223,114 @@ class AddEventDialog(QDialog):
             eh, em = map(int, self.end_time_input.text().split(":"))
         except:
             return None
+        # 只接受当天内的时间，且结束晚于开始
+        if not (0 <= sh < 24 and 0 <= sm < 60 and 0 <= eh < 24 and 0 <= em < 60):
+            return None
+        if eh * 60 + em <= sh * 60 + sm:
+            return None
         return title, place, sh, sm, eh, em, self.color
 
+    def rrule(self):
+        return self.repeat_combo.currentData()
+
+
+# 全文搜索框
+# 边输入边搜索，结果按相关度排序，每次事件循环只追加一小批，输入新内容时丢弃旧的结果流
+class SearchBox(QWidget):
+    resultChosen = pyqtSignal(str, int, QDate)     # kind, id, date
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._rows = None
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.edit = QLineEdit(self)
+        self.edit.setPlaceholderText("Search events, todos, reminders…")
+        self.edit.setClearButtonEnabled(True)
+        layout.addWidget(self.edit)
+        self.results = QListWidget(self)
+        self.results.setMaximumHeight(200)
+        self.results.hide()
+        layout.addWidget(self.results)
+
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(SEARCH_DELAY_MS)
+        self.debounce.timeout.connect(self.start_search)
+        self.edit.textChanged.connect(self.debounce.start)
+        self.edit.returnPressed.connect(self._choose_first)
+        self.results.itemClicked.connect(self._choose)
+
+    def start_search(self):
+        if self._rows is not None:
+            self._rows.close()
+        self.results.clear()
+        self._rows = self.store.search(self.edit.text())
+        self._pump(self._rows)
+
+    def _pump(self, rows):
+        # 已经有更新的搜索，旧结果流作废
+        if rows is not self._rows:
+            return
+        for _ in range(SEARCH_CHUNK):
+            row = next(rows, None)
+            if row is None:
+                self._rows = None
+                break
+            self._add_result(*row)
+        else:
+            QTimer.singleShot(0, lambda: self._pump(rows))
+        self.results.setVisible(self.results.count() > 0)
+
+    def _add_result(self, kind, row_id, date_str, title, detail):
+        date = QDate.fromString(date_str, Qt.DateFormat.ISODate)
+        text = f"{SEARCH_ICONS.get(kind, '')} {title}"
+        if detail:
+            text += f" · {detail}"
+        item = QListWidgetItem(f"{date.toString('yyyy-MM-dd')}   {text}")
+        item.setData(Qt.ItemDataRole.UserRole, (kind, row_id, date))
+        self.results.addItem(item)
+
+    def _choose(self, item):
+        kind, row_id, date = item.data(Qt.ItemDataRole.UserRole)
+        self.resultChosen.emit(kind, row_id, date)
+
+    def _choose_first(self):
+        if self.results.count():
+            self._choose(self.results.item(0))
+
 
 # DailyScheduleView 类
 # 这是一个日历视图，显示每天的事件安排
 class DailyScheduleView(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None,
+                 load_radius_weeks=LOAD_RADIUS_WEEKS, evict_radius_weeks=EVICT_RADIUS_WEEKS):
         super().__init__(parent)
         # Database
-        self.db_conn = sqlite3.connect('resources/misc/events.db')
-        self.db_cursor = self.db_conn.cursor()
-
-        # Table指令
-        self.db_cursor.execute('''
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY,
-                date TEXT,
-                title TEXT,
-                place TEXT,
-                start TEXT,
-                end TEXT,
-                color TEXT
-            )
-        ''')
-
-        self.db_conn.commit()
+        self.store = get_store()
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_DELAY_MS)
+        self.flush_timer.timeout.connect(self.flush_pending)
 
-        # load events
-        self.events_by_date = {}
-        self.load_events()
+        # load events (only the weeks around current_date)
+        self.current_date = QDate.currentDate()
+        self.load_radius_weeks = load_radius_weeks
+        self.evict_radius_weeks = max(evict_radius_weeks, load_radius_weeks)
+        self.event_cache = EventCache(self.store)   # 按儒略日和主键索引的事件缓存
+        self.series_cache = SeriesCache(self.store)  # 重复事件，按周懒展开
+        self.cards = {}                               # 当前日期画布上的卡片 {id: EventCard}
+        self.prefetch_tasks = {}                      # 后台预取中的周 {(week, ...): Task}
+
+        # 存储层变更通知（排队投递：等发起修改的代码更新完缓存后再刷新卡片）
+        self.change_relay = ChangeRelay(self.store.changes, {EVENT, SERIES}, self)
+        self.change_relay.changed.connect(self.on_store_change, Qt.ConnectionType.QueuedConnection)
+        self.load_events(self.current_date, radius=0)
 
         # UI
         self.setWindowTitle("Daily Schedule View")
-        self.current_date = QDate.currentDate()
         root_layout = QVBoxLayout(self)
 
         # Header: calendar + add
@@ -222,7 +341,16 @@ class DailyScheduleView(QWidget):
         toggle = QPushButton("+ Add Event")
         toggle.clicked.connect(self.open_add_dialog)
         header.addWidget(toggle)
+        import_btn = QPushButton("Import .ics")
+        import_btn.clicked.connect(self.open_import_dialog)
+        header.addWidget(import_btn)
+        export_btn = QPushButton("Export…")
+        export_btn.clicked.connect(self.open_export_dialog)
+        header.addWidget(export_btn)
         root_layout.addLayout(header)
+        self.search_box = SearchBox(self.store, self)
+        self.search_box.resultChosen.connect(self.jump_to_result)
+        root_layout.addWidget(self.search_box)
         self.calendar = QCalendarWidget()
         self.calendar.setMaximumHeight(200)
         self.calendar.clicked.connect(self.on_date_selected)
@@ -262,6 +390,7 @@ class DailyScheduleView(QWidget):
 
         # initial render
         self.render_events_for_date(self.current_date)
+        self.schedule_prefetch()
 
     def apply_calendar_formatting(self):
         self.calendar.setDateTextFormat(QDate(), QTextCharFormat())
@@ -281,42 +410,54 @@ class DailyScheduleView(QWidget):
                     if date.isValid() and date.dayOfWeek() in (6, 7):
                         self.calendar.setDateTextFormat(date, weekend_fmt)
 
-    def update_views(self):
-        fmt = QTextCharFormat()
-        fmt.setBackground(QBrush(QColor("#0078d4")))
-        self.calendar_view.setDateTextFormat(self.current_date, fmt)
-        
-        self.date_label.setText(self.current_date.toString("dddd, MMMM d"))
-        self.time_axis.scene.clear()
-        self.time_axis.draw_time_marks()
-        
-        date_str = self.current_date.toString(Qt.DateFormat.ISODate)
-        for event in self.events.get(date_str, []):
-            event_item = EventItem(event, self.pixels_per_minute)
-            self.time_axis.scene.addItem(event_item)                    
-
-
     """
     添加新事件
     """
-    def add_event(self, title, place, sh, sm, eh, em, color: QColor):
-        # 1) 写入 SQLite，记得插入 place 和 color
-        dstr = self.current_date.toString(Qt.DateFormat.ISODate)
-        self.db_cursor.execute(
-            'INSERT INTO events (date, title, place, start, end, color) VALUES (?, ?, ?, ?, ?, ?)',
-            (dstr, title, place,
+    def add_event(self, title, place, sh, sm, eh, em, color: QColor, date: QDate = None):
+        # 1) 先构造内存记录：时间不合法时在这里抛 ValueError，不会写进数据库
+        #    （先分配主键，保证日志重放不会重复插入）
+        date = date or self.current_date
+        dstr = date.toString(Qt.DateFormat.ISODate)
+        event_id = self.store.allocate_event_id()
+        record = EventRecord(
+            event_id, date.toJulianDay(), title, place,
+            sh * 60 + sm, eh * 60 + em, color.rgb() & 0xFFFFFF
+        )
+
+        # 2) 写入 SQLite，记得插入 place 和 color
+        self.queue_write(
+            'INSERT OR REPLACE INTO events (id, date, title, place, start, end, color) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (event_id, dstr, title, place,
              f"{sh:02d}:{sm:02d}", f"{eh:02d}:{em:02d}",
-             color.name())
+             color.name()),
+            Change(EVENT, dstr, event_id, INSERT)
         )
-        self.db_conn.commit()
 
-        # 2) 更新内存缓存
-        self.events_by_date.setdefault(self.current_date, []).append(
-            (title, place, sh, sm, eh, em, color)
+        # 3) 更新内存缓存；卡片由变更通知添加
+        self.event_cache.add(record)
+
+    def add_series(self, title, place, sh, sm, eh, em, color: QColor, rrule: str):
+        """
+        添加重复事件：只存一行规则，从 current_date 开始按 rrule 重复。
+        """
+        self.series_cache.add(
+            self.current_date.toJulianDay(), title, place,
+            f"{sh:02d}:{sm:02d}", f"{eh:02d}:{em:02d}", color.name(), rrule
         )
 
-        # 3) 刷新 UI
-        self.render_events_for_date(self.current_date)
+    def queue_write(self, sql, params, change=None):
+        """
+        写操作排队，由 flush_timer 批量提交；计时器不重启，
+        连续编辑时最多延迟 FLUSH_DELAY_MS。
+        """
+        self.store.enqueue(sql, params, change)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush_pending(self):
+        # 数据库正被其它写入（如批量导入）占用时不阻塞界面，稍后重试
+        if not self.store.flush(wait=False):
+            self.flush_timer.start()
 
     def open_add_dialog(self):
         dlg = AddEventDialog(self)
@@ -324,8 +465,106 @@ class DailyScheduleView(QWidget):
             data = dlg.get_data()
             if data:
                 title, place, sh, sm, eh, em, color = data
+                if not self.confirm_conflicts(self.current_date, sh * 60 + sm, eh * 60 + em):
+                    return
                 # 先写入 DB，再刷新
-                self.add_event(title, place, sh, sm, eh, em, color)
+                rrule = dlg.rrule()
+                if rrule:
+                    self.add_series(title, place, sh, sm, eh, em, color, rrule)
+                else:
+                    self.add_event(title, place, sh, sm, eh, em, color)
+
+    """
+    导入 iCalendar 文件（后台线程，带进度条）
+    """
+    def open_import_dialog(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Calendar", "", "iCalendar (*.ics)")
+        if not path:
+            return
+        self.store.flush()
+        self.import_progress = QProgressDialog("Importing events…", None, 0, 100, self)
+        self.import_progress.setWindowTitle("Import .ics")
+        self.import_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.import_progress.setMinimumDuration(300)
+        self.import_task = run_in_background(
+            import_ics, path,
+            on_progress=self.on_import_progress,
+            on_done=self.on_import_done,
+            on_error=self.on_import_failed,
+        )
+
+    def on_import_progress(self, state):
+        done, total, events = state
+        self.import_progress.setValue(done * 100 // max(total, 1))
+        self.import_progress.setLabelText(f"Importing events… {events}")
+
+    def on_import_done(self, stats):
+        self.import_progress.close()
+        self.import_task = None
+        # 缓存由 RELOAD 变更通知重新加载
+        message = (f"Imported {stats['inserted']} events and {stats['series']} recurring events, "
+                   f"skipped {stats['duplicates']} already imported and {stats['invalid']} invalid.")
+        if stats["unsupported_rrule"]:
+            # 不支持的重复规则只导入了第一次，要让用户知道
+            message += (f"\n{stats['unsupported_rrule']} repeating events use rules that cannot be repeated here; "
+                        f"only their first occurrence was imported.")
+        QMessageBox.information(self, "Import .ics", message)
+
+    def on_import_failed(self, error):
+        self.import_progress.close()
+        self.import_task = None
+        QMessageBox.warning(self, "Import .ics", f"Import failed: {error}")
+
+    """
+    导出事件、待办和提醒（后台线程，流式写入 ICS / CSV）
+    """
+    def open_export_dialog(self):
+        path, selected = QFileDialog.getSaveFileName(
+            self, "Export", "tempopilot.ics", "iCalendar (*.ics);;CSV (*.csv)"
+        )
+        if not path:
+            return
+        fmt = "csv" if selected.startswith("CSV") else "ics"
+        if not path.lower().endswith("." + fmt):
+            path += "." + fmt
+        self.store.flush()
+        self.export_task = run_in_background(
+            export, path, fmt,
+            on_done=lambda counts: self.on_export_done(path, counts),
+            on_error=self.on_export_failed,
+        )
+
+    def on_export_done(self, path, counts):
+        self.export_task = None
+        summary = ", ".join(f"{n} {table.replace('_', ' ')}" for table, n in counts.items())
+        QMessageBox.information(self, "Export", f"Exported {summary} to\n{path}")
+
+    def on_export_failed(self, error):
+        self.export_task = None
+        QMessageBox.warning(self, "Export", f"Export failed: {error}")
+
+    def conflicts(self, date: QDate, start: int, end: int) -> list:
+        """
+        与 [start, end) 分钟区间重叠的当天事件（EventRecord 列表）。
+        """
+        index = self.day_index(date)
+        return [self.lookup_event(event_id) for event_id in index.overlapping(start, end)]
+
+    def confirm_conflicts(self, date: QDate, start: int, end: int) -> bool:
+        """
+        新事件与已有事件冲突时提示用户，返回是否仍然添加。
+        """
+        clashes = self.conflicts(date, start, end)
+        if not clashes:
+            return True
+        names = "\n".join(
+            f"• {ev.title} ({format_hhmm(ev.start)} – {format_hhmm(ev.end)})" for ev in clashes
+        )
+        answer = QMessageBox.question(
+            self, "Time Conflict",
+            f"This time overlaps with:\n{names}\n\nAdd the event anyway?"
+        )
+        return answer == QMessageBox.StandardButton.Yes
 
 
     """
@@ -336,28 +575,35 @@ class DailyScheduleView(QWidget):
         返回当天所有空闲时段，格式 [(sh, sm, eh, em), …]
         依照分钟数排序。
         """
-        # 1) 事件列表：每项 (title, place, sh, sm, eh, em, color)
-        evs = sorted(
-            self.events_by_date.get(date, []),
-            key=lambda e: e[2] * 60 + e[3]  # 用 sh, sm 排序
+        # 当天的区间索引已按开始时间排好序，直接找空隙（最后一段到 24:00）
+        index = self.day_index(date)
+        return [
+            (start // 60, start % 60, end // 60, end % 60)
+            for start, end in index.free_slots(0, 24 * 60)
+        ]
+
+    def find_free_slots(self, start_date: QDate, end_date: QDate, min_minutes: int, **constraints):
+        """
+        多日空闲时段搜索，constraints 见 FreeSlots.find_free_slots
+        （work_hours / buffer / excluded_weekdays / rank / limit）。
+        从今天开始搜索时自动跳过已经过去的时间。
+        返回 [(QDate, sh, sm, eh, em), …]
+        """
+        if start_date == QDate.currentDate() and "not_before" not in constraints:
+            now = QTime.currentTime()
+            constraints["not_before"] = now.hour() * 60 + now.minute()
+        slots = find_free_slots(
+            self.store,
+            start_date.toString(Qt.DateFormat.ISODate),
+            end_date.toString(Qt.DateFormat.ISODate),
+            min_minutes,
+            series=self.series_cache,
+            **constraints
         )
-
-        slots = []
-        prev_end = 0  # 从 00:00 开始
-
-        # 2) 依次找空隙
-        for title, place, sh, sm, eh, em, color in evs:
-            start_min = sh * 60 + sm
-            if start_min > prev_end:
-                # prev_end 到 start_min 之间是空闲
-                slots.append((prev_end // 60, prev_end % 60, sh, sm))
-            prev_end = max(prev_end, eh * 60 + em)
-
-        # 3) 最后从最后一个事件到 24:00 的空隙
-        if prev_end < 24 * 60:
-            slots.append((prev_end // 60, prev_end % 60, 24, 0))
-
-        return slots
+        return [
+            (QDate.fromString(date_str, Qt.DateFormat.ISODate), start // 60, start % 60, end // 60, end % 60)
+            for date_str, start, end in slots
+        ]
 
 
     def on_date_selected(self, date):
@@ -365,7 +611,29 @@ class DailyScheduleView(QWidget):
         self.current_date = date
         self.render_events_for_date(date)
         self.apply_calendar_formatting()
+        self.schedule_prefetch()
         
+    def jump_to_result(self, kind: str, row_id: int, date: QDate):
+        """
+        搜索结果跳转到对应日期；重复事件跳到今天起的下一次。
+        """
+        if kind == "series":
+            date = self.next_occurrence(row_id) or date
+        if not date.isValid():
+            return
+        self.calendar.setSelectedDate(date)
+        self.on_date_selected(date)
+
+    def next_occurrence(self, series_id: int, horizon_days: int = 366):
+        s = self.series_cache.series.get(series_id)
+        if s is None:
+            return None
+        today = QDate.currentDate().toJulianDay()
+        for day in range(max(today, s.first), today + horizon_days):
+            if s.occurs_on(day):
+                return QDate.fromJulianDay(day)
+        return None
+
     def toggle_calendar_view(self):
         self.animation = QPropertyAnimation(self.calendar, b"maximumHeight")
         self.animation.setDuration(300)
@@ -385,118 +653,239 @@ class DailyScheduleView(QWidget):
     """
     def render_events_for_date(self, date: QDate):
         # 1) 清掉画布上旧的卡片
-        for child in self.canvas.findChildren(EventCard):
-            child.deleteLater()
+        for card in self.cards.values():
+            card.deleteLater()
+        self.cards = {}
 
-        # 2) 每分钟对应的像素
-        px_per_min = self.canvas.hour_height / 60
+        # 2) 取当天的所有事件，按顺序渲染
+        for event_id, ev in self.events_for_date(date).items():
+            self.add_card(date, event_id, ev)
 
-        # 3) 取当天的所有事件
-        events = self.events_by_date.get(date, [])
-
-        # 4) 按顺序渲染
-        for idx, (title, place, sh, sm, eh, em, color) in enumerate(events):
-            start_min = sh * 60 + sm
-            duration  = (eh * 60 + em) - start_min
-            y = start_min * px_per_min
-            h = duration   * px_per_min
-
-            # 5) 实例化 EventCard —— 传入 scheduler_view、date、idx
-            card = EventCard(
-                title, 
-                place,
-                sh, sm, 
-                eh, em,
-                color,
-                scheduler_view=self,
-                date=date,
-                idx=idx,
-                parent=self.canvas
-            )
+    def add_card(self, date: QDate, event_id: int, ev):
+        # 每分钟对应的像素
+        px_per_min = self.canvas.hour_height / 60
+        duration  = ev.end - ev.start
+        y = ev.start * px_per_min
+        h = duration   * px_per_min
+
+        # 实例化 EventCard —— 传入 scheduler_view、date、event_id
+        card = EventCard(
+            ev.title,
+            ev.place,
+            ev.start // 60, ev.start % 60,
+            ev.end // 60, ev.end % 60,
+            QColor(ev.color),
+            scheduler_view=self,
+            date=date,
+            event_id=event_id,
+            parent=self.canvas
+        )
 
-            # 6) 放到正确的位置和大小
-            card.setGeometry(0, int(y), self.canvas.width(), int(h))
-            card.show()
+        # 放到正确的位置和大小
+        card.setGeometry(0, int(y), self.canvas.width(), int(h))
+        card.show()
+        self.cards[event_id] = card
+
+    def remove_card(self, event_id: int):
+        card = self.cards.pop(event_id, None)
+        if card is not None:
+            card.deleteLater()
+
+    def refresh_card(self, event_id: int):
+        """ 只重建一张卡片（事件已删除或不在当前日期时只移除） """
+        self.remove_card(event_id)
+        ev = self.event_cache.get(event_id)
+        if ev is not None and ev.day == self.current_date.toJulianDay():
+            self.add_card(self.current_date, event_id, ev)
+
+    def refresh_occurrence_cards(self):
+        """ 重复事件变化时只重建当天的重复事件卡片 """
+        for event_id in [i for i in self.cards if is_occurrence(i)]:
+            self.remove_card(event_id)
+        for event_id, ev in self.series_cache.day_occurrences(self.current_date.toJulianDay()).items():
+            self.add_card(self.current_date, event_id, ev)
+
+    def on_store_change(self, change):
+        """
+        存储层的变更通知：只刷新受影响的卡片，不整页重绘。
+        """
+        if change.op == COMMIT:
+            # 缓存在排队时已经更新过，提交只对读数据库的视图有意义
+            return
+        if change.op == RELOAD and change.kind == SERIES:
+            # 导入的重复事件绕过了 series_cache，重建后刷新当天卡片
+            self.series_cache = SeriesCache(self.store)
+            self.refresh_occurrence_cards()
+        elif change.op == RELOAD:
+            # 批量导入的行绕过了缓存，重新加载当前窗口
+            self.event_cache.clear()
+            self.load_events(self.current_date)
+            self.render_events_for_date(self.current_date)
+        elif change.kind == SERIES:
+            self.refresh_occurrence_cards()
+        elif change.date == self.current_date.toString(Qt.DateFormat.ISODate):
+            self.refresh_card(change.id)
 
 
     """
-    读取事件
+    读取事件（按周窗口懒加载）
     """
-    def load_events(self):
-        self.db_cursor.execute(
-            'SELECT date, title, place, start, end, color FROM events'
-        )
-        for date_str, title, place, start_s, end_s, color_s in self.db_cursor.fetchall():
-            qd = QDate.fromString(date_str, Qt.DateFormat.ISODate)
-            if not qd.isValid():
-                continue
-            sh, sm = map(int, start_s.split(':'))
-            eh, em = map(int, end_s.split(':'))
-            col = QColor(color_s)
-            self.events_by_date.setdefault(qd, []).append(
-                (title, place, sh, sm, eh, em, col)
+    def load_events(self, center: QDate, radius: int = None):
+        """
+        确保 center 所在周及前后 radius 周已经加载进缓存。
+        """
+        if radius is None:
+            radius = self.load_radius_weeks
+        with StartupProfile.section(StartupProfile.DATABASE, "load_events"):
+            self.event_cache.load_around(center.toJulianDay(), radius)
+
+    def events_for_date(self, date: QDate) -> dict:
+        """
+        某天的事件 {id: EventRecord}；该周未加载时先同步加载这一周。
+        重复事件只在这里按需展开（负数 id）。
+        """
+        day = date.toJulianDay()
+        events = self.event_cache.day_events(day)
+        occurrences = self.series_cache.day_occurrences(day)
+        if occurrences:
+            events = {**events, **occurrences}
+        return events
+
+    def day_index(self, date: QDate):
+        """ 当天单次事件与重复事件合并后的区间索引 """
+        day = date.toJulianDay()
+        return self.series_cache.day_index(day, self.event_cache.day_index(day))
+
+    def lookup_event(self, event_id: int):
+        """ 按 id 取 EventRecord，单次事件或重复事件的某一次 """
+        if is_occurrence(event_id):
+            return self.series_cache.occurrence(event_id)
+        return self.event_cache.get(event_id)
+
+    def update_event(self, event_id: int, **fields):
+        """
+        用主键更新内存中的事件并排队写库。
+        fields 使用 EventRecord 的字段：title / place 为文本，
+        start / end 为分钟数，color 为 0xRRGGBB。
+        重复事件的某一次被修改时，只改这一次：系列里跳过这天，另存为单次事件。
+        结束不晚于开始时抛出 ValueError，缓存和数据库都不改。
+        """
+        old = self.lookup_event(event_id)
+        if fields.get("end", old.end) <= fields.get("start", old.start):
+            raise ValueError("an event has to end after it starts")
+        if is_occurrence(event_id):
+            ev = self.series_cache.occurrence(event_id)
+            series_id, day = split_occurrence_id(event_id)
+            values = {name: getattr(ev, name) for name in ("title", "place", "start", "end", "color")}
+            values.update(fields)
+            self.series_cache.skip(series_id, day)
+            self.add_event(
+                values["title"], values["place"],
+                values["start"] // 60, values["start"] % 60,
+                values["end"] // 60, values["end"] % 60,
+                QColor(values["color"]), date=QDate.fromJulianDay(day)
             )
+            return
+        ev = self.event_cache.update(event_id, **fields)
+        columns = {}
+        for name, value in fields.items():
+            if name in ("start", "end"):
+                value = format_hhmm(value)
+            elif name == "color":
+                value = format_color(value)
+            columns[name] = value
+        assignments = ", ".join(f"{col} = ?" for col in columns)
+        self.queue_write(
+            f'UPDATE events SET {assignments} WHERE id = ?',
+            (*columns.values(), event_id),
+            Change(EVENT, QDate.fromJulianDay(ev.day).toString(Qt.DateFormat.ISODate), event_id, UPDATE)
+        )
+
+    def schedule_prefetch(self):
+        """
+        当前周已经渲染后，在后台线程读取相邻周，回到界面线程再并入缓存并释放远处的周。
+        """
+        day = self.current_date.toJulianDay()
+        weeks = tuple(week for week in self.event_cache.missing_weeks(day, self.load_radius_weeks)
+                      if not any(week in pending for pending in self.prefetch_tasks))
+        if not weeks:
+            self.event_cache.evict_far(day, self.evict_radius_weeks)
+            return
+        self.prefetch_tasks[weeks] = run_in_background(
+            self.event_cache.fetch_weeks, weeks,
+            on_done=lambda result: self.on_prefetched(weeks, result),
+            on_error=lambda error: self.on_prefetch_failed(weeks, error),
+        )
 
-    def delete_event(self, date: QDate, idx: int):
+    def on_prefetched(self, weeks, result):
+        del self.prefetch_tasks[weeks]
+        # 期间已同步加载的周保持不变；缓存被清空过则整批丢弃
+        self.event_cache.merge_weeks(result)
+        self.event_cache.evict_far(self.current_date.toJulianDay(), self.evict_radius_weeks)
+
+    def on_prefetch_failed(self, weeks, error):
+        del self.prefetch_tasks[weeks]
+        # 预取只是优化：这些周在显示时会同步加载
+        log.warning("prefetching weeks %s failed: %s", weeks, error)
+
+    def delete_event(self, event_id: int):
         """
-        删除 events_by_date[date] 中序号为 idx 的事件，
-        并同步到 SQLite 数据库，然后刷新界面。
+        按主键删除事件，同步到 SQLite 数据库；卡片由变更通知移除。
         """
+        if is_occurrence(event_id):
+            self.delete_occurrence(event_id)
+            return
+
         # 1) 从内存缓存中移除
-        events = self.events_by_date.get(date, [])
-        if idx < 0 or idx >= len(events):
+        ev = self.event_cache.remove(event_id)
+        if ev is None:
             return
-        title, place, sh, sm, eh, em, color = events.pop(idx)
 
-        # 2) 从数据库中删除（按日期+标题+地点+开始+结束 精确匹配）
-        dstr = date.toString(Qt.DateFormat.ISODate)
-        start_s = f"{sh:02d}:{sm:02d}"
-        end_s   = f"{eh:02d}:{em:02d}"
-        self.db_cursor.execute(
-            "DELETE FROM events WHERE date = ? AND title = ? AND place = ? AND start = ? AND end = ?",
-            (dstr, title, place, start_s, end_s)
+        # 2) 从数据库中删除（主键）
+        self.queue_write(
+            "DELETE FROM events WHERE id = ?", (event_id,),
+            Change(EVENT, QDate.fromJulianDay(ev.day).toString(Qt.DateFormat.ISODate), event_id, DELETE)
         )
-        self.db_conn.commit()
 
-        # 3) 刷新当前视图
-        self.render_events_for_date(date)
+
+    def delete_occurrence(self, event_id: int):
+        """
+        重复事件：询问只删这一次还是删除整个系列。
+        """
+        series_id, day = split_occurrence_id(event_id)
+        box = QMessageBox(self)
+        box.setWindowTitle("Delete Recurring Event")
+        box.setText("Delete only this event, or every event in the series?")
+        only_this = box.addButton("This Event", QMessageBox.ButtonRole.AcceptRole)
+        whole_series = box.addButton("All Events", QMessageBox.ButtonRole.DestructiveRole)
+        box.addButton(QMessageBox.StandardButton.Cancel)
+        box.exec()
+        if box.clickedButton() == only_this:
+            self.series_cache.skip(series_id, day)
+        elif box.clickedButton() == whole_series:
+            self.series_cache.remove(series_id)
 
 
     """
     修改地点
     """
-    def edit_event_place(self, date, idx):
+    def edit_event_place(self, event_id: int):
         # 读取旧值
-        ev = list(self.events_by_date[date][idx])
-        old_place = ev[1]
+        old_place = self.lookup_event(event_id).place
         # 弹出对话框让用户输入新地点
         new_place, ok = QInputDialog.getText(self, "Edit Place", "Place:", text=old_place)
         if not ok or not new_place.strip():
             return
-        ev[1] = new_place.strip()
-        self.events_by_date[date][idx] = tuple(ev)
-        # 更新数据库
-        dstr = date.toString(Qt.DateFormat.ISODate)
-        self.db_cursor.execute(
-            'UPDATE events SET place = ? WHERE date = ? AND title = ? AND start = ? AND end = ?',
-            (
-                new_place.strip(), dstr,
-                ev[0],
-                f"{ev[2]:02d}:{ev[3]:02d}",
-                f"{ev[4]:02d}:{ev[5]:02d}"
-            )
-        )
-        self.db_conn.commit()
-        self.render_events_for_date(date)    
+        # 更新内存和数据库
+        self.update_event(event_id, place=new_place.strip())
 
 
     """
     修改时间和颜色
     """
-    def edit_event_time_color(self, date: QDate, idx: int):
+    def edit_event_time_color(self, event_id: int):
         # 1) 取出旧值
-        ev = list(self.events_by_date[date][idx])
-        # ev 格式现在是 [ title, place, start_h, start_m, end_h, end_m, color ]
+        ev = self.lookup_event(event_id)
 
         # 2) 让对话框支持全天任意选，隐藏下拉
         from RecommendationView import TimeSlotDialog
@@ -506,14 +895,10 @@ class DailyScheduleView(QWidget):
 
         # 3) 预置对话框中的时间和颜色为当前事件值
         from PyQt6.QtCore import QTime
-        orig_sh, orig_sm, orig_eh, orig_em = ev[2], ev[3], ev[4], ev[5]
-        dlg.start_edit.setTime(QTime(orig_sh, orig_sm))
-        dlg.end_edit  .setTime(QTime(orig_eh, orig_em))
-
-        # 如果原来存的是字符串，再转成 QColor
-        from PyQt6.QtGui import QColor
-        old_color = ev[6]
-        c = QColor(old_color) if isinstance(old_color, str) else old_color
+        dlg.start_edit.setTime(QTime(ev.start // 60, ev.start % 60))
+        dlg.end_edit  .setTime(QTime(ev.end // 60, ev.end % 60))
+
+        c = QColor(ev.color)
         dlg.color = c
         dlg.color_btn.setStyleSheet(f"background-color: {c.name()};")
 
@@ -522,42 +907,25 @@ class DailyScheduleView(QWidget):
             return
         new_sh, new_sm, new_eh, new_em, new_color = dlg.get_times()
 
-        # 5) 更新内存和数据库
-        ev[2], ev[3], ev[4], ev[5], ev[6] = new_sh, new_sm, new_eh, new_em, new_color
-        self.events_by_date[date][idx] = tuple(ev)
-
-        dstr = date.toString(Qt.DateFormat.ISODate)
-        self.db_cursor.execute(
-            '''
-            UPDATE events
-               SET start = ?, end = ?, color = ?
-             WHERE date  = ?
-               AND title = ?
-            ''',
-            (
-                f"{new_sh:02d}:{new_sm:02d}",
-                f"{new_eh:02d}:{new_em:02d}",
-                new_color.name(),
-                dstr,
-                ev[0]
-            )
+        # 5) 更新内存和数据库（只改这一条，不再按标题匹配同名事件）
+        self.update_event(
+            event_id,
+            start=new_sh * 60 + new_sm,
+            end=new_eh * 60 + new_em,
+            color=new_color.rgb() & 0xFFFFFF
         )
-        self.db_conn.commit()
-
-        # 6) 重新渲染
-        self.render_events_for_date(date)
 
 
     """
     右键导航
     """
-    def navigate_event(self, date: QDate, idx: int):
+    def navigate_event(self, event_id: int):
         """
         右键 “Navigate to Place…” 调用这里，  
         切到 MapView 页面并在内嵌的谷歌地图里显示导航。
         """
         # 取出目标地点
-        _, place, sh, sm, eh, em, _ = self.events_by_date[date][idx]
+        place = self.lookup_event(event_id).place
 
         # 准备 URL 参数（空格转 +）
         #origin = "Current+Location"
@@ -569,34 +937,20 @@ class DailyScheduleView(QWidget):
         main_win.switchTo(main_win.mapInterface)
 
         # 让 mapInterface 加载导航
-        main_win.mapInterface.navigate(origin, destination)
+        main_win.mapInterface.widget().navigate(origin, destination)
     
     """
     右键修改日程名称
     """
-    def edit_event_name(self, date: QDate, idx: int):
+    def edit_event_name(self, event_id: int):
         # 读取旧值
-        ev = list(self.events_by_date[date][idx])
-        old_title = ev[0]
+        old_title = self.lookup_event(event_id).title
         # 弹出对话框让用户输入新名称
         new_title, ok = QInputDialog.getText(self, "Edit Title", "Title:", text=old_title)
         if not ok or not new_title.strip():
             return
-        ev[0] = new_title.strip()
-        self.events_by_date[date][idx] = tuple(ev)
-        # 更新数据库
-        dstr = date.toString(Qt.DateFormat.ISODate)
-        self.db_cursor.execute(
-            'UPDATE events SET title = ? WHERE date = ? AND title = ? AND start = ? AND end = ?',
-            (
-                new_title.strip(), dstr,
-                old_title.strip(),
-                f"{ev[2]:02d}:{ev[3]:02d}",
-                f"{ev[4]:02d}:{ev[5]:02d}"
-            )
-        )
-        self.db_conn.commit()  # 提交更改
-        self.render_events_for_date(date)  # 刷新当前视图
+        # 更新内存和数据库，并刷新当前视图
+        self.update_event(event_id, title=new_title.strip())
 
 
 if __name__ == '__main__':
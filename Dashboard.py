@@ -1,26 +1,30 @@
 import datetime
-import json
-import sqlite3
+import logging
 
-import requests
-from PyQt6.QtCore import Qt, QPoint, QDate
+from PyQt6.QtCore import Qt, QPoint
 from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import QVBoxLayout, QWidget, QDialog, QListWidgetItem
-from bs4 import BeautifulSoup
 from qfluentwidgets import (ScrollArea, ListWidget, RoundMenu, Action, FluentIcon, TitleLabel)
 
 
 import Widgets
+from ChangeBus import TODO, REMINDER, SPECIAL_DATE
+from Config import get_config
+from EventStore import get_store
+from Horoscope import HoroscopeCache, ZODIAC_SIGNS
+from Workers import ChangeRelay, run_in_background
 
-with open("resources/misc/config.json") as config_file:
-    _config = json.load(config_file)
-
-zodiac = _config["zodiac"]
-dob = _config["dob"]
 today = datetime.datetime.today()
 date_str = today.strftime("%Y-%m-%d") + " "
 day_of_week_str = today.strftime("%A")
 
+log = logging.getLogger(__name__)
+
+# Shown on a card until its background load has finished
+LOADING_TEXT = "Loading..."
+# and instead of its content when that load failed
+ERROR_TEXT = "Couldn't load this card. It will be retried on the next change."
+
 
 class ToDoToday(QDialog):
     def __init__(self):
@@ -37,23 +41,11 @@ class ToDoToday(QDialog):
         self.load_todos_for_today()
 
     def load_todos_for_today(self):
-        conn = sqlite3.connect('resources/misc/todos.db')
-        cursor = conn.cursor()
-
-        # Get today's date in the format stored in the database
-        today_date = datetime.datetime.now().strftime("%a %b %d %Y")
+        today_date = datetime.date.today().isoformat()
         print(f"Loading reminders for date: {today_date}")
 
-        # Debugging step: Print all dates in the database
-        cursor.execute('SELECT DISTINCT date FROM todos')
-        all_dates = cursor.fetchall()
-        print("All dates in database:")
-        for date in all_dates:
-            print(date)
-
         # Fetch reminders for today's date
-        cursor.execute('SELECT id, time, description, status FROM todos WHERE date = ?', (today_date,))
-        todos = cursor.fetchall()
+        todos = get_store().todos_for_date(today_date)
         print(f"Found {len(todos)} reminders")
 
         for todo_id, time, description, status in todos:
@@ -65,8 +57,6 @@ class ToDoToday(QDialog):
         if len(todos) == 0:
             self.reminders_list.addItem(QListWidgetItem("Nothing on the agenda! Kick back and enjoy your day!"))
 
-        conn.close()
-
     def show_context_menu(self, position: QPoint):
         menu = RoundMenu()
         mark_as_done_action = Action(FluentIcon.CHECKBOX, "Mark as Done", self)
@@ -100,11 +90,7 @@ class ToDoToday(QDialog):
                 self.update_list_widget_item(selected_item)
 
     def update_todo_status_in_database(self, todo_id):
-        conn = sqlite3.connect('resources/misc/todos.db')
-        cursor = conn.cursor()
-        cursor.execute('UPDATE todos SET status = ? WHERE id = ?', ("Done", todo_id))
-        conn.commit()
-        conn.close()
+        get_store().set_todo_status(todo_id, "Done")
 
     def update_list_widget_item(self, item):
         parts = item.text().rsplit(" - ", 1)  # Split on the last occurrence of " - "
@@ -113,11 +99,7 @@ class ToDoToday(QDialog):
             item.setText(new_text)
 
     def remove_todo_from_database(self, todo_id):
-        conn = sqlite3.connect('resources/misc/todos.db')
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM todos WHERE id = ?', (todo_id,))
-        conn.commit()
-        conn.close()
+        get_store().delete_todo(todo_id)
         print(f"Deleted todo with id: {todo_id} from database")
 
 
@@ -136,23 +118,11 @@ class ReminderToday(QDialog):
         self.load_reminders_for_today()
 
     def load_reminders_for_today(self):
-        conn = sqlite3.connect('resources/misc/reminders.db')
-        cursor = conn.cursor()
-
-        # Get today's date in the format stored in the database
-        today_date = datetime.datetime.now().strftime("%a %b %d %Y")
+        today_date = datetime.date.today().isoformat()
         print(f"Loading reminders for date: {today_date}")
 
-        # Debugging step: Print all dates in the database
-        cursor.execute('SELECT DISTINCT date FROM reminders')
-        all_dates = cursor.fetchall()
-        # print("All dates in database:")
-        # for date in all_dates:
-        # print(date)
-
         # Fetch reminders for today's date
-        cursor.execute('SELECT id, time, description FROM reminders WHERE date = ?', (today_date,))
-        todos = cursor.fetchall()
+        todos = get_store().reminders_for_date(today_date)
         # print(f"Found {len(todos)} reminders")
 
         for todo_id, time, description in todos:
@@ -164,8 +134,6 @@ class ReminderToday(QDialog):
         if len(todos) == 0:
             self.reminders_list.addItem(QListWidgetItem("Nothing on the agenda! Kick back and enjoy your day!"))
 
-        conn.close()
-
     def show_context_menu(self, position: QPoint):
         menu = RoundMenu()
         delete_action = Action(FluentIcon.DELETE, "Mark as Done & Delete", self)
@@ -185,11 +153,7 @@ class ReminderToday(QDialog):
                 print("Error: No todo_id found for the selected item.")
 
     def remove_todo_from_database(self, todo_id):
-        conn = sqlite3.connect('resources/misc/reminders.db')
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM reminders WHERE id = ?', (todo_id,))
-        conn.commit()
-        conn.close()
+        get_store().delete_reminder(todo_id)
         print(f"Deleted todo with id: {todo_id} from database")
 
 
@@ -210,42 +174,22 @@ class Dashboard(QWidget):
 
         self.setObjectName("Home")
 
-        self.header_card = Widgets.DateTitleCard(date=date_str, dayofweek=day_of_week_str)
-        try:
-            if zodiac != "":
-                self.header_card.setText(("<b>Today's Horoscope</b>: &#13;&#10;" + "\n" + "\n" + self.horoscope()))
-            else:
-                self.header_card.setText(
-                    "<b>Can't find horoscope info. Make sure you have entered your Zodiac sign and you have a valid internet connection</b>:")
-            self.scroll_layout.addWidget(self.header_card)
-        except requests.exceptions.ConnectionError:
-            self.header_card.setText(
-                "<b>Make sure you have a valid internet connection</b>:")
-
-        try:
-            dob = self.parse_date(_config["dob"])
-            days_rem_till_bday = self.days_until_next_birthday(dob)
-        except Exception as e:
-            days_rem_till_bday = "N/A"
+        # Every card starts as a skeleton and is filled by its own background
+        # load, so a slow source never holds up the others or the first paint
+        self.card_loads = {}
 
-        count_todo = self.get_number_of_todos_for_date(date_str)
-        count_reminder = self.get_number_of_remainders_for_date(date_str)
+        self.header_card = Widgets.DateTitleCard(date=date_str, dayofweek=day_of_week_str)
+        self.horoscope_cache = None
+        self.load_horoscope()
+        self.scroll_layout.addWidget(self.header_card)
 
-        if count_todo == 0:
-            self.addCard_Appointments(QIcon("resources/icons/todo.png"),
-                                      "TODOs for Today", "Nothing on the agenda! Kick back and enjoy your day!")
-        else:
-            self.addCard_Appointments(QIcon("resources/icons/todo.png"),
-                                      "TODOs for Today", f"There are {count_todo} TODO(s) for today")
+        self.todo_card = self.addCard_Appointments(QIcon("resources/icons/todo.png"),
+                                                   "TODOs for Today", LOADING_TEXT)
 
         #####################################################
 
-        if count_todo == 0:
-            self.addCard_Reminders(QIcon("resources/icons/appointments.png"),
-                                   "Reminders for Today", "Nothing on the agenda! Kick back and enjoy your day!")
-        else:
-            self.addCard_Reminders(QIcon("resources/icons/appointments.png"),
-                                   "Reminders for Today", f"There are {count_reminder} Reminder(s) for today")
+        self.reminder_card = self.addCard_Reminders(QIcon("resources/icons/appointments.png"),
+                                                    "Reminders for Today", LOADING_TEXT)
 
 
         spcl_title = TitleLabel()
@@ -253,105 +197,156 @@ class Dashboard(QWidget):
         spcl_title.setText("✨ Special Dates ✨")
         self.scroll_layout.addWidget(spcl_title, alignment=Qt.AlignmentFlag.AlignVCenter)
 
-        self.addCard_V(QIcon("resources/icons/cake.png"),
-                       f"{days_rem_till_bday}", "days remaining till birthday")
+        self.birthday_card = self.addCard_V(QIcon("resources/icons/cake.png"),
+                                            "-", "days remaining till birthday")
 
-        self.add_special_date_cards()
+        self.special_date_cards = []
 
+        self.load_todo_card()
+        self.load_reminder_card()
+        self.load_birthday_card()
+        self.load_special_date_cards()
+
+        # Keep the cards above in step with writes made anywhere in the app
+        self.change_relay = ChangeRelay(get_store().changes, {TODO, REMINDER, SPECIAL_DATE}, self)
+        self.change_relay.changed.connect(self.on_store_change, Qt.ConnectionType.QueuedConnection)
+        # and with the zodiac sign / birthday saved from the settings
+        self.config_relay = ChangeRelay(get_config(), {"zodiac", "dob"}, self)
+        self.config_relay.changed.connect(self.on_config_change)
 
         self.show()
 
     def addCard_V(self, icon=None, title=None, content=None):
         card = Widgets.AppCard(icon, title, content, self)
         self.scroll_layout.addWidget(card, alignment=Qt.AlignmentFlag.AlignTop)
+        return card
 
     def addCard_Appointments(self, icon=None, title=None, content=None):
         card = Widgets.AppointmentsCard(icon, title, content, self)
         self.scroll_layout.addWidget(card, alignment=Qt.AlignmentFlag.AlignTop)
+        return card
 
     def addCard_Reminders(self, icon=None, title=None, content=None):
         card = Widgets.RemindersCard(icon, title, content, self)
         self.scroll_layout.addWidget(card, alignment=Qt.AlignmentFlag.AlignTop)
+        return card
+
+    def todo_summary(self, count):
+        if count == 0:
+            return "Nothing on the agenda! Kick back and enjoy your day!"
+        return f"There are {count} TODO(s) for today"
+
+    def reminder_summary(self, count):
+        if count == 0:
+            return "Nothing on the agenda! Kick back and enjoy your day!"
+        return f"There are {count} Reminder(s) for today"
+
+    def on_store_change(self, change):
+        """ reload only the card a todo / reminder / special date write affects """
+        today_str = datetime.date.today().isoformat()
+        if change.kind == TODO and change.date in (today_str, None):
+            self.load_todo_card()
+        elif change.kind == REMINDER and change.date in (today_str, None):
+            self.load_reminder_card()
+        elif change.kind == SPECIAL_DATE and (change.date is None or change.date >= today_str):
+            self.load_special_date_cards()
+
+    def load_card(self, name, fn, apply, fail):
+        """
+        run fn in the background and pass its result to apply, or the error to fail,
+        unless a newer load of the card has started
+        """
+        load = self.card_loads[name] = self.card_loads.get(name, 0) + 1
+
+        def done(result):
+            if self.card_loads[name] == load:
+                apply(result)
+
+        def failed(error):
+            log.warning("Loading the %s card failed: %s", name, error)
+            if self.card_loads[name] == load:
+                fail(error)
+
+        run_in_background(fn, on_done=done, on_error=failed)
+
+    def on_config_change(self, changed):
+        if "zodiac" in changed:
+            self.load_horoscope()
+        if "dob" in changed:
+            self.load_birthday_card()
+
+    def load_horoscope(self):
+        """ cached horoscope of the configured sign at once; the site is only asked in the background """
+        zodiac = get_config().get("zodiac", "")
+        if zodiac not in ZODIAC_SIGNS:
+            self.horoscope_cache = None
+            self.card_loads["horoscope"] = self.card_loads.get("horoscope", 0) + 1
+            self.header_card.setText(
+                "<b>Can't find horoscope info. Make sure you have entered your Zodiac sign and you have a valid internet connection</b>:")
+            return
+        self.horoscope_cache = HoroscopeCache(zodiac)
+        text = self.horoscope_cache.cached()
+        if text is not None:
+            self.show_horoscope(text)
+        else:
+            self.header_card.setText("<b>Today's Horoscope</b>: loading...")
+        self.load_card("horoscope", self.horoscope_cache.refresh, self.show_horoscope,
+                       lambda error: self.show_horoscope(None))
+
+    def load_birthday_card(self):
+        self.load_card("birthday", self.days_until_birthday, self.birthday_card.titleLabel.setText,
+                       lambda error: self.birthday_card.titleLabel.setText("N/A"))
+
+    def load_todo_card(self):
+        self.load_card("todos", lambda: self.get_number_of_todos_for_date(datetime.date.today().isoformat()),
+                       lambda count: self.todo_card.contentLabel.setText(self.todo_summary(count)),
+                       lambda error: self.todo_card.contentLabel.setText(ERROR_TEXT))
+
+    def load_reminder_card(self):
+        self.load_card("reminders", lambda: self.get_number_of_remainders_for_date(datetime.date.today().isoformat()),
+                       lambda count: self.reminder_card.contentLabel.setText(self.reminder_summary(count)),
+                       lambda error: self.reminder_card.contentLabel.setText(ERROR_TEXT))
+
+    def load_special_date_cards(self):
+        self.load_card("special_dates", self.upcoming_special_dates, self.set_special_date_cards,
+                       lambda error: self.set_special_date_cards(None))
 
     def addCard_H(self, icon=None, title=None, content=None):
         card = Widgets.AppCard(icon, title, content, self)
         self.hbox_r1.addWidget(card, alignment=Qt.AlignmentFlag.AlignTop)
 
     def get_number_of_todos_for_date(self, date_str):
-        conn = sqlite3.connect('resources/misc/todos.db')
-        cursor = conn.cursor()
-
-        # Ensure the date format matches the actual format in the database
-        date = datetime.datetime.strptime(date_str.strip(), "%Y-%m-%d").strftime("%a %b %d %Y")
-        cursor.execute('SELECT COUNT(*) FROM todos WHERE date = ?', (date,))
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return get_store().count_todos(date_str.strip())
 
     def get_special_dates(self):
-        conn = sqlite3.connect('resources/misc/special_dates.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT date, reason FROM special_dates')
-        special_dates = cursor.fetchall()
-        conn.close()
-        return special_dates
-
-    def add_special_date_cards(self):
-        
-        special_dates = self.get_special_dates()
-        today = datetime.datetime.today()
-
-        """
-        for date_str, reason in special_dates:
-            special_date = datetime.datetime.strptime(date_str, '%a %b %d %Y')
-            days_until = (special_date - today).days
-
-            if days_until >= 0:
-                self.addCard_V(QIcon("resources/icons/special_day.png"),
-                               f"{days_until}", f"days remaining till {reason}")
-        """
-
-        for date_str, reason in special_dates:
-            # 用 Qt 解析，无视系统 locale
-            qdate = QDate.fromString(date_str, Qt.DateFormat.TextDate)
-            if not qdate.isValid():
-                qdate = QDate.fromString(date_str, Qt.DateFormat.ISODate)
-            if not qdate.isValid():
-                # 如果都解析失败，跳过这条
-                continue
-
-            # 转为 Python datetime
-            special_date = datetime.datetime(qdate.year(), qdate.month(), qdate.day())
-            days_until = (special_date - today).days
-
-            if days_until >= 0:
-                self.addCard_V(
-                    QIcon("resources/icons/special_day.png"),
-                    f"{days_until}",
-                    f"days remaining till {reason}"
-                )
+        return get_store().special_dates()
+
+    def upcoming_special_dates(self):
+        """ [(days until, reason), ...] from today on """
+        today = datetime.date.today()
+
+        # Dates are stored as ISO text, so upcoming ones come back sorted from the index
+        return [((datetime.date.fromisoformat(date_str) - today).days, reason)
+                for date_str, reason in get_store().special_dates_between(today.isoformat())]
+
+    def set_special_date_cards(self, upcoming):
+        """ one card per upcoming special date; None puts a single error card in their place """
+        for card in self.special_date_cards:
+            self.scroll_layout.removeWidget(card)
+            card.deleteLater()
+        if upcoming is None:
+            self.special_date_cards = [self.addCard_V(QIcon("resources/icons/special_day.png"), "-", ERROR_TEXT)]
+            return
+        self.special_date_cards = [
+            self.addCard_V(QIcon("resources/icons/special_day.png"), f"{days_until}", f"days remaining till {reason}")
+            for days_until, reason in upcoming
+        ]
 
     def get_number_of_todos_for_spcl_date(self, date_str):
-        conn = sqlite3.connect('resources/misc/special_dates.db')
-        cursor = conn.cursor()
-
-        # Ensure the date format matches the actual format in the database
-        date = datetime.datetime.strptime(date_str.strip(), "%Y-%m-%d").strftime("%a %b %d %Y")
-        cursor.execute('SELECT COUNT(*) FROM special_dates WHERE date = ?', (date,))
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return get_store().count_special_dates(date_str.strip())
 
     def get_number_of_remainders_for_date(self, date_str):
-        conn = sqlite3.connect('resources/misc/reminders.db')
-        cursor = conn.cursor()
-
-        # Ensure the date format matches the actual format in the database
-        date = datetime.datetime.strptime(date_str.strip(), "%Y-%m-%d").strftime("%a %b %d %Y")
-        cursor.execute('SELECT COUNT(*) FROM reminders WHERE date = ?', (date,))
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return get_store().count_reminders(date_str.strip())
 
     def today_todo(self):
         dialog = ToDoToday()
@@ -361,6 +356,12 @@ class Dashboard(QWidget):
         dialog = ReminderToday()
         dialog.exec()
 
+    def days_until_birthday(self):
+        try:
+            return f"{self.days_until_next_birthday(self.parse_date(get_config()['dob']))}"
+        except Exception:
+            return "N/A"
+
     def days_until_next_birthday(self, dob):
         today = datetime.datetime.today()
         next_birthday = dob.replace(year=today.year)
@@ -371,34 +372,9 @@ class Dashboard(QWidget):
     def parse_date(self, date_str):
         return datetime.datetime.strptime(date_str, '%Y-%m-%d')
 
-    def horoscope(self):
-        def get_horoscope(zodiac_sign: int, day: str):
-            if not "-" in day:
-                res = requests.get(
-                    f"https://www.horoscope.com/us/horoscopes/general/horoscope-general-daily-{day}.aspx?sign={zodiac_sign}")
-            else:
-                day = day.replace("-", "")
-                res = requests.get(
-                    f"https://www.horoscope.com/us/horoscopes/general/horoscope-archive.aspx?sign={zodiac_sign}&laDate={day}")
-
-            soup = BeautifulSoup(res.content, 'html.parser')
-            data = soup.find('div', attrs={'class': 'main-horoscope'})
-            return data.p.text
-
-        zodiac_signs = {
-            "Aries": 1,
-            "Taurus": 2,
-            "Gemini": 3,
-            "Cancer": 4,
-            "Leo": 5,
-            "Virgo": 6,
-            "Libra": 7,
-            "Scorpio": 8,
-            "Sagittarius": 9,
-            "Capricorn": 10,
-            "Aquarius": 11,
-            "Pisces": 12
-        }
-
-        zodiac_res = (get_horoscope(zodiac_signs[zodiac], "today"))
-        return zodiac_res
+    def show_horoscope(self, text):
+        """ today's horoscope on the header card; None keeps a cached one, if any """
+        if text is not None:
+            self.header_card.setText("<b>Today's Horoscope</b>: &#13;&#10;" + "\n" + "\n" + text)
+        elif self.horoscope_cache.cached() is None:
+            self.header_card.setText("<b>Make sure you have a valid internet connection</b>:")
@@ -0,0 +1,368 @@
+import datetime
+import random
+from bisect import bisect_left, insort
+import sys
+import tracemalloc
+
+# datetime.date.toordinal() + this == QDate.toJulianDay()
+JULIAN_OFFSET = 1721425
+
+DEFAULT_COLOR = 0x4DABF7
+
+# Ints above 256 are separate 28-byte objects in CPython, so records share
+# one object per minute-of-day, day and colour the way sys.intern shares strings
+_MINUTES = tuple(range(24 * 60 + 1))
+_shared_ints = {}
+
+
+def _share(value):
+    return _shared_ints.setdefault(value, value)
+
+
+def _minute(value):
+    """ the shared int for a minute of the day; ValueError outside 0..24:00 rather than a wrapped index """
+    if not 0 <= value < len(_MINUTES):
+        raise ValueError(f"{value} is not a minute of the day")
+    return _MINUTES[value]
+
+
+def iso_to_day(date_str):
+    """ "YYYY-MM-DD" -> Julian day number (the same integer QDate.toJulianDay() gives) """
+    return datetime.date.fromisoformat(date_str).toordinal() + JULIAN_OFFSET
+
+
+def day_to_iso(day):
+    return datetime.date.fromordinal(day - JULIAN_OFFSET).isoformat()
+
+
+def week_of(day):
+    """ Julian day 0 is a Monday, so this numbers Monday-based weeks """
+    return day // 7
+
+
+def parse_hhmm(text):
+    """ "HH:MM" -> minutes after midnight """
+    h, m = map(int, text.split(':'))
+    return h * 60 + m
+
+
+def format_hhmm(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_color(name):
+    """ "#rrggbb" -> 0xRRGGBB """
+    try:
+        return int(name.lstrip('#'), 16) & 0xFFFFFF
+    except (AttributeError, ValueError):
+        return DEFAULT_COLOR
+
+
+def format_color(color):
+    return f"#{color:06x}"
+
+
+class EventRecord:
+    """ One row of the events table as held in memory """
+
+    __slots__ = ("id", "day", "title", "place", "start", "end", "color")
+
+    def __init__(self, id, day, title, place, start, end, color):
+        self.id = id
+        self.day = _share(day)            # Julian day number
+        self.title = sys.intern(title or "")
+        self.place = sys.intern(place or "")
+        self.start = _minute(start)       # minutes after midnight
+        self.end = _minute(end)
+        self.color = _share(color)        # packed 0xRRGGBB
+
+    def update(self, **fields):
+        """ set title / place / start / end / color in place, keeping values shared; all or nothing """
+        values = {}
+        for name, value in fields.items():
+            if name in ("title", "place"):
+                value = sys.intern(value)
+            elif name in ("start", "end"):
+                value = _minute(value)
+            elif name == "color":
+                value = _share(value)
+            else:
+                raise AttributeError(f"EventRecord.{name} cannot be updated in place")
+            values[name] = value
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def from_row(cls, row):
+        """ build from an EventStore.events_between() row """
+        event_id, date_str, title, place, start_s, end_s, color_s = row
+        return cls(event_id, iso_to_day(date_str), title, place,
+                   parse_hhmm(start_s), parse_hhmm(end_s), parse_color(color_s))
+
+
+class DayIndex:
+    """
+    One day's events as (start, end, id) keys sorted by start. Answers
+    overlap, next-event and free-slot queries without re-sorting the day.
+    Intervals are half-open: an event covers [start, end), so one with
+    start == end covers nothing and never overlaps or splits a free slot.
+    """
+
+    __slots__ = ("keys", "max_length")
+
+    def __init__(self):
+        self.keys = []
+        self.max_length = 0     # longest event, bounds how far back an overlap can start
+
+    def __len__(self):
+        return len(self.keys)
+
+    def insert(self, rec):
+        insort(self.keys, (rec.start, rec.end, rec.id))
+        self.max_length = max(self.max_length, rec.end - rec.start)
+
+    def remove(self, rec):
+        key = (rec.start, rec.end, rec.id)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+            if key[1] - key[0] == self.max_length:
+                self.max_length = max((e - s for s, e, _ in self.keys), default=0)
+
+    def overlapping(self, a, b):
+        """ ids of events overlapping [a, b) """
+        # anything starting at or before a - max_length has already ended by a
+        lo = bisect_left(self.keys, (a - self.max_length + 1,))
+        hi = bisect_left(self.keys, (b,))
+        # start < b holds already below hi; end > start drops empty events
+        return [event_id for start, end, event_id in self.keys[lo:hi] if end > a and end > start]
+
+    def is_free(self, a, b):
+        return not self.overlapping(a, b)
+
+    def next_after(self, t):
+        """ id of the first event starting at or after minute t, or None """
+        i = bisect_left(self.keys, (t,))
+        return self.keys[i][2] if i < len(self.keys) else None
+
+    def free_slots(self, lo=0, hi=24 * 60):
+        """ [(start, end), ...] gaps between events inside [lo, hi) """
+        slots = []
+        prev_end = lo
+        for start, end, _ in self.keys:
+            if start >= hi:
+                break
+            if end == start:
+                continue
+            if start > prev_end:
+                slots.append((prev_end, start))
+            prev_end = max(prev_end, end)
+        if prev_end < hi:
+            slots.append((prev_end, hi))
+        return slots
+
+
+_EMPTY_DAY = DayIndex()
+
+
+def _records(rows):
+    """ EventRecords for store rows, skipping rows that do not parse """
+    for row in rows:
+        try:
+            yield EventRecord.from_row(row)
+        except (TypeError, ValueError):
+            continue
+
+
+def _runs(weeks):
+    """ (first, last) for each run of consecutive weeks in a sorted list """
+    runs = []
+    for week in weeks:
+        if runs and runs[-1][1] == week - 1:
+            runs[-1][1] = week
+        else:
+            runs.append([week, week])
+    return [tuple(run) for run in runs]
+
+
+class EventCache:
+    """
+    Events loaded from the store a week at a time, keyed by Julian day and by id.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.by_day = {}        # {day: {id: EventRecord}}
+        self.by_id = {}         # {id: EventRecord}
+        self.intervals = {}     # {day: DayIndex}
+        self.loaded_weeks = set()
+        self.generation = 0     # bumped by clear(), so a fetch started before it is dropped
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def load_week(self, week):
+        first = week * 7
+        rows = self.store.events_between(day_to_iso(first), day_to_iso(first + 6))
+        for rec in _records(rows):
+            self._insert(rec)
+        self.loaded_weeks.add(week)
+
+    def load_around(self, day, radius):
+        """ make sure the weeks within radius of day's week are loaded """
+        for week in self.missing_weeks(day, radius):
+            self.load_week(week)
+
+    def missing_weeks(self, day, radius):
+        """ weeks within radius of day's week that are not loaded yet, in order """
+        center = week_of(day)
+        return [week for week in range(center - radius, center + radius + 1)
+                if week not in self.loaded_weeks]
+
+    def fetch_weeks(self, weeks):
+        """
+        (generation, {week: [EventRecord]}) read without touching the cache, so it
+        can run on a worker thread; hand the result to merge_weeks(). Queued writes
+        are not flushed: they only ever touch loaded weeks (see evict_far).
+        """
+        fetched = {week: [] for week in weeks}
+        generation = self.generation
+        for first, last in _runs(sorted(fetched)):
+            rows = self.store.events_between(day_to_iso(first * 7), day_to_iso(last * 7 + 6),
+                                             flush=False)
+            for rec in _records(rows):
+                fetched[week_of(rec.day)].append(rec)
+        return generation, fetched
+
+    def merge_weeks(self, result):
+        """
+        Add the weeks fetch_weeks() read. Weeks loaded in the meantime are kept
+        as they are, and nothing is merged if the cache was cleared since.
+        """
+        generation, fetched = result
+        if generation != self.generation:
+            return []
+        merged = [week for week in fetched if week not in self.loaded_weeks]
+        for week in merged:
+            for rec in fetched[week]:
+                self._insert(rec)
+            self.loaded_weeks.add(week)
+        return merged
+
+    def evict_far(self, day, radius):
+        """
+        drop weeks further than radius weeks from day's week; nothing is dropped
+        while the store has queued writes, so those always land in loaded weeks
+        """
+        if self.store.has_pending():
+            return
+        center = week_of(day)
+        far = {w for w in self.loaded_weeks if abs(w - center) > radius}
+        if not far:
+            return
+        self.loaded_weeks -= far
+        for d in [d for d in self.by_day if week_of(d) in far]:
+            for event_id in self.by_day.pop(d):
+                del self.by_id[event_id]
+            self.intervals.pop(d, None)
+
+    def clear(self):
+        """ forget everything, e.g. after rows were written behind the cache's back """
+        self.generation += 1
+        self.by_day.clear()
+        self.by_id.clear()
+        self.intervals.clear()
+        self.loaded_weeks.clear()
+
+    def day_events(self, day):
+        """ {id: EventRecord} for one day, loading its week first if needed """
+        if week_of(day) not in self.loaded_weeks:
+            self.load_week(week_of(day))
+        return self.by_day.get(day, {})
+
+    def day_index(self, day):
+        """ DayIndex for one day, loading its week first if needed """
+        if week_of(day) not in self.loaded_weeks:
+            self.load_week(week_of(day))
+        return self.intervals.get(day, _EMPTY_DAY)
+
+    def get(self, event_id):
+        return self.by_id.get(event_id)
+
+    def add(self, rec):
+        self._insert(rec)
+
+    def remove(self, event_id):
+        rec = self.by_id.pop(event_id, None)
+        if rec is not None:
+            del self.by_day[rec.day][event_id]
+            self.intervals[rec.day].remove(rec)
+        return rec
+
+    def update(self, event_id, **fields):
+        """ EventRecord.update() that keeps the day's interval index in step """
+        rec = self.by_id[event_id]
+        if "start" not in fields and "end" not in fields:
+            rec.update(**fields)
+            return rec
+        index = self.intervals[rec.day]
+        index.remove(rec)
+        try:
+            rec.update(**fields)
+        finally:
+            # a rejected update leaves rec as it was, and it must stay findable
+            index.insert(rec)
+        return rec
+
+    def _insert(self, rec):
+        self.by_day.setdefault(rec.day, {})[rec.id] = rec
+        self.by_id[rec.id] = rec
+        self.intervals.setdefault(rec.day, DayIndex()).insert(rec)
+
+
+def memory_report(events=10000, titles=200, places=100, colors=16, seed=0):
+    """
+    tracemalloc footprint of an EventCache holding `events` synthetic events
+    spread over roughly three years, with titles, places and colours drawn
+    from small pools the way real calendars repeat them.
+    """
+    rng = random.Random(seed)
+    color_pool = [rng.randrange(0x1000000) for _ in range(colors)]
+    first_day = iso_to_day("2024-01-01")
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        cache = EventCache(store=None)
+        for event_id in range(1, events + 1):
+            start = rng.randrange(0, 23 * 60)
+            # fresh str objects for every row, as sqlite3 returns them
+            row = (
+                event_id,
+                day_to_iso(first_day + rng.randrange(0, 3 * 365)),
+                f"Event title {rng.randrange(titles)}",
+                f"Place {rng.randrange(places)}, Some Street",
+                format_hhmm(start),
+                format_hhmm(min(start + rng.choice((30, 60, 90)), 24 * 60 - 1)),
+                format_color(rng.choice(color_pool)),
+            )
+            cache.add(EventRecord.from_row(row))
+        del row
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "events": len(cache),
+        "days": len(cache.by_day),
+        "bytes": size,
+        "bytes_per_10k_events": round(size * 10000 / max(len(cache), 1)),
+    }
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    report = memory_report(n)
+    print(f"{report['events']} events over {report['days']} days: "
+          f"{report['bytes'] / 1024:.1f} KiB, "
+          f"{report['bytes_per_10k_events'] / 1024:.1f} KiB per 10k events")
@@ -0,0 +1,859 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import re
+import threading
+
+from ChangeBus import (ChangeBus, Change, INSERT, UPDATE, DELETE, RELOAD, COMMIT,
+                       SERIES, TODO, REMINDER, SPECIAL_DATE)
+
+log = logging.getLogger(__name__)
+
+DB_PATH = "resources/misc/tempopilot.db"
+
+# Per-table databases used before everything moved into DB_PATH.
+# They are copied over once, the first time the pooled database is created.
+LEGACY_DBS = {
+    "todos": "resources/misc/todos.db",
+    "special_dates": "resources/misc/special_dates.db",
+    "reminders": "resources/misc/reminders.db",
+    "events": "resources/misc/events.db",
+}
+
+SCHEMA_VERSION = 10
+
+BUSY_TIMEOUT_MS = 5000
+
+TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS todos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        time TEXT,
+        description TEXT,
+        status TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS special_dates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        reason TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS reminders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        time TEXT,
+        description TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        date TEXT,
+        title TEXT,
+        place TEXT,
+        start TEXT,
+        end TEXT,
+        color TEXT
+    )
+    ''',
+]
+
+# Recurring events are stored once with their RRULE; recurrence_exceptions
+# lists the dates a series skips
+RECURRENCE_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS recurring_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        title TEXT,
+        place TEXT,
+        start TEXT,
+        end TEXT,
+        color TEXT,
+        rrule TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS recurrence_exceptions (
+        series_id INTEGER REFERENCES recurring_events (id) ON DELETE CASCADE,
+        date TEXT,
+        PRIMARY KEY (series_id, date)
+    )
+    ''',
+]
+
+SERIES_COLUMNS = ("title", "place", "start", "end", "color", "rrule")
+
+# Full-text index over everything the user types. rowid packs (source id, kind)
+# as id * 8 + kind so triggers can find a source row's entry without a scan.
+# table: (kind, kind number, title expression, detail expression)
+SEARCH_SOURCES = {
+    "events": ("event", 0, "new.title", "new.place"),
+    "todos": ("todo", 1, "new.description", "new.status"),
+    "reminders": ("reminder", 2, "new.description", "new.time"),
+    "special_dates": ("special_date", 3, "new.reason", "''"),
+    "recurring_events": ("series", 4, "new.title", "new.place"),
+}
+SEARCH_LIMIT = 200
+SEARCH_CHUNK = 20
+
+# Public holidays cached per (country, year); holiday_years records when each
+# year was fetched, so a year without holidays is not fetched again
+HOLIDAY_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS holidays (
+        country TEXT,
+        date TEXT,
+        name TEXT,
+        description TEXT
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_holidays_country_date ON holidays (country, date)',
+    '''
+    CREATE TABLE IF NOT EXISTS holiday_years (
+        country TEXT,
+        year INTEGER,
+        fetched_at REAL,
+        PRIMARY KEY (country, year)
+    )
+    ''',
+]
+
+# Daily horoscope text per (sign, date), so the dashboard never waits on the site
+HOROSCOPE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS horoscopes (
+        sign TEXT,
+        date TEXT,
+        text TEXT,
+        fetched_at REAL,
+        PRIMARY KEY (sign, date)
+    )
+'''
+
+# Deepseek answers per normalized request; used_at drives the LRU eviction
+RECOMMENDATION_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS recommendations (
+        key TEXT PRIMARY KEY,
+        items TEXT,
+        created_at REAL,
+        used_at REAL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_recommendations_used_at ON recommendations (used_at)',
+]
+
+# Per-day counts kept exact by triggers, so any date range is one indexed read.
+# busy_minutes adds up event durations (overlapping events count twice).
+SUMMARY_COLUMNS = ("events", "todos", "open_todos", "reminders", "special_dates", "busy_minutes")
+
+# Todo statuses that count as finished; anything else is open
+DONE_STATUSES = ("done", "completed", "complete", "finished")
+
+
+def _minutes_sql(column):
+    """ SQL for minutes after midnight of an "HH:MM" column """
+    return f"(CAST(substr({column}, 1, 2) AS INTEGER) * 60 + CAST(substr({column}, 4, 2) AS INTEGER))"
+
+
+_OPEN_TODO_SQL = "(lower(trim(coalesce({r}.status, ''))) NOT IN (%s))" % ", ".join(
+    f"'{status}'" for status in DONE_STATUSES)
+
+# table: {summary column: SQL delta for one row, with {r} standing for new / old}
+SUMMARY_SOURCES = {
+    "events": {
+        "events": "1",
+        "busy_minutes": f"max(0, {_minutes_sql('{r}.end')} - {_minutes_sql('{r}.start')})",
+    },
+    "todos": {"todos": "1", "open_todos": _OPEN_TODO_SQL},
+    "reminders": {"reminders": "1"},
+    "special_dates": {"special_dates": "1"},
+}
+
+# All date columns hold ISO "YYYY-MM-DD" text, so these support range scans
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_todos_date ON todos (date)',
+    'CREATE INDEX IF NOT EXISTS idx_reminders_date ON reminders (date)',
+    'CREATE INDEX IF NOT EXISTS idx_special_dates_date ON special_dates (date)',
+    'CREATE INDEX IF NOT EXISTS idx_events_date ON events (date, start)',
+]
+
+_MONTHS = {name: i for i, name in enumerate(
+    ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], start=1)}
+
+
+def _is_busy(error):
+    """ whether a sqlite3 error only means another connection holds the database """
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return isinstance(error, sqlite3.OperationalError) and "locked" in str(error)
+
+
+def to_iso_date(text):
+    """
+    Normalise a stored date to "YYYY-MM-DD".
+    Accepts ISO text and QDate.toString() text such as "Sat Oct 18 2026".
+    Returns None when the text is neither.
+    """
+    text = (text or "").strip()
+    try:
+        return datetime.date.fromisoformat(text).isoformat()
+    except ValueError:
+        pass
+    parts = text.split()
+    if len(parts) != 4 or parts[1] not in _MONTHS:
+        return None
+    try:
+        return datetime.date(int(parts[3]), _MONTHS[parts[1]], int(parts[2])).isoformat()
+    except ValueError:
+        return None
+
+
+class EventStore:
+    """
+    Single SQLite database holding todos, reminders, special dates and events.
+    Every date argument and date column is ISO "YYYY-MM-DD" text.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+        # every write is announced here as a ChangeBus.Change
+        self.changes = ChangeBus()
+
+        # Write-behind queue: enqueue() journals a write, flush() commits the batch
+        self.journal_path = path + ".pending"
+        self._lock = threading.RLock()
+        self._pending = []
+        self._journal = None
+        self._last_event_id = 0
+        self._replay_journal()
+        atexit.register(self.flush)
+
+    def connection(self):
+        """ long-lived connection for the calling thread """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # In WAL mode NORMAL only syncs at checkpoints, not on every commit
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            # so INSERT OR REPLACE fires the delete triggers for the row it replaces
+            conn.execute("PRAGMA recursive_triggers=ON")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        self.flush()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _init_schema(self):
+        """ run every migration newer than the database's user_version """
+        conn = self.connection()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        migrations = {
+            1: self._create_tables,
+            2: self._migrate_iso_dates,
+            3: self._add_import_keys,
+            4: self._add_recurring_events,
+            5: self._add_search_index,
+            6: self._add_daily_summary,
+            7: self._add_holiday_cache,
+            8: self._add_horoscope_cache,
+            9: self._add_recommendation_cache,
+            10: self._add_series_import_keys,
+        }
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            with conn:
+                # explicit BEGIN so DDL and user_version commit atomically
+                conn.execute("BEGIN")
+                migrations[target](conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+
+    def _create_tables(self, conn):
+        for statement in TABLES:
+            conn.execute(statement)
+        self._import_legacy(conn)
+
+    def _migrate_iso_dates(self, conn):
+        # todos, reminders and special_dates used to store QDate.toString() text
+        for table in ("todos", "reminders", "special_dates", "events"):
+            rows = conn.execute(f"SELECT id, date FROM {table}").fetchall()
+            updates = []
+            for row_id, date in rows:
+                iso = to_iso_date(date)
+                if iso is not None and iso != date:
+                    updates.append((iso, row_id))
+            conn.executemany(f"UPDATE {table} SET date = ? WHERE id = ?", updates)
+        for statement in INDEXES:
+            conn.execute(statement)
+
+    def _add_import_keys(self, conn):
+        # UID- or content-derived key of events that came from a calendar import
+        conn.execute('ALTER TABLE events ADD COLUMN import_key TEXT')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_events_import_key ON events (import_key)')
+
+    def _add_recurring_events(self, conn):
+        for statement in RECURRENCE_TABLES:
+            conn.execute(statement)
+
+    def _add_search_index(self, conn):
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+            "kind UNINDEXED, date UNINDEXED, title, detail, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        for table, (kind, number, title, detail) in SEARCH_SOURCES.items():
+            insert = (
+                f"INSERT OR REPLACE INTO search_index (rowid, kind, date, title, detail) "
+                f"VALUES (new.id * 8 + {number}, '{kind}', new.date, {title}, {detail});"
+            )
+            delete = f"DELETE FROM search_index WHERE rowid = old.id * 8 + {number};"
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN {insert} END")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN {delete} END")
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE ON {table} BEGIN {delete} {insert} END"
+            )
+            # index the rows that already exist
+            conn.execute(
+                f"INSERT OR REPLACE INTO search_index (rowid, kind, date, title, detail) "
+                f"SELECT id * 8 + {number}, '{kind}', date, "
+                f"{title.replace('new.', '')}, {detail.replace('new.', '')} FROM {table}"
+            )
+
+    def _add_daily_summary(self, conn):
+        columns = ", ".join(f"{col} INTEGER NOT NULL DEFAULT 0" for col in SUMMARY_COLUMNS)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS daily_summary (date TEXT PRIMARY KEY, {columns}) WITHOUT ROWID")
+        for table, deltas in SUMMARY_SOURCES.items():
+            add_new = _summary_upsert(deltas, "new", "+")
+            remove_old = _summary_upsert(deltas, "old", "-")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_summary_ai AFTER INSERT ON {table} "
+                         f"WHEN new.date IS NOT NULL BEGIN {add_new} END")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_summary_ad AFTER DELETE ON {table} "
+                         f"WHEN old.date IS NOT NULL BEGIN {remove_old} END")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_summary_au_old AFTER UPDATE ON {table} "
+                         f"WHEN old.date IS NOT NULL BEGIN {remove_old} END")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_summary_au_new AFTER UPDATE ON {table} "
+                         f"WHEN new.date IS NOT NULL BEGIN {add_new} END")
+            # summarise the rows that already exist
+            cols = ", ".join(deltas)
+            sums = ", ".join(f"SUM({expr.format(r=table)})" for expr in deltas.values())
+            sets = ", ".join(f"{col} = {col} + excluded.{col}" for col in deltas)
+            conn.execute(
+                f"INSERT INTO daily_summary (date, {cols}) "
+                f"SELECT date, {sums} FROM {table} WHERE date IS NOT NULL GROUP BY date "
+                f"ON CONFLICT (date) DO UPDATE SET {sets}"
+            )
+
+    def _add_holiday_cache(self, conn):
+        for statement in HOLIDAY_TABLES:
+            conn.execute(statement)
+
+    def _add_horoscope_cache(self, conn):
+        conn.execute(HOROSCOPE_TABLE)
+
+    def _add_recommendation_cache(self, conn):
+        for statement in RECOMMENDATION_TABLES:
+            conn.execute(statement)
+
+    def _add_series_import_keys(self, conn):
+        # UID- or content-derived key of series that came from a calendar import
+        conn.execute('ALTER TABLE recurring_events ADD COLUMN import_key TEXT')
+        conn.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_recurring_events_import_key ON recurring_events (import_key)'
+        )
+
+    def _import_legacy(self, conn):
+        for table, legacy_path in LEGACY_DBS.items():
+            if not os.path.exists(legacy_path):
+                continue
+            legacy = sqlite3.connect(legacy_path)
+            try:
+                exists = legacy.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()
+                if not exists:
+                    continue
+                cursor = legacy.execute(f"SELECT * FROM {table}")
+                columns = ", ".join(c[0] for c in cursor.description)
+                marks = ", ".join("?" * len(cursor.description))
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO {table} ({columns}) VALUES ({marks})", cursor
+                )
+            finally:
+                legacy.close()
+
+    """
+    Write-behind queue
+    """
+    def enqueue(self, sql, params=(), change=None):
+        """
+        Queue a write for the next flush(). It is appended to the journal first,
+        so a crash before the flush is replayed on the next start.
+        Queued writes must be idempotent (keyed inserts, updates, deletes).
+        change, if given, is published once the write is queued, and again
+        with op COMMIT once flush() has committed it.
+        """
+        params = list(params)
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._journal.write(json.dumps([sql, params]) + "\n")
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._pending.append((sql, params, change))
+        if change is not None:
+            self.changes.publish(change)
+
+    def has_pending(self):
+        return bool(self._pending)
+
+    def flush(self, wait=True):
+        """
+        Commit every queued write in one transaction, then clear the journal.
+        With wait=False a database held by another writer (a bulk import, say)
+        leaves the queue as it is and returns False instead of blocking.
+        Each (kind, date) of the committed writes is published once with op COMMIT.
+        A write that fails for any other reason is dropped on its own, moved to
+        the .failed file and its change published again with op RELOAD.
+        """
+        with self._lock:
+            if not self._pending:
+                return True
+            conn = self.connection()
+            if not wait:
+                conn.execute("PRAGMA busy_timeout = 0")
+            try:
+                with conn:
+                    if not conn.in_transaction:
+                        conn.execute("BEGIN")
+                    failed = self._apply(conn, self._pending)
+            except sqlite3.OperationalError:
+                if wait:
+                    raise
+                return False
+            finally:
+                if not wait:
+                    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            self._quarantine([(self._pending[i], error) for i, error in failed.items()])
+            dropped = [self._pending[i][2] for i in failed]
+            committed = list(dict.fromkeys(
+                (change.kind, change.date) for i, (_, _, change) in enumerate(self._pending)
+                if change is not None and i not in failed
+            ))
+            self._pending.clear()
+            self._journal.seek(0)
+            self._journal.truncate()
+        for change in dropped:
+            if change is not None:
+                # the write never reached the database: views reload what they cached for it
+                self.changes.publish(Change(change.kind, change.date, change.id, RELOAD))
+        for kind, date in committed:
+            self.changes.publish(Change(kind, date, None, COMMIT))
+        return True
+
+    @staticmethod
+    def _apply(conn, writes):
+        """
+        Run (sql, params, ...) writes inside the open transaction, each under its
+        own savepoint, and return {index: error} of those rolled back. Busy and
+        locked errors are raised, since the whole batch can be retried later.
+        """
+        failed = {}
+        for i, (sql, params, *_) in enumerate(writes):
+            conn.execute("SAVEPOINT queued_write")
+            try:
+                conn.execute(sql, params)
+            except sqlite3.Error as error:
+                if _is_busy(error):
+                    raise
+                conn.execute("ROLLBACK TO queued_write")
+                failed[i] = error
+            conn.execute("RELEASE queued_write")
+        return failed
+
+    def _quarantine(self, failed):
+        """ log [((sql, params, ...), error)] and append them to the .failed file next to the journal """
+        if not failed:
+            return
+        with open(self.journal_path + ".failed", "a", encoding="utf-8") as quarantine:
+            for (sql, params, *_), error in failed:
+                log.error("dropped queued write %s %r: %s", sql, params, error)
+                quarantine.write(json.dumps([sql, params, str(error)]) + "\n")
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        writes = []
+        with open(self.journal_path, encoding="utf-8", errors="replace") as journal:
+            for line in journal:
+                try:
+                    sql, params = json.loads(line)
+                except (TypeError, ValueError):
+                    # a torn or corrupt line (a crash mid-write) must not stop the app starting
+                    log.warning("skipped unreadable write-behind journal line %r", line)
+                    continue
+                writes.append((sql, params))
+        conn = self.connection()
+        with conn:
+            conn.execute("BEGIN")
+            failed = self._apply(conn, writes)
+        self._quarantine([(writes[i], error) for i, error in failed.items()])
+        os.remove(self.journal_path)
+
+    """
+    Todos
+    """
+    def todos_for_date(self, date):
+        return self.connection().execute(
+            'SELECT id, time, description, status FROM todos WHERE date = ?', (date,)
+        ).fetchall()
+
+    def count_todos(self, date):
+        return self.day_summary(date)["todos"]
+
+    def add_todo(self, date, time, description, status):
+        conn = self.connection()
+        with conn:
+            cursor = conn.execute(
+                'INSERT INTO todos (date, time, description, status) VALUES (?, ?, ?, ?)',
+                (date, time, description, status)
+            )
+        self.changes.publish(Change(TODO, date, cursor.lastrowid, INSERT))
+        return cursor.lastrowid
+
+    def set_todo_status(self, todo_id, status):
+        conn = self.connection()
+        with conn:
+            conn.execute('UPDATE todos SET status = ? WHERE id = ?', (status, todo_id))
+        self.changes.publish(Change(TODO, self._date_of("todos", todo_id), todo_id, UPDATE))
+
+    def delete_todo(self, todo_id):
+        date = self._date_of("todos", todo_id)
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM todos WHERE id = ?', (todo_id,))
+        self.changes.publish(Change(TODO, date, todo_id, DELETE))
+
+    def _date_of(self, table, row_id):
+        row = self.connection().execute(f'SELECT date FROM {table} WHERE id = ?', (row_id,)).fetchone()
+        return row[0] if row else None
+
+    """
+    Reminders
+    """
+    def reminders_for_date(self, date):
+        return self.connection().execute(
+            'SELECT id, time, description FROM reminders WHERE date = ?', (date,)
+        ).fetchall()
+
+    def count_reminders(self, date):
+        return self.day_summary(date)["reminders"]
+
+    def add_reminder(self, date, time, description):
+        conn = self.connection()
+        with conn:
+            cursor = conn.execute(
+                'INSERT INTO reminders (date, time, description) VALUES (?, ?, ?)',
+                (date, time, description)
+            )
+        self.changes.publish(Change(REMINDER, date, cursor.lastrowid, INSERT))
+        return cursor.lastrowid
+
+    def delete_reminder(self, reminder_id):
+        date = self._date_of("reminders", reminder_id)
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM reminders WHERE id = ?', (reminder_id,))
+        self.changes.publish(Change(REMINDER, date, reminder_id, DELETE))
+
+    """
+    Special dates
+    """
+    def special_dates(self):
+        return self.connection().execute('SELECT date, reason FROM special_dates').fetchall()
+
+    def special_dates_between(self, start, end=None):
+        """ (date, reason) rows with start <= date <= end, in date order """
+        if end is None:
+            end = "9999-12-31"
+        return self.connection().execute(
+            'SELECT date, reason FROM special_dates WHERE date BETWEEN ? AND ? ORDER BY date',
+            (start, end)
+        ).fetchall()
+
+    def special_date_reason(self, date):
+        row = self.connection().execute(
+            'SELECT reason FROM special_dates WHERE date = ?', (date,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def count_special_dates(self, date):
+        return self.day_summary(date)["special_dates"]
+
+    def set_special_date(self, date, reason):
+        conn = self.connection()
+        with conn:
+            cursor = conn.execute('REPLACE INTO special_dates (date, reason) VALUES (?, ?)', (date, reason))
+        self.changes.publish(Change(SPECIAL_DATE, date, cursor.lastrowid, INSERT))
+
+    def clear_special_date(self, date):
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM special_dates WHERE date = ?', (date,))
+        self.changes.publish(Change(SPECIAL_DATE, date, None, DELETE))
+
+    """
+    Events
+    """
+    def events_between(self, start, end, flush=True):
+        """
+        (id, date, title, place, start, end, color) rows with start <= date <= end.
+        Queued writes are committed first unless flush=False.
+        """
+        if flush:
+            self.flush()
+        return self.connection().execute(
+            'SELECT id, date, title, place, start, end, color FROM events '
+            'WHERE date BETWEEN ? AND ? ORDER BY date, start',
+            (start, end)
+        ).fetchall()
+
+    def allocate_event_id(self):
+        """
+        Reserve an events.id up front, so a queued insert knows its key
+        before it reaches the database.
+        """
+        return self.allocate_event_ids(1).start
+
+    def allocate_event_ids(self, count):
+        """ reserve `count` consecutive events.id values, returned as a range """
+        with self._lock:
+            db_max = self.connection().execute('SELECT MAX(id) FROM events').fetchone()[0] or 0
+            first = max(self._last_event_id, db_max) + 1
+            self._last_event_id = first + count - 1
+            return range(first, first + count)
+
+    """
+    Recurring events
+    """
+    def recurring_events(self):
+        """ (id, date, title, place, start, end, color, rrule) rows; date is the first occurrence """
+        return self.connection().execute(
+            'SELECT id, date, title, place, start, end, color, rrule FROM recurring_events'
+        ).fetchall()
+
+    def recurrence_exceptions(self):
+        return self.connection().execute(
+            'SELECT series_id, date FROM recurrence_exceptions'
+        ).fetchall()
+
+    def add_recurring_event(self, date, title, place, start, end, color, rrule):
+        conn = self.connection()
+        with conn:
+            cursor = conn.execute(
+                'INSERT INTO recurring_events (date, title, place, start, end, color, rrule) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (date, title, place, start, end, color, rrule)
+            )
+        self.changes.publish(Change(SERIES, date, cursor.lastrowid, INSERT))
+        return cursor.lastrowid
+
+    def update_recurring_event(self, series_id, **columns):
+        unknown = set(columns) - set(SERIES_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown recurring_events columns {sorted(unknown)}")
+        assignments = ", ".join(f"{col} = ?" for col in columns)
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                f'UPDATE recurring_events SET {assignments} WHERE id = ?',
+                (*columns.values(), series_id)
+            )
+        self.changes.publish(Change(SERIES, None, series_id, UPDATE))
+
+    def delete_recurring_event(self, series_id):
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM recurring_events WHERE id = ?', (series_id,))
+        self.changes.publish(Change(SERIES, None, series_id, DELETE))
+
+    def add_recurrence_exception(self, series_id, date):
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO recurrence_exceptions (series_id, date) VALUES (?, ?)',
+                (series_id, date)
+            )
+        self.changes.publish(Change(SERIES, date, series_id, UPDATE))
+
+    """
+    Daily summary
+    """
+    def summary_between(self, start, end, flush=False):
+        """
+        {date: {column: value}} for dates in start..end that have anything on them.
+        Queued writes are not committed first unless flush=True; their COMMIT
+        change tells when the summary has caught up.
+        """
+        if flush:
+            self.flush()
+        rows = self.connection().execute(
+            f'SELECT date, {", ".join(SUMMARY_COLUMNS)} FROM daily_summary '
+            f'WHERE date BETWEEN ? AND ?',
+            (start, end)
+        ).fetchall()
+        return {row[0]: dict(zip(SUMMARY_COLUMNS, row[1:])) for row in rows}
+
+    def day_summary(self, date, flush=False):
+        """ {column: value} for one date, all zero when nothing is on it """
+        return self.summary_between(date, date, flush).get(date, dict.fromkeys(SUMMARY_COLUMNS, 0))
+
+    """
+    Holidays
+    """
+    def holidays_on(self, country, date):
+        return self.connection().execute(
+            'SELECT name, description FROM holidays WHERE country = ? AND date = ?', (country, date)
+        ).fetchall()
+
+    def holiday_year_fetched_at(self, country, year):
+        """ time.time() of the last fetch of (country, year), or None if it was never fetched """
+        row = self.connection().execute(
+            'SELECT fetched_at FROM holiday_years WHERE country = ? AND year = ?', (country, year)
+        ).fetchone()
+        return row[0] if row else None
+
+    def replace_holiday_year(self, country, year, holidays, fetched_at):
+        """ swap in a freshly fetched year of (date, name, description) rows """
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                'DELETE FROM holidays WHERE country = ? AND date BETWEEN ? AND ?',
+                (country, f"{year:04d}-01-01", f"{year:04d}-12-31")
+            )
+            conn.executemany(
+                'INSERT INTO holidays (country, date, name, description) VALUES (?, ?, ?, ?)',
+                [(country, date, name, description) for date, name, description in holidays]
+            )
+            conn.execute(
+                'REPLACE INTO holiday_years (country, year, fetched_at) VALUES (?, ?, ?)',
+                (country, year, fetched_at)
+            )
+
+    """
+    Horoscopes
+    """
+    def horoscope(self, sign, date):
+        """ cached horoscope text of sign on an ISO date, or None """
+        row = self.connection().execute(
+            'SELECT text FROM horoscopes WHERE sign = ? AND date = ?', (sign, date)
+        ).fetchone()
+        return row[0] if row else None
+
+    def save_horoscope(self, sign, date, text, fetched_at):
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                'REPLACE INTO horoscopes (sign, date, text, fetched_at) VALUES (?, ?, ?, ?)',
+                (sign, date, text, fetched_at)
+            )
+
+    """
+    Recommendations
+    """
+    def cached_recommendations(self, key, used_at):
+        """ (items JSON, created_at) stored under key, marked as used at used_at; None if absent """
+        conn = self.connection()
+        with conn:
+            row = conn.execute(
+                'SELECT items, created_at FROM recommendations WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                conn.execute('UPDATE recommendations SET used_at = ? WHERE key = ?', (used_at, key))
+        return row
+
+    def save_recommendations(self, key, items, created_at, max_entries):
+        """ store items JSON under key, then drop the least recently used rows beyond max_entries """
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                'REPLACE INTO recommendations (key, items, created_at, used_at) VALUES (?, ?, ?, ?)',
+                (key, items, created_at, created_at)
+            )
+            conn.execute(
+                'DELETE FROM recommendations WHERE key IN '
+                '(SELECT key FROM recommendations ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+                (max_entries,)
+            )
+
+    def delete_recommendations(self, key):
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM recommendations WHERE key = ?', (key,))
+
+    """
+    Search
+    """
+    def search(self, text, limit=SEARCH_LIMIT):
+        """
+        Yield (kind, id, date, title, detail) matches for what the user typed,
+        best first. Every word is matched as a prefix, so "den" finds "Dentist".
+        Rows are fetched SEARCH_CHUNK at a time as the caller iterates.
+        """
+        query = fts_query(text)
+        if not query:
+            return
+        self.flush()
+        cursor = self.connection().execute(
+            'SELECT kind, rowid >> 3, date, title, detail FROM search_index '
+            'WHERE search_index MATCH ? ORDER BY bm25(search_index, 0, 0, 10.0, 1.0) LIMIT ?',
+            (query, limit)
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(SEARCH_CHUNK)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+
+def _summary_upsert(deltas, row, sign):
+    """ trigger statement adding (sign "+") or removing (sign "-") one row's deltas """
+    cols = ", ".join(deltas)
+    values = ", ".join(f"{sign}({expr.format(r=row)})" for expr in deltas.values())
+    sets = ", ".join(f"{col} = {col} + excluded.{col}" for col in deltas)
+    return (f"INSERT INTO daily_summary (date, {cols}) VALUES ({row}.date, {values}) "
+            f"ON CONFLICT (date) DO UPDATE SET {sets};")
+
+
+def fts_query(text):
+    """ user text -> FTS5 query matching every word as a prefix, e.g. 'den vis' -> '"den"* "vis"*' """
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+_store = None
+
+
+def get_store():
+    """ shared EventStore instance, opened on first use """
+    global _store
+    if _store is None:
+        _store = EventStore()
+    return _store
@@ -0,0 +1,293 @@
+import argparse
+import csv
+import datetime
+import io
+import os
+import re
+
+from EventCache import iso_to_day, day_to_iso
+from EventStore import get_store, DONE_STATUSES
+from Recurrence import Rule
+
+CHUNK_SIZE = 1000
+TABLES = ("events", "recurring_events", "todos", "reminders")
+FORMATS = ("ics", "csv")
+
+QUERIES = {
+    "events": 'SELECT id, date, title, place, start, end, color FROM events',
+    "recurring_events": 'SELECT id, date, title, place, start, end, color, rrule FROM recurring_events',
+    "todos": 'SELECT id, date, time, description, status FROM todos',
+    "reminders": 'SELECT id, date, time, description FROM reminders',
+}
+
+# One CSV for all tables; columns a table does not have stay empty.
+# exdates lists a series' skipped dates separated by ";"
+CSV_COLUMNS = ("type", "id", "date", "start", "end", "title", "place", "color", "status", "rrule", "exdates")
+
+_TIME = re.compile(r"^(\d{1,2})(?::(\d{2}))?$")
+
+
+def iter_rows(conn, table, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """
+    Rows of one table in date order, optionally limited to start <= date <= end.
+    The cursor is drained with fetchmany, so at most chunk_size rows are held at once.
+    """
+    sql = QUERIES[table]
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("date >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("date <= ?")
+        params.append(end)
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY date, id"
+    cursor = conn.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def iter_series(conn, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """
+    recurring_events rows with an occurrence in start..end, each with the tuple
+    of its exception dates appended. date is the first occurrence, so a series
+    that began before start is kept unless its rule ends before start.
+    """
+    for row in iter_rows(conn, "recurring_events", None, end, chunk_size):
+        if start is not None:
+            try:
+                last = Rule(row[7]).last_day(iso_to_day(row[1]))
+            except (TypeError, ValueError, KeyError):
+                last = None
+            if last is not None and day_to_iso(last) < start:
+                continue
+        exdates = tuple(date for (date,) in conn.execute(
+            'SELECT date FROM recurrence_exceptions WHERE series_id = ? ORDER BY date', (row[0],)
+        ))
+        yield (*row, exdates)
+
+
+def table_rows(conn, table, start=None, end=None, chunk_size=CHUNK_SIZE):
+    if table == "recurring_events":
+        return iter_series(conn, start, end, chunk_size)
+    return iter_rows(conn, table, start, end, chunk_size)
+
+
+def _parse_time(text):
+    """ free-text todo / reminder time such as "9", "9:30" or "09:30" -> (h, m), else None """
+    match = _TIME.match((text or "").strip())
+    if not match:
+        return None
+    h, m = int(match.group(1)), int(match.group(2) or 0)
+    return (h, m) if h < 24 and m < 60 else None
+
+
+def _escape(text):
+    return (str(text or "").replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _fold(line):
+    """ RFC 5545 line folding at 75 octets, without splitting a UTF-8 sequence """
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while len(data) > limit:
+        cut = limit
+        while cut and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+        limit = 74      # continuation lines start with a space
+    parts.append(data.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_date(date_str):
+    return date_str.replace("-", "")
+
+
+def _ics_datetime(date_str, hhmm):
+    h, m = hhmm
+    return f"{_ics_date(date_str)}T{h:02d}{m:02d}00"
+
+
+def _event_component(row, stamp, kind="event"):
+    event_id, date_str, title, place, start_s, end_s, color = row
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:tempopilot-{kind}-{event_id}",
+        f"DTSTAMP:{stamp}",
+    ]
+    start, end = _parse_time(start_s), _parse_time(end_s)
+    if start is not None:
+        lines.append(f"DTSTART:{_ics_datetime(date_str, start)}")
+        if end is not None:
+            lines.append(f"DTEND:{_ics_datetime(date_str, end)}")
+    else:
+        lines.append(f"DTSTART;VALUE=DATE:{_ics_date(date_str)}")
+    lines.append(f"SUMMARY:{_escape(title)}")
+    if place:
+        lines.append(f"LOCATION:{_escape(place)}")
+    if color:
+        lines.append(f"COLOR:{color}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def _series_component(row, stamp):
+    *event, rrule, exdates = row
+    lines = _event_component(event, stamp, "series")
+    extra = [f"RRULE:{rrule}"]
+    if exdates:
+        # EXDATE has to match DTSTART: date-times for timed series, dates otherwise
+        start = _parse_time(event[4])
+        if start is not None:
+            extra.append("EXDATE:" + ",".join(_ics_datetime(date, start) for date in exdates))
+        else:
+            extra.append("EXDATE;VALUE=DATE:" + ",".join(_ics_date(date) for date in exdates))
+    lines[-1:-1] = extra
+    return lines
+
+
+def _todo_component(row, stamp):
+    todo_id, date_str, time_s, description, status = row
+    due = _parse_time(time_s)
+    done = (status or "").strip().lower() in DONE_STATUSES
+    return [
+        "BEGIN:VTODO",
+        f"UID:tempopilot-todo-{todo_id}",
+        f"DTSTAMP:{stamp}",
+        f"DUE:{_ics_datetime(date_str, due)}" if due else f"DUE;VALUE=DATE:{_ics_date(date_str)}",
+        f"SUMMARY:{_escape(description)}",
+        f"STATUS:{'COMPLETED' if done else 'NEEDS-ACTION'}",
+        f"DESCRIPTION:{_escape(status)}",
+        "END:VTODO",
+    ]
+
+
+def _reminder_component(row, stamp):
+    reminder_id, date_str, time_s, description = row
+    at = _parse_time(time_s)
+    return [
+        "BEGIN:VEVENT",
+        f"UID:tempopilot-reminder-{reminder_id}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{_ics_datetime(date_str, at)}" if at else f"DTSTART;VALUE=DATE:{_ics_date(date_str)}",
+        f"SUMMARY:{_escape(description)}",
+        "BEGIN:VALARM",
+        "ACTION:DISPLAY",
+        "TRIGGER:PT0M",
+        f"DESCRIPTION:{_escape(description)}",
+        "END:VALARM",
+        "END:VEVENT",
+    ]
+
+
+_COMPONENTS = {
+    "events": _event_component,
+    "recurring_events": _series_component,
+    "todos": _todo_component,
+    "reminders": _reminder_component,
+}
+
+
+def _csv_record(table, row):
+    if table == "events":
+        event_id, date_str, title, place, start_s, end_s, color = row
+        return ("event", event_id, date_str, start_s, end_s, title, place, color, "", "", "")
+    if table == "recurring_events":
+        series_id, date_str, title, place, start_s, end_s, color, rrule, exdates = row
+        return ("series", series_id, date_str, start_s, end_s, title, place, color, "", rrule, ";".join(exdates))
+    if table == "todos":
+        todo_id, date_str, time_s, description, status = row
+        return ("todo", todo_id, date_str, time_s, "", description, "", "", status, "", "")
+    reminder_id, date_str, time_s, description = row
+    return ("reminder", reminder_id, date_str, time_s, "", description, "", "", "", "", "")
+
+
+def generate_ics(conn, tables=TABLES, start=None, end=None, chunk_size=CHUNK_SIZE, counts=None):
+    """ yield an iCalendar document piece by piece, one chunk of rows per piece """
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//TempoPilot//Export//EN\r\n"
+    for table in tables:
+        component = _COMPONENTS[table]
+        parts = []
+        for n, row in enumerate(table_rows(conn, table, start, end, chunk_size), start=1):
+            parts.extend(_fold(line) for line in component(row, stamp))
+            if counts is not None:
+                counts[table] = n
+            if n % chunk_size == 0:
+                yield "".join(parts)
+                parts = []
+        if parts:
+            yield "".join(parts)
+    yield "END:VCALENDAR\r\n"
+
+
+def generate_csv(conn, tables=TABLES, start=None, end=None, chunk_size=CHUNK_SIZE, counts=None):
+    """ yield a CSV document (header first) piece by piece, one chunk of rows per piece """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for table in tables:
+        for n, row in enumerate(table_rows(conn, table, start, end, chunk_size), start=1):
+            writer.writerow(_csv_record(table, row))
+            if counts is not None:
+                counts[table] = n
+            if n % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue()
+
+
+GENERATORS = {"ics": generate_ics, "csv": generate_csv}
+
+
+def export(path, fmt=None, tables=TABLES, start=None, end=None, store=None, progress=None):
+    """
+    Write events / recurring events / todos / reminders to path as ICS or CSV
+    (taken from the extension when fmt is None), optionally limited to ISO
+    dates start..end. A series is written once, with its RRULE and EXDATEs.
+    Rows are streamed from the database and written chunk by chunk.
+    progress, if given, is called after each chunk with the rows written so far.
+    Returns {table: rows exported}.
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in GENERATORS:
+        raise ValueError(f"unknown export format {fmt!r}, expected one of {FORMATS}")
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        raise ValueError(f"unknown tables {sorted(unknown)}, expected some of {TABLES}")
+
+    store = store or get_store()
+    store.flush()
+    conn = store.connection()
+    counts = dict.fromkeys(tables, 0)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for piece in GENERATORS[fmt](conn, tables, start, end, counts=counts):
+            f.write(piece)
+            if progress is not None:
+                progress(sum(counts.values()))
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export TempoPilot data to ICS or CSV.")
+    parser.add_argument("path", help="output file, .ics or .csv")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--tables", nargs="+", choices=TABLES, default=list(TABLES))
+    parser.add_argument("--from", dest="start", metavar="YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", metavar="YYYY-MM-DD")
+    args = parser.parse_args()
+    print(export(args.path, args.format, args.tables, args.start, args.end))
@@ -0,0 +1,91 @@
+from EventCache import iso_to_day, day_to_iso, parse_hhmm
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_WORK_HOURS = ((9 * 60, 18 * 60),)
+
+_BUSY = 1
+_ALL_BUSY = bytes([_BUSY]) * MINUTES_PER_DAY
+
+
+def find_free_slots(store, start_date, end_date, min_duration,
+                    work_hours=DEFAULT_WORK_HOURS, buffer=0, excluded_weekdays=(),
+                    not_before=None, rank="soonest", limit=None, series=None):
+    """
+    Free slots of at least min_duration minutes between start_date and
+    end_date (ISO "YYYY-MM-DD", inclusive), as [(date, start, end), ...]
+    with start / end in minutes after midnight.
+
+    work_hours        (start, end) minute windows that may be booked each day
+    buffer            minutes kept clear before and after every event
+    excluded_weekdays ISO weekday numbers (1 = Monday ... 7 = Sunday) to skip
+    not_before        minute on start_date before which nothing is offered
+    rank              "soonest" (chronological) or "roomiest" (longest first)
+    series            Recurrence.SeriesCache whose occurrences count as busy too
+
+    All days are laid out in one minute-resolution bytearray. Events, buffers
+    and closed hours are stamped in with slice assignment and free runs are
+    found with bytearray.find, so the work per day happens in C rather than
+    in a per-minute Python loop.
+    """
+    first = iso_to_day(start_date)
+    days = iso_to_day(end_date) - first + 1
+    if days <= 0 or min_duration <= 0:
+        return []
+
+    # 1) 每天的模板：工作时间为空闲 (0)，其余为占用 (1)
+    template = bytearray(_ALL_BUSY)
+    for a, b in work_hours:
+        a, b = max(a, 0), min(b, MINUTES_PER_DAY)
+        if b > a:
+            template[a:b] = bytes(b - a)
+    excluded = set(excluded_weekdays)
+    occupancy = bytearray()
+    for d in range(days):
+        weekday = (first + d) % 7 + 1    # Julian day 0 is a Monday
+        occupancy += _ALL_BUSY if weekday in excluded else template
+
+    if not_before:
+        cut = min(not_before, MINUTES_PER_DAY)
+        occupancy[0:cut] = _ALL_BUSY[:cut]
+
+    # 2) 一次范围查询取出所有事件，连同缓冲时间一起标记为占用
+    for _id, date_str, _title, _place, start_s, end_s, _color in store.events_between(start_date, end_date):
+        try:
+            offset = (iso_to_day(date_str) - first) * MINUTES_PER_DAY
+            a = max(parse_hhmm(start_s) - buffer, 0)
+            b = min(parse_hhmm(end_s) + buffer, MINUTES_PER_DAY)
+        except (TypeError, ValueError):
+            continue
+        if b > a:
+            occupancy[offset + a:offset + b] = _ALL_BUSY[:b - a]
+    if series is not None:
+        for d in range(days):
+            offset = d * MINUTES_PER_DAY
+            for rec in series.day_occurrences(first + d).values():
+                a = max(rec.start - buffer, 0)
+                b = min(rec.end + buffer, MINUTES_PER_DAY)
+                if b > a:
+                    occupancy[offset + a:offset + b] = _ALL_BUSY[:b - a]
+
+    # 3) 找出每天足够长的连续空闲段
+    slots = []
+    for d in range(days):
+        base = d * MINUTES_PER_DAY
+        day_end = base + MINUTES_PER_DAY
+        pos = base
+        while pos < day_end:
+            a = occupancy.find(0, pos, day_end)
+            if a < 0:
+                break
+            b = occupancy.find(_BUSY, a, day_end)
+            if b < 0:
+                b = day_end
+            if b - a >= min_duration:
+                slots.append((day_to_iso(first + d), a - base, b - base))
+            pos = b
+
+    if rank == "roomiest":
+        slots.sort(key=lambda slot: slot[1] - slot[2])
+    elif rank != "soonest":
+        raise ValueError(f"unknown rank {rank!r}")
+    return slots[:limit] if limit else slots
@@ -0,0 +1,113 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+from EventStore import get_store
+
+API_URL = "https://calendarific.com/api/v2/holidays"
+
+# A (country, year) older than this is served as-is and refreshed in the background
+HOLIDAY_TTL_SECONDS = 30 * 24 * 3600
+# After a failed fetch the year is not asked for again for this long
+RETRY_AFTER_SECONDS = 5 * 60
+
+
+class HolidaysUnavailable(Exception):
+    """ a year that was never cached could not be fetched, so "no holidays" would be a guess """
+
+
+def fetch_year(api_key, country, year, client=None):
+    """
+    Every holiday of one year from Calendarific, as [(iso date, name, description), ...].
+    Raises requests.RequestException (or ValueError for an unusable reply) on failure.
+    """
+    from Http import get_client     # requests loads on the first fetch, not with the calendar
+
+    response = (client or get_client()).get(
+        API_URL,
+        params={"api_key": api_key, "country": country, "year": year},
+    )
+    response.raise_for_status()
+    holidays = response.json()["response"]["holidays"]
+    if not isinstance(holidays, list):
+        raise ValueError("unexpected Calendarific response")
+    # seasons carry a full timestamp ("2026-03-20T10:01:25-04:00"); only the day matters
+    return [(h["date"]["iso"][:10], h.get("name", ""), h.get("description", "")) for h in holidays]
+
+
+def fetch_timeout_seconds():
+    """ longest fetch_year can run before the HTTP client gives up on Calendarific """
+    from Http import worst_case_seconds
+
+    return worst_case_seconds(urlsplit(API_URL).hostname)
+
+
+class HolidayCache:
+    """
+    Holidays held in SQLite per (country, year). A year is fetched with one
+    API call the first time any of its dates is looked up; after that every
+    lookup is local, and years older than ttl are refreshed in the background.
+    """
+
+    def __init__(self, api_key, country, store=None, ttl=HOLIDAY_TTL_SECONDS):
+        self.api_key = api_key
+        self.country = country
+        self.store = store or get_store()
+        self.ttl = ttl
+        self._refreshing = set()
+        self._failed_at = {}    # {year: time.time() of the last failed fetch}
+        self._lock = threading.Lock()
+
+    def configure(self, api_key, country):
+        """ switch key / country; years that failed under the old ones may be asked for again """
+        self.api_key = api_key
+        self.country = country
+        self._failed_at.clear()
+
+    def holidays_on(self, date):
+        """
+        [{"name": ..., "description": ...}, ...] for an ISO date. Blocks on the
+        network only the first time the date's year is needed, and raises
+        HolidaysUnavailable when that fetch fails. A stale year is still served.
+        """
+        if not self.api_key or not self.country:
+            return []
+        year = int(date[:4])
+        fetched_at = self.store.holiday_year_fetched_at(self.country, year)
+        if fetched_at is None:
+            if not self.refresh(year):
+                raise HolidaysUnavailable(f"holidays for {self.country} {year} could not be fetched")
+        elif time.time() - fetched_at > self.ttl:
+            self.refresh_in_background(year)
+        return [{"name": name, "description": description}
+                for name, description in self.store.holidays_on(self.country, date)]
+
+    def refresh(self, year):
+        """ fetch and store one year; returns False (keeping what is cached) on failure """
+        if time.time() - self._failed_at.get(year, 0) < RETRY_AFTER_SECONDS:
+            return False
+        import requests
+
+        try:
+            holidays = fetch_year(self.api_key, self.country, year)
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            self._failed_at[year] = time.time()
+            return False
+        self._failed_at.pop(year, None)
+        self.store.replace_holiday_year(self.country, year, holidays, time.time())
+        return True
+
+    def refresh_in_background(self, year):
+        with self._lock:
+            if year in self._refreshing:
+                return
+            self._refreshing.add(year)
+
+        def run():
+            try:
+                self.refresh(year)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(year)
+
+        threading.Thread(target=run, name=f"holidays-{self.country}-{year}", daemon=True).start()
@@ -0,0 +1,89 @@
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from EventStore import get_store
+
+DAILY_URL = "https://www.horoscope.com/us/horoscopes/general/horoscope-general-daily-{day}.aspx"
+ARCHIVE_URL = "https://www.horoscope.com/us/horoscopes/general/horoscope-archive.aspx"
+
+ZODIAC_SIGNS = {
+    "Aries": 1,
+    "Taurus": 2,
+    "Gemini": 3,
+    "Cancer": 4,
+    "Leo": 5,
+    "Virgo": 6,
+    "Libra": 7,
+    "Scorpio": 8,
+    "Sagittarius": 9,
+    "Capricorn": 10,
+    "Aquarius": 11,
+    "Pisces": 12
+}
+
+# The site's relative day pages, as offsets from today; all three are prefetched
+PREFETCH_DAYS = {"yesterday": -1, "today": 0, "tomorrow": 1}
+
+
+def get_horoscope(zodiac_sign, day, client=None):
+    """
+    Horoscope text of a sign number for "today" / "yesterday" / "tomorrow" or
+    an ISO date. Raises requests.RequestException, or ValueError when the page
+    has no horoscope in it.
+    """
+    # requests / bs4 load on the first fetch, not with the dashboard
+    from bs4 import BeautifulSoup, SoupStrainer
+    from Http import get_client
+
+    client = client or get_client()
+    if "-" not in day:
+        res = client.get(DAILY_URL.format(day=day), params={"sign": zodiac_sign})
+    else:
+        res = client.get(ARCHIVE_URL, params={"sign": zodiac_sign, "laDate": day.replace("-", "")})
+    res.raise_for_status()
+
+    # Only this div is built into a tree, the rest of the page is skipped while parsing
+    main_horoscope = SoupStrainer("div", attrs={"class": "main-horoscope"})
+    soup = BeautifulSoup(res.content, "html.parser", parse_only=main_horoscope)
+    data = soup.find("div")
+    if data is None or data.p is None:
+        raise ValueError("no horoscope found on the page")
+    return data.p.text
+
+
+class HoroscopeCache:
+    """
+    Horoscopes of one sign held in SQLite per date. Startup reads the cache
+    only; refresh() fetches the days around today that are not cached yet.
+    """
+
+    def __init__(self, sign, store=None):
+        self.sign = sign
+        self.store = store or get_store()
+
+    def cached(self, date=None):
+        """ stored text for a datetime.date (today by default), or None """
+        return self.store.horoscope(self.sign, (date or datetime.date.today()).isoformat())
+
+    def refresh(self):
+        """
+        Fetch yesterday, today and tomorrow concurrently, skipping days already
+        cached, and store what arrives. Returns today's text, None if unavailable.
+        """
+        today = datetime.date.today()
+        missing = {day: today + datetime.timedelta(days=offset) for day, offset in PREFETCH_DAYS.items()}
+        missing = {day: date for day, date in missing.items() if self.cached(date) is None}
+        if missing:
+            import requests
+
+            number = ZODIAC_SIGNS[self.sign]
+            with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+                futures = {day: pool.submit(get_horoscope, number, day) for day in missing}
+            for day, future in futures.items():
+                try:
+                    text = future.result()
+                except (requests.RequestException, ValueError):
+                    continue
+                self.store.save_horoscope(self.sign, missing[day].isoformat(), text, time.time())
+        return self.cached(today)
@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HostPolicy:
+    """ how the client treats one host """
+
+    __slots__ = ("timeout", "max_concurrency", "failure_threshold", "reset_after")
+
+    def __init__(self, timeout=(3.05, 10), max_concurrency=4, failure_threshold=3, reset_after=60):
+        self.timeout = timeout                      # (connect, read) seconds
+        self.max_concurrency = max_concurrency      # requests in flight at once
+        self.failure_threshold = failure_threshold  # consecutive failures that open the circuit
+        self.reset_after = reset_after              # seconds before an open circuit lets a trial through
+
+
+DEFAULT_POLICY = HostPolicy()
+HOST_POLICIES = {
+    "calendarific.com": HostPolicy(timeout=(3.05, 5), max_concurrency=2),
+    "www.horoscope.com": HostPolicy(timeout=(3.05, 8), max_concurrency=3),
+}
+
+# Retried by the transport with exponential backoff (0.5 s, 1 s) before a failure counts
+RETRIES = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET", "HEAD"), raise_on_status=False)
+POOL_SIZE = 10
+CACHE_ENTRIES = 256
+
+
+def worst_case_seconds(host, retries=None):
+    """
+    Longest a get() to host can take when every try times out: each try's
+    connect + read timeout plus an upper bound on the backoff between tries.
+    A server's Retry-After, or a reply trickling in under the read timeout,
+    can still take longer.
+    """
+    retries = retries or RETRIES
+    connect, read = HOST_POLICIES.get(host, DEFAULT_POLICY).timeout
+    tries = (retries.total or 0) + 1
+    backoff = sum(min(retries.backoff_factor * 2 ** n, Retry.DEFAULT_BACKOFF_MAX) for n in range(1, tries))
+    return tries * (connect + read) + backoff
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """ raised without touching the network while a host's circuit is open """
+
+
+class _Host:
+    """ circuit breaker, concurrency limit and metrics of one host """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.slots = threading.BoundedSemaphore(policy.max_concurrency)
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.stats = {"requests": 0, "errors": 0, "not_modified": 0, "rejected": 0,
+                      "latency_total": 0.0, "latency_max": 0.0, "last_status": None}
+
+    def admit(self):
+        """ whether a request may go out now (closed circuit, or the one half-open trial) """
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.policy.reset_after and not self.trial_running:
+                self.trial_running = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def end_trial(self):
+        with self.lock:
+            self.trial_running = False
+
+    def record(self, latency, status=None, failed=False):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["latency_total"] += latency
+            self.stats["latency_max"] = max(self.stats["latency_max"], latency)
+            self.stats["last_status"] = status
+            self.trial_running = False
+            if failed:
+                self.stats["errors"] += 1
+                self.failures += 1
+                if self.failures >= self.policy.failure_threshold or self.opened_at is not None:
+                    self.opened_at = time.monotonic()
+            else:
+                self.failures = 0
+                self.opened_at = None
+
+
+class HttpClient:
+    """
+    The one way out to the network: a pooled, retrying requests.Session with
+    per-host timeouts, concurrency limits and circuit breakers, plus
+    ETag / Last-Modified revalidation of GET responses.
+    """
+
+    def __init__(self, session=None, policies=None, cache_entries=CACHE_ENTRIES):
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=RETRIES)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.policies = dict(HOST_POLICIES if policies is None else policies)
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()     # {url: (validators, status, headers, content, encoding)}
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _Host(self.policies.get(host, DEFAULT_POLICY))
+            return state
+
+    def get(self, url, params=None, headers=None, timeout=None, conditional=True):
+        """
+        GET url and return the requests.Response. With conditional=True a
+        cached copy is revalidated with If-None-Match / If-Modified-Since and
+        returned (response.from_cache = True) when the server answers 304.
+        Raises CircuitOpenError while the host is marked down, and the usual
+        requests exceptions otherwise; HTTP error statuses are returned, not raised.
+        """
+        prepared = requests.Request("GET", url, params=params, headers=headers).prepare()
+        host = self._host(urlsplit(prepared.url).hostname or "")
+        cached = self._cache_get(prepared.url) if conditional else None
+        if cached is not None:
+            prepared.headers.update(cached[0])
+        if not host.admit():
+            raise CircuitOpenError(f"{urlsplit(prepared.url).hostname} is unavailable, not retrying yet")
+
+        started = time.perf_counter()
+        response = None
+        try:
+            with host.slots:
+                response = self.session.send(prepared, timeout=timeout or host.policy.timeout)
+        except requests.RequestException:
+            host.record(time.perf_counter() - started, failed=True)
+            raise
+        finally:
+            if response is None:
+                # whatever send raised, a half-open trial must not stay taken for good
+                host.end_trial()
+        host.record(time.perf_counter() - started, response.status_code, failed=response.status_code >= 500)
+
+        if response.status_code == 304 and cached is not None:
+            with host.lock:
+                host.stats["not_modified"] += 1
+            return self._from_cache(prepared.url, cached)
+        response.from_cache = False
+        if conditional and response.status_code == 200:
+            self._cache_put(prepared.url, response)
+        return response
+
+    def metrics(self):
+        """ {host: {requests, errors, not_modified, rejected, latency_avg, latency_max, last_status, circuit}} """
+        result = {}
+        with self._lock:
+            hosts = dict(self._hosts)
+        for name, state in hosts.items():
+            with state.lock:
+                stats = dict(state.stats)
+                circuit = "closed" if state.opened_at is None else "open"
+            total = stats.pop("latency_total")
+            stats["latency_avg"] = total / stats["requests"] if stats["requests"] else 0.0
+            stats["circuit"] = circuit
+            result[name] = stats
+        return result
+
+    def close(self):
+        self.session.close()
+
+    def _cache_get(self, url):
+        with self._lock:
+            entry = self._cache.get(url)
+            if entry is not None:
+                self._cache.move_to_end(url)
+            return entry
+
+    def _cache_put(self, url, response):
+        validators = {}
+        if "ETag" in response.headers:
+            validators["If-None-Match"] = response.headers["ETag"]
+        if "Last-Modified" in response.headers:
+            validators["If-Modified-Since"] = response.headers["Last-Modified"]
+        if not validators:
+            return
+        entry = (validators, response.status_code, dict(response.headers), response.content, response.encoding)
+        with self._lock:
+            self._cache[url] = entry
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _from_cache(url, cached):
+        _, status, headers, content, encoding = cached
+        response = requests.Response()
+        response.status_code = status
+        response.headers = requests.structures.CaseInsensitiveDict(headers)
+        response._content = content
+        response.encoding = encoding
+        response.url = url
+        response.from_cache = True
+        return response
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """ shared HttpClient, created on first use """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
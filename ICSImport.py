@@ -0,0 +1,367 @@
+import datetime
+import hashlib
+import os
+import re
+import sys
+
+from ChangeBus import Change, EVENT, SERIES, RELOAD
+from EventStore import get_store
+from Recurrence import Rule
+
+BATCH_SIZE = 5000
+DEFAULT_COLOR = "#0078d4"
+MAX_SPAN_DAYS = 366      # longest multi-day event that is split into per-day rows
+LAST_MINUTE = "23:59"    # the schedule view has no 24:00
+
+_DURATION = re.compile(
+    r"^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$"
+)
+_HEX_COLOR = re.compile(r"^#[0-9a-fA-F]{6}$")
+
+# Properties a VEVENT may repeat; iter_vevents keeps every value of these
+_REPEATED = {"EXDATE"}
+
+# RRULE parts Recurrence.Rule expands; a rule with any other part is
+# imported as its first occurrence only
+_RULE_PARTS = {"FREQ", "INTERVAL", "COUNT", "UNTIL", "WKST", "BYDAY", "BYMONTHDAY"}
+
+
+def unfold(raw_lines):
+    """ join RFC 5545 folded lines (continuations start with a space or tab) """
+    current = None
+    for line in raw_lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def split_property(line):
+    """ "DTSTART;TZID=Europe/Paris:20261018T090000" -> ("DTSTART", {"TZID": ...}, value) """
+    in_quotes = False
+    for i, ch in enumerate(line):
+        if ch == '"':
+            in_quotes = not in_quotes
+        elif ch == ":" and not in_quotes:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return None
+    name, *param_parts = head.split(";")
+    params = {}
+    for part in param_parts:
+        key, _, val = part.partition("=")
+        params[key.upper()] = val.strip('"')
+    return name.upper(), params, value
+
+
+def unescape(text):
+    return (text.replace("\\n", "\n").replace("\\N", "\n")
+            .replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\"))
+
+
+def iter_vevents(raw_lines):
+    """
+    Yield one {NAME: (params, value)} dict per VEVENT, reading lines lazily.
+    Repeatable properties (EXDATE) map to a list of (params, value) instead.
+    Nested components such as VALARM are skipped.
+    """
+    event = None
+    depth = 0
+    for line in unfold(raw_lines):
+        upper = line.upper()
+        if upper == "BEGIN:VEVENT" and event is None:
+            event, depth = {}, 0
+        elif event is None:
+            continue
+        elif upper.startswith("BEGIN:"):
+            depth += 1
+        elif upper.startswith("END:"):
+            if depth:
+                depth -= 1
+            elif upper == "END:VEVENT":
+                yield event
+                event = None
+        elif not depth:
+            prop = split_property(line)
+            if prop is not None:
+                name, params, value = prop
+                if name in _REPEATED:
+                    event.setdefault(name, []).append((params, value))
+                else:
+                    event.setdefault(name, (params, value))
+
+
+def parse_datetime(params, value):
+    """ DTSTART / DTEND value -> local naive datetime, or a date for all-day values """
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.datetime.strptime(value[:8], "%Y%m%d").date()
+    dt = datetime.datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+    tz = None
+    if value.endswith("Z"):
+        tz = datetime.timezone.utc
+    elif "TZID" in params:
+        try:
+            from zoneinfo import ZoneInfo
+            tz = ZoneInfo(params["TZID"])
+        except Exception:
+            tz = None   # unknown zone: treat as floating local time
+    if tz is not None:
+        dt = dt.replace(tzinfo=tz).astimezone().replace(tzinfo=None)
+    return dt
+
+
+def parse_duration(value):
+    match = _DURATION.match(value.strip())
+    if not match:
+        return None
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    delta = datetime.timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                               minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -delta if sign == "-" else delta
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.combine(value, datetime.time())
+
+
+def _iso_day(value):
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+def event_rows(event):
+    """
+    Map one VEVENT onto events rows (date, title, place, start, end, color, import_key).
+    Events spanning several days become one row per day.
+    """
+    if "DTSTART" not in event:
+        return []
+    start = parse_datetime(*event["DTSTART"])
+    duration = parse_duration(event["DURATION"][1]) if "DURATION" in event else None
+    if "DTEND" in event:
+        end = parse_datetime(*event["DTEND"])
+    elif duration is not None:
+        end = start + duration
+    elif isinstance(start, datetime.datetime):
+        end = start
+    else:
+        end = start + datetime.timedelta(days=1)    # all-day event
+    start, end = _as_datetime(start), _as_datetime(end)
+    if end < start:
+        end = start
+
+    title = unescape(event.get("SUMMARY", ({}, ""))[1]).strip()
+    place = unescape(event.get("LOCATION", ({}, ""))[1]).strip()
+    color = event.get("COLOR", ({}, ""))[1].strip()
+    if not _HEX_COLOR.match(color):
+        color = DEFAULT_COLOR
+    uid = event.get("UID", ({}, ""))[1].strip()
+    recurrence_id = event.get("RECURRENCE-ID", ({}, ""))[1].strip()
+
+    # an end at exactly midnight belongs to the previous day
+    last_day = end.date()
+    if end.time() == datetime.time() and end > start:
+        last_day -= datetime.timedelta(days=1)
+    days = min((last_day - start.date()).days, MAX_SPAN_DAYS - 1)
+
+    rows = []
+    for offset in range(days + 1):
+        day = start.date() + datetime.timedelta(days=offset)
+        start_s = start.strftime("%H:%M") if offset == 0 else "00:00"
+        end_s = LAST_MINUTE if offset < days or end.date() > day else end.strftime("%H:%M")
+        date_s = day.isoformat()
+        if uid:
+            key = f"uid:{uid}|{recurrence_id}|{date_s}"
+        else:
+            digest = hashlib.sha1(
+                "\x1f".join((date_s, start_s, end_s, title, place)).encode("utf-8")
+            ).hexdigest()
+            key = f"sha1:{digest}"
+        rows.append((date_s, title, place, start_s, end_s, color, key))
+    return rows
+
+
+def series_rule(event):
+    """ the VEVENT's RRULE text if Recurrence.Rule expands it as written, else None """
+    if "RRULE" not in event:
+        return None
+    text = event["RRULE"][1].strip()
+    try:
+        rule = Rule(text)
+    except (ValueError, KeyError):
+        return None
+    parts = {part.partition("=")[0].strip().upper() for part in text.split(";") if part.strip()}
+    if not parts <= _RULE_PARTS:
+        return None
+    # Rule reads BYDAY only for weekly and BYMONTHDAY only for monthly rules
+    if "BYDAY" in parts and rule.freq != "WEEKLY":
+        return None
+    if "BYMONTHDAY" in parts and rule.freq != "MONTHLY":
+        return None
+    return text
+
+
+def series_row(event, rrule):
+    """
+    Map a recurring VEVENT onto a recurring_events row
+    (date, title, place, start, end, color, rrule, import_key), or None.
+    An occurrence running past midnight is cut at the end of its first day.
+    """
+    rows = event_rows(event)
+    if not rows:
+        return None
+    date_s, title, place, start_s, end_s, color, _ = rows[0]
+    uid = event.get("UID", ({}, ""))[1].strip()
+    if uid:
+        key = f"uid:{uid}"
+    else:
+        digest = hashlib.sha1(
+            "\x1f".join((date_s, start_s, end_s, title, place, rrule)).encode("utf-8")
+        ).hexdigest()
+        key = f"sha1:{digest}"
+    return (date_s, title, place, start_s, end_s, color, rrule, key)
+
+
+def exception_dates(event):
+    """ ISO dates of the VEVENT's EXDATE values """
+    dates = set()
+    for params, value in event.get("EXDATE", ()):
+        for item in value.split(","):
+            if item.strip():
+                dates.add(_iso_day(parse_datetime(params, item)))
+    return sorted(dates)
+
+
+def recurrence_override(event):
+    """ (UID, ISO date of the occurrence it replaces) for a VEVENT with RECURRENCE-ID, else None """
+    uid = event.get("UID", ({}, ""))[1].strip()
+    if not uid or "RECURRENCE-ID" not in event:
+        return None
+    return uid, _iso_day(parse_datetime(*event["RECURRENCE-ID"]))
+
+
+def import_ics(path, store=None, progress=None, batch_size=BATCH_SIZE):
+    """
+    Stream-import the VEVENTs of an .ics file into the events table.
+
+    The file is read line by line and rows are inserted with executemany in
+    batches of batch_size, all inside one transaction. Rows whose UID (or,
+    without a UID, content hash) was imported before are skipped.
+    A VEVENT whose RRULE Recurrence.Rule can expand is stored once in
+    recurring_events, with its EXDATEs and the occurrences that other
+    VEVENTs replace (RECURRENCE-ID) as recurrence_exceptions. Any other
+    RRULE keeps only its first occurrence and is counted in "unsupported_rrule".
+    progress, if given, is called after each batch with
+    (bytes_read, total_bytes, events_read).
+
+    Returns {"events": VEVENTs read, "inserted": rows added, "series": recurring events added,
+             "duplicates": rows and series skipped as already imported, "invalid": VEVENTs skipped,
+             "unsupported_rrule": recurring VEVENTs imported as their first occurrence only}.
+    """
+    store = store or get_store()
+    store.flush()
+    conn = store.connection()
+    total = os.path.getsize(path)
+    stats = {"events": 0, "inserted": 0, "series": 0, "duplicates": 0, "invalid": 0, "unsupported_rrule": 0}
+    overrides = []
+    done = 0
+
+    def lines():
+        nonlocal done
+        with open(path, "rb") as f:
+            for raw in f:
+                done += len(raw)
+                yield raw.decode("utf-8", errors="replace")
+
+    def write(batch):
+        ids = store.allocate_event_ids(len(batch))
+        # rowcount counts only the statement's own rows; total_changes would
+        # also count what the search and summary triggers write
+        cursor = conn.executemany(
+            'INSERT OR IGNORE INTO events (id, date, title, place, start, end, color, import_key) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(event_id, *row) for event_id, row in zip(ids, batch)]
+        )
+        inserted = cursor.rowcount
+        stats["inserted"] += inserted
+        stats["duplicates"] += len(batch) - inserted
+        if progress is not None:
+            progress((done, total, stats["events"]))
+
+    def write_series(row, exdates):
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO recurring_events (date, title, place, start, end, color, rrule, import_key) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            row
+        )
+        if not cursor.rowcount:
+            stats["duplicates"] += 1
+            return
+        stats["series"] += 1
+        conn.executemany(
+            'INSERT OR IGNORE INTO recurrence_exceptions (series_id, date) VALUES (?, ?)',
+            [(cursor.lastrowid, date_s) for date_s in exdates]
+        )
+
+    batch = []
+    with conn:
+        for event in iter_vevents(lines()):
+            stats["events"] += 1
+            rrule = None
+            try:
+                rrule = series_rule(event)
+                series = series_row(event, rrule) if rrule is not None else None
+                if series is not None:
+                    exdates = exception_dates(event)
+                    write_series(series, exdates)
+                    continue
+                rows = event_rows(event)
+                override = recurrence_override(event)
+            except (ValueError, OverflowError):
+                rows = []
+            if not rows:
+                stats["invalid"] += 1
+                continue
+            if rrule is None and "RRULE" in event:
+                stats["unsupported_rrule"] += 1
+            if override is not None:
+                overrides.append(override)
+            batch.extend(rows)
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = []
+        if batch:
+            write(batch)
+        # a replaced occurrence may come before or after its series in the file
+        replaced = conn.executemany(
+            'INSERT OR IGNORE INTO recurrence_exceptions (series_id, date) '
+            'SELECT id, ? FROM recurring_events WHERE import_key = ?',
+            [(date_s, f"uid:{uid}") for uid, date_s in overrides]
+        ).rowcount
+    if progress is not None:
+        progress((total, total, stats["events"]))
+    if stats["inserted"]:
+        store.changes.publish(Change(EVENT, None, None, RELOAD))
+    if stats["series"] or replaced > 0:
+        store.changes.publish(Change(SERIES, None, None, RELOAD))
+    return stats
+
+
+if __name__ == '__main__':
+    def print_progress(state):
+        done, total, events = state
+        print(f"\r{done * 100 // max(total, 1)}%  {events} events", end="", flush=True)
+
+    result = import_ics(sys.argv[1], progress=print_progress)
+    print()
+    print(result)
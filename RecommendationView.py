@@ -2,24 +2,20 @@
 
 import random
 
-import json
-import re
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QColor
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton,
     QTableWidget, QTableWidgetItem, QHeaderView,
-    QDialog, QFormLayout, QComboBox, QTimeEdit, QDialogButtonBox, QColorDialog
+    QDialog, QFormLayout, QComboBox, QTimeEdit, QDialogButtonBox, QColorDialog, QCheckBox,
+    QMessageBox
 )
 
 from PyQt6.QtCore import QTime
 
-from openai import OpenAI
-
-# 读取 Deepseek 配置
-with open("resources/misc/config.json", "r") as f:
-    _config = json.load(f)
-DEEPSEEK_KEY = _config.get("deepseek_api_key", "").strip()
+from Config import get_config
+from Recommendations import RecommendationCache, DEEPSEEK_MODEL, build_messages, parse_items
+from Workers import ChangeRelay
 
 class TimeSlotDialog(QDialog):
     def __init__(self, slots: list[tuple[int,int,int,int]], parent=None):
@@ -92,6 +88,13 @@ class TimeSlotDialog(QDialog):
         self.end_edit.setMaximumTime(max_t)
         self.end_edit.setTime(max_t)
 
+    def accept(self):
+        # 结束必须晚于开始，否则留在对话框里让用户修改
+        if self.end_edit.time() <= self.start_edit.time():
+            QMessageBox.warning(self, "Choose Time Slot", "The end time must be later than the start time.")
+            return
+        super().accept()
+
     def _pick_color(self):
         c = QColorDialog.getColor(self.color, self, "Choose Event Color")
         if c.isValid():
@@ -136,9 +139,12 @@ class RecommendationView(QWidget):
         )
         layout.addWidget(self.tag_input)
 
-        # 3) Generate 按钮
+        # 3) Generate 按钮；Force refresh 勾选时忽略缓存重新请求
         self.gen_button = QPushButton("Generate", self)
         layout.addWidget(self.gen_button)
+        self.force_refresh = QCheckBox("Force refresh", self)
+        layout.addWidget(self.force_refresh)
+        self.rec_cache = RecommendationCache()
 
         # 4) 结果表格：3 列，最后一列放 Add 按钮
         self.table = QTableWidget(0, 3, self)
@@ -152,25 +158,32 @@ class RecommendationView(QWidget):
         header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)
         layout.addWidget(self.table, stretch=1)
 
-        # Deepseek 客户端
-        if DEEPSEEK_KEY:
-            self.ds_client = OpenAI(
-                api_key=DEEPSEEK_KEY,
-                base_url="https://api.deepseek.com"
-            )
-        else:
-            self.ds_client = None
+        # Deepseek 客户端：第一次生成推荐时才创建；设置里换了 key 时丢弃重建
+        self.ds_client = None
+        self.config_relay = ChangeRelay(get_config(), {"deepseek_api_key"}, self)
+        self.config_relay.changed.connect(lambda changed: setattr(self, "ds_client", None))
 
         # 事件绑定
         self.gen_button.clicked.connect(self.on_generate)
 
 
+    def deepseek_client(self):
+        """ Deepseek 客户端，没有 key 时返回 None；openai 包在这里才导入 """
+        if self.ds_client is None:
+            deepseek_key = get_config().get("deepseek_api_key", "").strip()
+            if deepseek_key:
+                from openai import OpenAI
+                self.ds_client = OpenAI(
+                    api_key=deepseek_key,
+                    base_url="https://api.deepseek.com"
+                )
+        return self.ds_client
+
     """
     生成推荐的函数
     """
     def on_generate(self):
-        from PyQt6.QtWidgets import QTableWidgetItem, QProgressDialog
-        import re, json
+        from PyQt6.QtWidgets import QProgressDialog
 
         # 1) 清空表格和上一轮结果
         self.table.setRowCount(0)
@@ -183,70 +196,68 @@ class RecommendationView(QWidget):
         tags = [t.strip() for t in self.tag_input.text().split(",") if t.strip()]
         if not tags:
             return self._show_error("⚠️ Please enter at least one interest tag.")
-        if not self.ds_client:
+
+        # 3) 相同地点 + 兴趣的结果直接从缓存取（勾选 Force refresh 时跳过）
+        if not self.force_refresh.isChecked():
+            items = self.rec_cache.get(location, tags)
+            if items is not None:
+                return self._show_recommendations(items)
+
+        if not self.deepseek_client():
             return self._show_error("⚠️ Deepseek API key missing in config.json.")
 
-        # 3) 构造 Prompt
-        prompt = (
-            f"I am in {location}. My interests are: {', '.join(tags)}. "
-            "Please recommend 5 places or activities in this location. "
-            "Respond only as a JSON array of objects, "
-            "each with 'place' and 'reason' fields—no extra text or Markdown fences."
-        )
-        messages = [
-            {"role": "system", "content": "You are a friendly local tour guide."},
-            {"role": "user",   "content": prompt}
-        ]
+        # 4) 构造 Prompt
+        messages = build_messages(location, tags)
 
-        # 4) 加载提示
+        # 5) 加载提示
         dlg = QProgressDialog("Loading recommendations...", None, 0, 0, self)
         dlg.setWindowModality(Qt.WindowModality.WindowModal)
         dlg.setCancelButton(None)
         dlg.show()
 
         try:
-            # 5) 调用 Deepseek
+            # 6) 调用 Deepseek
             resp = self.ds_client.chat.completions.create(
-                model="deepseek-chat",
+                model=DEEPSEEK_MODEL,
                 messages=messages,
                 stream=False
             )
             raw = resp.choices[0].message.content.strip()
 
-            # 6) 清理 Markdown 围栏
-            text = re.sub(r"^```(?:json)?\s*", "", raw)
-            text = re.sub(r"\s*```$", "", text)
-            text = text.replace("`", "").strip()
-
-            # 7) 解析 JSON，并保存到 self.recs
+            # 7) 清理 Markdown 围栏并解析 JSON，成功的结果写入缓存
             try:
-                items = json.loads(text)
-            except json.JSONDecodeError:
+                items = parse_items(raw)
+            except ValueError:
                 return self._show_error("❌ Invalid JSON response.", raw)
-            self.recs = items
-
-            # 8) 填充表格，每行最后一列放 “Add” 按钮
-            for row, rec in enumerate(self.recs):
-                place  = rec.get("place", "")
-                reason = rec.get("reason", "")
-
-                self.table.insertRow(row)
-                self.table.setItem(row, 0, QTableWidgetItem(place))
-                self.table.setItem(row, 1, QTableWidgetItem(reason))
-
-                btn = QPushButton("Add", self)
-                # 用默认参数锁定当前 row
-                btn.clicked.connect(lambda _, r=row: self._add_recommendation(r))
-                self.table.setCellWidget(row, 2, btn)
-
-            # 9) 自适应行高
-            self.table.resizeRowsToContents()
+            self.rec_cache.put(location, tags, items)
+            self._show_recommendations(items)
 
         except Exception as e:
             self._show_error(f"❌ Recommendation failed: {e}")
         finally:
             dlg.close()
 
+    def _show_recommendations(self, items):
+        """ 把推荐结果保存到 self.recs 并填充表格 """
+        self.recs = items
+
+        # 每行最后一列放 “Add” 按钮
+        for row, rec in enumerate(self.recs):
+            place  = rec.get("place", "")
+            reason = rec.get("reason", "")
+
+            self.table.insertRow(row)
+            self.table.setItem(row, 0, QTableWidgetItem(place))
+            self.table.setItem(row, 1, QTableWidgetItem(reason))
+
+            btn = QPushButton("Add", self)
+            # 用默认参数锁定当前 row
+            btn.clicked.connect(lambda _, r=row: self._add_recommendation(r))
+            self.table.setCellWidget(row, 2, btn)
+
+        # 自适应行高
+        self.table.resizeRowsToContents()
+
 
     """
     一键添加日程的框的函数
@@ -263,6 +274,8 @@ class RecommendationView(QWidget):
         if dlg.exec() != QDialog.DialogCode.Accepted:
             return
         sh, sm, eh, em, color = dlg.get_times()
+        if not self.scheduler.confirm_conflicts(self.scheduler.current_date, sh * 60 + sm, eh * 60 + em):
+            return
 
         # 3) 真正把这五个值传给日程接口
         #    add_event(self, title, place, sh, sm, eh, em, color)
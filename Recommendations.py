@@ -0,0 +1,81 @@
+import hashlib
+import json
+import re
+import time
+
+from EventStore import get_store
+
+DEEPSEEK_MODEL = "deepseek-chat"
+# Bump whenever build_messages changes, so answers to the old prompt are not reused
+PROMPT_VERSION = 1
+
+# Cached answers older than this are asked for again; at most MAX_ENTRIES are kept
+RECOMMENDATION_TTL_SECONDS = 7 * 24 * 3600
+MAX_ENTRIES = 200
+
+
+def normalize(location, tags):
+    """ (location, tags) with case, spacing, order and duplicates ironed out """
+    location = " ".join(location.split()).casefold()
+    tags = sorted({" ".join(tag.split()).casefold() for tag in tags if tag.strip()})
+    return location, tags
+
+
+def cache_key(location, tags, model=DEEPSEEK_MODEL, prompt_version=PROMPT_VERSION):
+    location, tags = normalize(location, tags)
+    payload = json.dumps([location, tags, model, prompt_version], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_messages(location, tags):
+    prompt = (
+        f"I am in {location}. My interests are: {', '.join(tags)}. "
+        "Please recommend 5 places or activities in this location. "
+        "Respond only as a JSON array of objects, "
+        "each with 'place' and 'reason' fields—no extra text or Markdown fences."
+    )
+    return [
+        {"role": "system", "content": "You are a friendly local tour guide."},
+        {"role": "user",   "content": prompt}
+    ]
+
+
+def parse_items(raw):
+    """ the model's reply as a list of {"place", "reason"} dicts; ValueError if it is not one """
+    text = re.sub(r"^```(?:json)?\s*", "", raw.strip())
+    text = re.sub(r"\s*```$", "", text)
+    text = text.replace("`", "").strip()
+    items = json.loads(text)     # json.JSONDecodeError is a ValueError
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError("expected a JSON array of objects")
+    return items
+
+
+class RecommendationCache:
+    """
+    Deepseek answers held in SQLite per normalized (location, tags, model,
+    prompt version). Entries expire after ttl; beyond max_entries the least
+    recently used are dropped.
+    """
+
+    def __init__(self, store=None, ttl=RECOMMENDATION_TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.store = store or get_store()
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def get(self, location, tags):
+        """ cached items, or None when missing or expired """
+        key = cache_key(location, tags)
+        now = time.time()
+        row = self.store.cached_recommendations(key, now)
+        if row is None:
+            return None
+        items, created_at = row
+        if now - created_at > self.ttl:
+            self.store.delete_recommendations(key)
+            return None
+        return json.loads(items)
+
+    def put(self, location, tags, items):
+        self.store.save_recommendations(cache_key(location, tags), json.dumps(items, ensure_ascii=False),
+                                        time.time(), self.max_entries)
@@ -0,0 +1,249 @@
+import datetime
+from collections import OrderedDict
+
+from EventCache import (EventRecord, DayIndex, JULIAN_OFFSET, iso_to_day, day_to_iso, week_of,
+                        parse_hhmm, format_hhmm, parse_color, format_color)
+
+# Expanded week windows kept by SeriesCache before the least recently used is dropped
+MAX_WINDOWS = 64
+
+# Longest a COUNT rule is followed when working out its last occurrence
+MAX_SCAN_DAYS = 100 * 366
+
+WEEKDAYS = {"MO": 1, "TU": 2, "WE": 3, "TH": 4, "FR": 5, "SA": 6, "SU": 7}
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+
+# Occurrences get negative ids packing (series id, Julian day), so they sort
+# and hash like event ids without colliding with rows of the events table
+_DAY_BITS = 24
+_DAY_MASK = (1 << _DAY_BITS) - 1
+
+
+def occurrence_id(series_id, day):
+    return -((series_id << _DAY_BITS) | day)
+
+
+def is_occurrence(event_id):
+    return event_id < 0
+
+
+def split_occurrence_id(event_id):
+    """ occurrence id -> (series id, Julian day) """
+    packed = -event_id
+    return packed >> _DAY_BITS, packed & _DAY_MASK
+
+
+def _to_date(day):
+    return datetime.date.fromordinal(day - JULIAN_OFFSET)
+
+
+class Rule:
+    """
+    The RFC 5545 RRULE subset the schedule view offers:
+    FREQ=DAILY|WEEKLY|MONTHLY|YEARLY with INTERVAL, BYDAY (weekly),
+    BYMONTHDAY (monthly), COUNT and UNTIL.
+    """
+
+    __slots__ = ("text", "freq", "interval", "weekdays", "month_days", "count", "until")
+
+    def __init__(self, text):
+        self.text = text
+        parts = {}
+        for part in text.upper().split(";"):
+            key, _, value = part.partition("=")
+            if key:
+                parts[key.strip()] = value.strip()
+        self.freq = parts.get("FREQ")
+        if self.freq not in FREQUENCIES:
+            raise ValueError(f"unsupported RRULE frequency in {text!r}")
+        self.interval = max(int(parts.get("INTERVAL", 1)), 1)
+        # BYDAY may carry ordinals such as 1MO; only the weekday is used
+        self.weekdays = frozenset(WEEKDAYS[d.strip()[-2:]] for d in parts["BYDAY"].split(",")) \
+            if "BYDAY" in parts else None
+        self.month_days = frozenset(int(d) for d in parts["BYMONTHDAY"].split(",")) \
+            if "BYMONTHDAY" in parts else None
+        self.count = int(parts["COUNT"]) if "COUNT" in parts else None
+        self.until = iso_to_day(datetime.datetime.strptime(parts["UNTIL"][:8], "%Y%m%d").date().isoformat()) \
+            if "UNTIL" in parts else None
+
+    def matches(self, first, day):
+        """ whether a series starting on Julian day `first` falls on `day` (COUNT / UNTIL aside) """
+        if day < first:
+            return False
+        if self.freq == "DAILY":
+            return (day - first) % self.interval == 0
+        if self.freq == "WEEKLY":
+            weekdays = self.weekdays or (first % 7 + 1,)
+            return (week_of(day) - week_of(first)) % self.interval == 0 and day % 7 + 1 in weekdays
+        d, f = _to_date(day), _to_date(first)
+        if self.freq == "MONTHLY":
+            months = (d.year - f.year) * 12 + d.month - f.month
+            return months % self.interval == 0 and d.day in (self.month_days or (f.day,))
+        return (d.year - f.year) % self.interval == 0 and (d.month, d.day) == (f.month, f.day)
+
+    def last_day(self, first):
+        """ Julian day of the final occurrence, or None when the rule never ends """
+        last = self.until
+        if self.count is not None:
+            seen = 0
+            stop = first + MAX_SCAN_DAYS if last is None else last
+            for day in range(first, stop + 1):
+                if self.matches(first, day):
+                    seen += 1
+                    if seen == self.count:
+                        return day
+        return last
+
+
+class Series:
+    """ one row of recurring_events plus its exception dates, days as Julian day numbers """
+
+    __slots__ = ("id", "first", "last", "title", "place", "start", "end", "color", "rule", "exceptions")
+
+    def __init__(self, id, first, title, place, start, end, color, rule, exceptions=()):
+        self.id = id
+        self.first = first
+        self.title = title
+        self.place = place
+        if not (0 <= start <= 24 * 60 and 0 <= end <= 24 * 60):
+            raise ValueError(f"series {id} has times outside the day")
+        self.start = start
+        self.end = end
+        self.color = color
+        self.rule = rule if isinstance(rule, Rule) else Rule(rule)
+        self.last = self.rule.last_day(first)
+        self.exceptions = set(exceptions)
+
+    @classmethod
+    def from_row(cls, row, exceptions=()):
+        """ build from an EventStore.recurring_events() row """
+        series_id, date_str, title, place, start_s, end_s, color_s, rrule = row
+        return cls(series_id, iso_to_day(date_str), title, place,
+                   parse_hhmm(start_s), parse_hhmm(end_s), parse_color(color_s), rrule, exceptions)
+
+    def spans_week(self, week):
+        return week_of(self.first) <= week and (self.last is None or week <= week_of(self.last))
+
+    def occurs_on(self, day):
+        return (self.rule.matches(self.first, day)
+                and (self.last is None or day <= self.last)
+                and day not in self.exceptions)
+
+    def occurrence(self, day):
+        return EventRecord(occurrence_id(self.id, day), day, self.title, self.place,
+                           self.start, self.end, self.color)
+
+
+class SeriesCache:
+    """
+    Recurring events, expanded lazily a week at a time. Expanded weeks are
+    kept in an LRU of max_windows entries; editing a series drops only the
+    weeks it can touch.
+    """
+
+    def __init__(self, store, max_windows=MAX_WINDOWS):
+        self.store = store
+        self.max_windows = max_windows
+        self._series = None
+        self._windows = OrderedDict()   # {week: {day: {occurrence id: EventRecord}}}
+
+    @property
+    def series(self):
+        if self._series is None:
+            exceptions = {}
+            for series_id, date_str in self.store.recurrence_exceptions():
+                exceptions.setdefault(series_id, set()).add(iso_to_day(date_str))
+            self._series = {}
+            for row in self.store.recurring_events():
+                try:
+                    s = Series.from_row(row, exceptions.get(row[0], ()))
+                except (TypeError, ValueError, KeyError):
+                    continue
+                self._series[s.id] = s
+        return self._series
+
+    def day_occurrences(self, day):
+        """ {occurrence id: EventRecord} for one day """
+        return self._window(week_of(day)).get(day, {})
+
+    def day_index(self, day, base=None):
+        """ DayIndex of one day's occurrences, merged with base (the single events) if given """
+        occurrences = self.day_occurrences(day)
+        if not occurrences:
+            return base if base is not None else DayIndex()
+        index = DayIndex()
+        if base is not None:
+            index.keys = list(base.keys)
+            index.max_length = base.max_length
+        for rec in occurrences.values():
+            index.insert(rec)
+        return index
+
+    def occurrence(self, event_id):
+        _, day = split_occurrence_id(event_id)
+        return self.day_occurrences(day).get(event_id)
+
+    def _window(self, week):
+        window = self._windows.get(week)
+        if window is not None:
+            self._windows.move_to_end(week)
+            return window
+        window = {}
+        active = [s for s in self.series.values() if s.spans_week(week)]
+        for day in range(week * 7, week * 7 + 7):
+            for s in active:
+                if s.occurs_on(day):
+                    rec = s.occurrence(day)
+                    window.setdefault(day, {})[rec.id] = rec
+        self._windows[week] = window
+        if len(self._windows) > self.max_windows:
+            self._windows.popitem(last=False)
+        return window
+
+    def _invalidate(self, s):
+        for week in [w for w in self._windows if s.spans_week(w)]:
+            del self._windows[week]
+
+    """
+    Edits (written straight to the store)
+    """
+    def add(self, day, title, place, start, end, color, rrule):
+        """ start / end as "HH:MM" and color as "#rrggbb", the way they are stored """
+        series_id = self.store.add_recurring_event(
+            day_to_iso(day), title, place, start, end, color, rrule
+        )
+        s = Series.from_row((series_id, day_to_iso(day), title, place, start, end, color, rrule))
+        self.series[series_id] = s
+        self._invalidate(s)
+        return s
+
+    def update(self, series_id, **fields):
+        """ fields as stored: title / place / start / end ("HH:MM") / color ("#rrggbb") / rrule """
+        old = self.series[series_id]
+        self.store.update_recurring_event(series_id, **fields)
+        row = [old.id, day_to_iso(old.first), old.title, old.place,
+               format_hhmm(old.start), format_hhmm(old.end), format_color(old.color), old.rule.text]
+        for i, name in enumerate(("id", "date", "title", "place", "start", "end", "color", "rrule")):
+            if name in fields:
+                row[i] = fields[name]
+        new = Series.from_row(tuple(row), old.exceptions)
+        self.series[series_id] = new
+        self._invalidate(old)
+        self._invalidate(new)
+        return new
+
+    def remove(self, series_id):
+        s = self.series.pop(series_id, None)
+        if s is not None:
+            self.store.delete_recurring_event(series_id)
+            self._invalidate(s)
+        return s
+
+    def skip(self, series_id, day):
+        """ drop a single occurrence by recording an exception date """
+        s = self.series[series_id]
+        self.store.add_recurrence_exception(series_id, day_to_iso(day))
+        s.exceptions.add(day)
+        window = self._windows.get(week_of(day))
+        if window is not None and day in window:
+            window[day].pop(occurrence_id(series_id, day), None)
@@ -1,18 +1,14 @@
-import json
+import logging
 
-import pycountry
 from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QHBoxLayout, QVBoxLayout, QComboBox
 from PyQt6.QtWidgets import QWidget, QLineEdit, QPushButton, QLabel
+from qfluentwidgets import InfoBar, InfoBarPosition
 
-with open("resources/misc/config.json") as config_file:
-    _config = json.load(config_file)
+from Config import get_config
+from Countries import country_codes
 
-zodiac = _config["zodiac"]
-dob = _config["dob"]
-api = _config["api-key"]
-country = _config["country"]
-def_page = _config["def-page"]
+log = logging.getLogger(__name__)
 
 
 class SettingInterface(QWidget):
@@ -22,6 +18,7 @@ class SettingInterface(QWidget):
         self.layout = QVBoxLayout(self)
         self.setLayout(self.layout)
         self.setObjectName("Settings")
+        config = get_config()
 
         dob_layout = QHBoxLayout()
         self.layout.addLayout(dob_layout)
@@ -44,19 +41,19 @@ class SettingInterface(QWidget):
         self.dob_label = QLabel(self)
         self.dob_label.setText("DOB")
         self.dob_entry = QLineEdit(self)
-        self.dob_entry.setText(dob)
+        self.dob_entry.setText(config["dob"])
 
         self.api_label = QLabel(self)
         self.api_label.setText("Calendarific API Key")
         self.api_entry = QLineEdit(self)
-        self.api_entry.setText(api)
+        self.api_entry.setText(config["api-key"])
 
         country_label = QLabel(self)
         country_label.setText("Country")
         self.country_select = QComboBox(self)
         country_codes = self.fetch_country_codes()
         self.country_select.addItems(country_codes)
-        self.country_select.setCurrentText(country)
+        self.country_select.setCurrentText(config["country"])
 
         zodiac_label = QLabel(self)
         zodiac_label.setText("Zodiac Sign")
@@ -64,7 +61,7 @@ class SettingInterface(QWidget):
         zodiacs_list = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
                         "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
         self.zodiac_select.addItems(zodiacs_list)
-        self.zodiac_select.setCurrentText(zodiac)
+        self.zodiac_select.setCurrentText(config["zodiac"])
 
         discl_label = QLabel("<b><i>*Please note that Calendarific API is limited to 500 requests per month. So you may have to"
                              "change your API keys once in a while.</i></b>")
@@ -86,23 +83,22 @@ class SettingInterface(QWidget):
         label_layout.addWidget(discl_label)
 
     def fetch_country_codes(self):
-        countries = list(pycountry.countries)
-        country_codes = [country.alpha_2 for country in countries]
-        return country_codes
+        return country_codes()
 
     def submit_settings(self):
-        _config["api-key"] = self.api_entry.text()
-        _config["country"] = self.country_select.currentText()
-        _config["zodiac"] = self.zodiac_select.currentText()
-        _config["dob"] = self.dob_entry.text()
-
         try:
-            print("Before saving:", _config)
-            with open("resources/misc/config.json", "w") as json_file:
-                json.dump(_config, json_file)
-            #with open("resources/misc/config.json", "w") as config_file:
-            #    json.dump(_config, config_file)
-            print("Settings saved successfully")
-            print("After saving:", _config)  # Debug statement
+            # the dashboard, calendar etc. pick up whatever changed right away
+            changed = get_config().update({
+                "api-key": self.api_entry.text(),
+                "country": self.country_select.currentText(),
+                "zodiac": self.zodiac_select.currentText(),
+                "dob": self.dob_entry.text(),
+            })
         except Exception as e:
-            print(f"Failed to save settings: {e}")
+            log.exception("Failed to save settings")
+            InfoBar.error("Settings", f"Failed to save settings: {e}",
+                          position=InfoBarPosition.TOP, duration=-1, parent=self)
+            return
+        log.info("Settings saved, changed: %s", sorted(changed))
+        InfoBar.success("Settings", "Settings saved." if changed else "Nothing to save, no setting changed.",
+                        position=InfoBarPosition.TOP, duration=2000, parent=self)
@@ -0,0 +1,192 @@
+import builtins
+import datetime
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+FLAG = "--profile-startup"
+ENV_VAR = "TEMPOPILOT_PROFILE_STARTUP"
+DEFAULT_REPORT = "startup-profile.json"
+
+# Section categories
+INTERFACE = "interface"
+DATABASE = "database"
+NETWORK = "network"
+
+# Slowest imports listed in the text table; the JSON report has all of them
+TABLE_IMPORTS = 15
+
+_started = time.perf_counter()
+_profile = None
+
+
+class _ImportTimer:
+    """
+    Wraps builtins.__import__ and records, for every module an import
+    statement loads, its total time and its self time (nested imports excluded).
+    """
+
+    def __init__(self):
+        self.original = builtins.__import__
+        self.imports = []      # [(module, self seconds, total seconds)]
+        self._local = threading.local()
+
+    def install(self):
+        builtins.__import__ = self
+
+    def uninstall(self):
+        if builtins.__import__ is self:
+            builtins.__import__ = self.original
+
+    def __call__(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self.original(name, globals, locals, fromlist, level)
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self.original(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += total
+            self.imports.append((name, total - nested, total))
+
+
+class StartupProfile:
+    """ timings gathered from the import of this module until finish() """
+
+    def __init__(self, path):
+        self.path = path
+        self.imports = _ImportTimer()
+        self.sections = []     # [(category, name, started at, seconds)]
+        self.first_paint = None
+        self._lock = threading.Lock()
+
+    def record(self, category, name, started, seconds):
+        with self._lock:
+            self.sections.append((category, name, started - _started, seconds))
+
+    def network(self):
+        """ per-host figures from the shared HTTP client, if anything was fetched """
+        http = sys.modules.get("Http")
+        if http is None or http._client is None:
+            return {}
+        return {host: {"requests": stats["requests"], "errors": stats["errors"],
+                       "wait_ms": round(stats["latency_avg"] * stats["requests"] * 1000, 2)}
+                for host, stats in http._client.metrics().items()}
+
+    def as_dict(self):
+        totals = {}
+        for category, _, _, seconds in self.sections:
+            totals[category] = totals.get(category, 0.0) + seconds
+        network = self.network()
+        totals[NETWORK] = totals.get(NETWORK, 0.0) + sum(h["wait_ms"] for h in network.values()) / 1000
+        totals["imports"] = sum(self_s for _, self_s, _ in self.imports.imports)
+        return {
+            "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "first_paint_ms": _ms(self.first_paint),
+            "totals_ms": {category: _ms(seconds) for category, seconds in totals.items()},
+            "imports": [{"module": module, "self_ms": _ms(self_s), "total_ms": _ms(total)}
+                        for module, self_s, total in sorted(self.imports.imports, key=lambda i: -i[1])],
+            "sections": [{"category": category, "name": name, "at_ms": _ms(at), "ms": _ms(seconds)}
+                         for category, name, at, seconds in self.sections],
+            "network": network,
+        }
+
+    def table(self, report):
+        lines = [f"Startup profile ({report['recorded_at']})",
+                 f"  first paint           {_fmt(report['first_paint_ms'])}", "",
+                 "Totals"]
+        lines += [f"  {category:<21} {_fmt(ms)}" for category, ms in report["totals_ms"].items()]
+        lines += ["", "Sections"]
+        lines += [f"  {s['category']:<10} {s['name']:<30} {_fmt(s['ms'])}  (at {_fmt(s['at_ms'])})"
+                  for s in report["sections"]]
+        lines += ["", "Slowest imports (self / total)"]
+        lines += [f"  {i['module']:<32} {_fmt(i['self_ms'])} / {_fmt(i['total_ms'])}"
+                  for i in report["imports"][:TABLE_IMPORTS]]
+        if report["network"]:
+            lines += ["", "Network"]
+            lines += [f"  {host:<32} {n['requests']} requests, {n['errors']} errors, {_fmt(n['wait_ms'])}"
+                      for host, n in report["network"].items()]
+        return "\n".join(lines)
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _fmt(ms):
+    return "-" if ms is None else f"{ms:9.1f} ms"
+
+
+def requested(argv=None, environ=None):
+    """ report path if profiling was asked for with --profile-startup[=path] or the environment, else None """
+    argv = sys.argv if argv is None else argv
+    environ = os.environ if environ is None else environ
+    for arg in argv[1:]:
+        if arg == FLAG:
+            return DEFAULT_REPORT
+        if arg.startswith(FLAG + "="):
+            return arg.split("=", 1)[1] or DEFAULT_REPORT
+    value = environ.get(ENV_VAR, "")
+    if value in ("", "0"):
+        return None
+    return DEFAULT_REPORT if value == "1" else value
+
+
+def start(path=None):
+    """ begin profiling if requested; call before the application's own imports """
+    global _profile
+    path = path or requested()
+    if path is not None and _profile is None:
+        _profile = StartupProfile(path)
+        _profile.imports.install()
+    return _profile
+
+
+def active():
+    return _profile is not None
+
+
+@contextmanager
+def section(category, name):
+    """ time the enclosed block under category / name; does nothing unless profiling """
+    if _profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _profile is not None:
+            _profile.record(category, name, started, time.perf_counter() - started)
+
+
+def first_paint():
+    if _profile is not None and _profile.first_paint is None:
+        _profile.first_paint = time.perf_counter() - _started
+
+
+def finish():
+    """ write the JSON report and the table next to it, print the table, and stop profiling """
+    global _profile
+    profile, _profile = _profile, None
+    if profile is None:
+        return None
+    profile.imports.uninstall()
+    report = profile.as_dict()
+    table = profile.table(report)
+    with open(profile.path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.splitext(profile.path)[0] + ".txt", "w", encoding="utf-8") as f:
+        f.write(table + "\n")
+    print(table)
+    return report
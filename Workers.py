@@ -0,0 +1,61 @@
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class TaskSignals(QObject):
+    """ signals a Task emits; they are delivered on the thread that created the Task """
+    progress = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+
+class Task(QRunnable):
+    """
+    Runs fn(*args, **kwargs) on a QThreadPool and reports back through signals.
+    With report_progress=True fn also receives progress=<callable> and anything
+    passed to it is emitted as signals.progress.
+    """
+
+    def __init__(self, fn, *args, report_progress=False, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        if report_progress:
+            self.kwargs["progress"] = self.signals.progress.emit
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(e)
+            return
+        self.signals.finished.emit(result)
+
+
+def run_in_background(fn, *args, on_done=None, on_error=None, on_progress=None, pool=None, **kwargs):
+    """ start fn on the global (or given) QThreadPool and wire up the callbacks """
+    task = Task(fn, *args, report_progress=on_progress is not None, **kwargs)
+    if on_done is not None:
+        task.signals.finished.connect(on_done)
+    if on_error is not None:
+        task.signals.failed.connect(on_error)
+    if on_progress is not None:
+        task.signals.progress.connect(on_progress)
+    (pool or QThreadPool.globalInstance()).start(task)
+    return task
+
+
+class ChangeRelay(QObject):
+    """
+    Re-emits ChangeBus (or Config) notifications as a Qt signal, so they
+    reach GUI-thread slots even when a worker thread did the write. Connect slots with
+    Qt.ConnectionType.QueuedConnection to handle a change only after the
+    code that made it has finished updating its own caches.
+    """
+    changed = pyqtSignal(object)
+
+    def __init__(self, bus, kinds=None, parent=None):
+        super().__init__(parent)
+        unsubscribe = bus.subscribe(self.changed.emit, kinds)
+        self.destroyed.connect(lambda *_: unsubscribe())
@@ -1,11 +1,12 @@
 # coding:utf-8
-import json
-import sqlite3
 import sys
 
-import pycountry
+# Started before anything else is imported so the report covers every module
+import StartupProfile
+StartupProfile.start()
+
 import qdarktheme
-from PyQt6.QtCore import Qt, pyqtSignal, QEasingCurve, QUrl
+from PyQt6.QtCore import Qt, pyqtSignal, QEasingCurve, QUrl, QTimer
 from PyQt6.QtGui import QIcon, QDesktopServices, QPixmap
 from PyQt6.QtWidgets import QApplication, QLabel, QHBoxLayout, QVBoxLayout, QFrame, QDialog, QComboBox, QLineEdit, \
     QPushButton
@@ -22,12 +23,14 @@ from Dashboard import Dashboard
 from DailyScheduleView import DailyScheduleView
 from RecommendationView import RecommendationView
 from MapView import MapView
+from EventStore import get_store
+from Config import get_config
+from Countries import country_codes
 
 APP_NAME = "TempoPilot"
 
-with open("resources/misc/config.json") as config_file:
-    _config = json.load(config_file)
-
+# After first paint the other tabs are built one per idle tick, starting this late
+PREBUILD_DELAY_MS = 500
 
 class Onboarding(QDialog):
     def __init__(self):
@@ -91,19 +94,16 @@ class Onboarding(QDialog):
         self.setLayout(main_layout)
 
     def fetch_country_codes(self):
-        countries = list(pycountry.countries)
-        country_codes = [country.alpha_2 for country in countries]
-        return country_codes
+        return country_codes()
 
     def submit_details(self):
-        _config["api-key"] = self.api_key_edit.text()
-        _config["country"] = self.country_edit.currentText()
-        _config["start"] = "True"
-        _config["zodiac"] = self.zodiac_sign.currentText()
-        _config["dob"] = self.dob.text()
-
-        with open("resources/misc/config.json", "w") as config_file:
-            json.dump(_config, config_file)
+        get_config().update({
+            "api-key": self.api_key_edit.text(),
+            "country": self.country_edit.currentText(),
+            "start": "True",
+            "zodiac": self.zodiac_sign.currentText(),
+            "dob": self.dob.text(),
+        })
 
     def goto_app(self):
         self.accept()
@@ -146,6 +146,33 @@ class StackedWidget(QFrame):
         self.setCurrentWidget(self.view.widget(index), popOut)
 
 
+class LazyInterface(QFrame):
+    """ Placeholder that builds its interface the first time it is shown """
+
+    def __init__(self, factory, name, parent=None):
+        super().__init__(parent=parent)
+        self.factory = factory
+        self._widget = None
+        self.setObjectName(name)
+        self.vBoxLayout = QVBoxLayout(self)
+        self.vBoxLayout.setContentsMargins(0, 0, 0, 0)
+
+    def widget(self):
+        """ the real interface, built on first use and kept afterwards """
+        if self._widget is None:
+            with StartupProfile.section(StartupProfile.INTERFACE, self.objectName()):
+                self._widget = self.factory()
+            self.vBoxLayout.addWidget(self._widget)
+        return self._widget
+
+    def isBuilt(self):
+        return self._widget is not None
+
+    def showEvent(self, e):
+        self.widget()
+        super().showEvent(e)
+
+
 class CustomTitleBar(TitleBar):
     """ Title bar with icon and title """
 
@@ -211,54 +238,15 @@ class Window(FramelessWindow):
         Database Initiation
         """
 
-        self.conn1 = sqlite3.connect('resources/misc/todos.db')
-        self.cursor1 = self.conn1.cursor()
-
-        # Create a table to store todos
-        self.cursor1.execute('''
-            CREATE TABLE IF NOT EXISTS todos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT,
-                time TEXT,
-                description TEXT,
-                status TEXT
-            )
-        ''')
-        self.conn1.commit()
-
-        self.conn2 = sqlite3.connect('resources/misc/special_dates.db')
-        self.cursor2 = self.conn2.cursor()
-
-        # Create a table to store todos
-        self.cursor2.execute('''
-            CREATE TABLE IF NOT EXISTS special_dates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT,
-                reason TEXT
-            )
-        ''')
-        self.conn2.commit()
-
-        self.conn3 = sqlite3.connect('resources/misc/reminders.db')
-        self.cursor3 = self.conn3.cursor()
-
-        # Create a table to store todos
-        self.cursor3.execute('''
-            CREATE TABLE IF NOT EXISTS reminders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT,
-                time TEXT,
-                description TEXT
-            )
-        ''')
-        self.conn3.commit()
+        with StartupProfile.section(StartupProfile.DATABASE, "open store"):
+            self.store = get_store()
 
         self.homeInterface = None
         self.calendarInterface = None
         self.settingsInterface = None
         self.statsInterface = None
 
-        if _config.get("start") == "True":
+        if get_config().get("start") == "True":
             self.start()
         else:
             qdarktheme.setup_theme("dark")
@@ -266,17 +254,29 @@ class Window(FramelessWindow):
             onboarding.exec()
 
     def start(self):
-        # 1) 各个子界面实例化
-        self.homeInterface      = Dashboard()
-        self.calendarInterface  = Calendar()
-        self.settingsInterface  = SettingInterface()
+        # 1) 各个子界面先用占位控件注册，第一次显示时才真正实例化
+        self.homeInterface          = LazyInterface(Dashboard, "Home")
+        self.calendarInterface      = LazyInterface(Calendar, "Calendar")
+        self.dailyScheduleInterface = LazyInterface(self.createDailyView, "DailyView")
+        # 地图面板：QWebEngineView 会拉起整个 Chromium，只在用户打开时创建
+        self.mapInterface           = LazyInterface(MapView, "Map")
+        self.settingsInterface      = LazyInterface(SettingInterface, "Settings")
+
+        # 2) 初始化布局和导航
+        self.initLayout()
+        self.initNavigation()
+        self.initWindow()
+
+        # 3) 首次绘制后，空闲时逐个预建其余界面（地图除外）
+        self.prebuildQueue = [self.calendarInterface, self.dailyScheduleInterface, self.settingsInterface]
+        QTimer.singleShot(PREBUILD_DELAY_MS, self.prebuildNext)
 
+    def createDailyView(self):
         raw_day                = DailyScheduleView()
         self.recommendInterface = RecommendationView(scheduler=raw_day)
 
-        # 2) 用 QSplitter 把推荐和日视图 做左右布局
+        # 用 QSplitter 把推荐和日视图 做左右布局
         from PyQt6.QtWidgets import QSplitter
-        from PyQt6.QtCore import Qt
 
         splitter = QSplitter(Qt.Orientation.Horizontal)
         splitter.addWidget(self.recommendInterface)
@@ -284,18 +284,24 @@ class Window(FramelessWindow):
         splitter.setStretchFactor(0, 0)
         splitter.setStretchFactor(1, 1)
         splitter.setSizes([300, 800])
+        return splitter
+
+    def prebuildNext(self):
+        """ build one not-yet-opened interface, then yield to the event loop before the next """
+        while self.prebuildQueue:
+            interface = self.prebuildQueue.pop(0)
+            if not interface.isBuilt():
+                interface.widget()
+                break
+        if self.prebuildQueue:
+            QTimer.singleShot(0, self.prebuildNext)
+        else:
+            # startup is over once every eager interface exists
+            StartupProfile.finish()
 
-        self.dailyScheduleInterface = splitter
-        self.dailyScheduleInterface.setObjectName("DailyView")
-
-        # 3) 地图面板
-        self.mapInterface = MapView()
-        self.mapInterface.setObjectName("Map")
-
-        # 4) 现在所有 interface 都准备好了，再一次性初始化布局和导航
-        self.initLayout()
-        self.initNavigation()
-        self.initWindow()
+    def paintEvent(self, e):
+        super().paintEvent(e)
+        StartupProfile.first_paint()
 
 
     def initLayout(self):
@@ -396,7 +402,10 @@ if __name__ == '__main__':
     QApplication.setHighDpiScaleFactorRoundingPolicy(
         Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
     app = QApplication(sys.argv)
-
+    # commit any queued schedule edits before the event loop goes away
+    app.aboutToQuit.connect(get_store().flush)
+    # the onboarding path never prebuilds, so its report is written on exit
+    app.aboutToQuit.connect(StartupProfile.finish)
 
     qdarktheme.enable_hi_dpi()
     w = Window()
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EventStore import EventStore  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """ fresh EventStore in a temporary directory (relative legacy paths resolve there too) """
+    monkeypatch.chdir(tmp_path)
+    store = EventStore(str(tmp_path / "tempopilot.db"))
+    yield store
+    store.close()
@@ -0,0 +1,97 @@
+from EventCache import parse_hhmm
+from EventStore import SUMMARY_COLUMNS, DONE_STATUSES
+
+MONDAY = "2026-10-19"
+INSERT_EVENT = 'INSERT OR REPLACE INTO events (id, date, title, place, start, end, color) VALUES (?, ?, ?, ?, ?, ?, ?)'
+
+
+def add_event(store, event_id, date, start, end):
+    conn = store.connection()
+    with conn:
+        conn.execute(INSERT_EVENT, (event_id, date, "Busy", "", start, end, "#0078d4"))
+
+
+def summary_rows(store):
+    """ what the triggers maintained, without the all-zero rows left behind by deletes """
+    rows = store.connection().execute(
+        f'SELECT date, {", ".join(SUMMARY_COLUMNS)} FROM daily_summary ORDER BY date'
+    ).fetchall()
+    return {row[0]: dict(zip(SUMMARY_COLUMNS, row[1:])) for row in rows if any(row[1:])}
+
+
+def recomputed(store):
+    """ the same summary computed from scratch """
+    fresh = {}
+    conn = store.connection()
+    for date, start, end in conn.execute('SELECT date, start, end FROM events'):
+        day = fresh.setdefault(date, dict.fromkeys(SUMMARY_COLUMNS, 0))
+        day["events"] += 1
+        day["busy_minutes"] += max(0, parse_hhmm(end) - parse_hhmm(start))
+    for date, status in conn.execute('SELECT date, status FROM todos'):
+        day = fresh.setdefault(date, dict.fromkeys(SUMMARY_COLUMNS, 0))
+        day["todos"] += 1
+        day["open_todos"] += status.strip().lower() not in DONE_STATUSES
+    for (date,) in conn.execute('SELECT date FROM reminders'):
+        fresh.setdefault(date, dict.fromkeys(SUMMARY_COLUMNS, 0))["reminders"] += 1
+    for (date,) in conn.execute('SELECT date FROM special_dates'):
+        fresh.setdefault(date, dict.fromkeys(SUMMARY_COLUMNS, 0))["special_dates"] += 1
+    return fresh
+
+
+def test_inserts_updates_and_deletes_keep_the_summary(store):
+    add_event(store, 1, MONDAY, "09:00", "10:30")
+    add_event(store, 2, MONDAY, "14:00", "14:15")
+    todo = store.add_todo(MONDAY, "08:00", "Dentist", "Pending")
+    store.add_todo(MONDAY, "08:30", "Post", "Done")
+    reminder = store.add_reminder(MONDAY, "07:00", "Call back")
+    store.set_special_date(MONDAY, "Birthday")
+    assert store.day_summary(MONDAY) == {"events": 2, "todos": 2, "open_todos": 1, "reminders": 1,
+                                         "special_dates": 1, "busy_minutes": 105}
+
+    # moving an event takes it off one day and onto another
+    add_event(store, 1, "2026-10-20", "09:00", "09:30")
+    store.set_todo_status(todo, " Completed ")
+    store.delete_reminder(reminder)
+    assert store.day_summary(MONDAY) == {"events": 1, "todos": 2, "open_todos": 0, "reminders": 0,
+                                         "special_dates": 1, "busy_minutes": 15}
+    assert store.day_summary("2026-10-20")["busy_minutes"] == 30
+    assert summary_rows(store) == recomputed(store)
+
+    store.clear_special_date(MONDAY)
+    store.delete_todo(todo)
+    assert store.count_special_dates(MONDAY) == 0
+    assert store.count_todos(MONDAY) == 1
+    assert summary_rows(store) == recomputed(store)
+
+
+def test_empty_day_is_all_zero(store):
+    assert store.day_summary("2030-01-01") == dict.fromkeys(SUMMARY_COLUMNS, 0)
+    assert store.summary_between("2030-01-01", "2030-12-31") == {}
+
+
+def test_existing_rows_are_summarised_by_the_migration(store):
+    add_event(store, 1, MONDAY, "09:00", "10:00")
+    store.add_todo(MONDAY, "08:00", "Dentist", "Pending")
+    conn = store.connection()
+    with conn:
+        # back to before the summary existed, then run its migration again
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                                    "AND name LIKE '%summary%'").fetchall():
+            conn.execute(f"DROP TRIGGER {name}")
+        conn.execute("DROP TABLE daily_summary")
+        store._add_daily_summary(conn)
+
+    assert store.day_summary(MONDAY)["events"] == 1
+    assert store.day_summary(MONDAY)["busy_minutes"] == 60
+    assert store.count_todos(MONDAY) == 1
+    add_event(store, 2, MONDAY, "11:00", "11:30")
+    assert store.day_summary(MONDAY)["busy_minutes"] == 90
+
+
+def test_counters_do_not_flush_queued_writes(store):
+    store.enqueue(INSERT_EVENT, (1, MONDAY, "Queued", "", "09:00", "10:00", "#0078d4"))
+    store.add_todo(MONDAY, "08:00", "Dentist", "Pending")
+    assert store.count_todos(MONDAY) == 1
+    assert store.count_reminders(MONDAY) == 0
+    assert store.count_special_dates(MONDAY) == 0
+    assert store.has_pending()
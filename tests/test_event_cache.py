@@ -0,0 +1,152 @@
+import pytest
+
+from EventCache import EventRecord, EventCache, DayIndex, iso_to_day, day_to_iso, parse_hhmm, format_hhmm
+
+MONDAY = iso_to_day("2026-10-19")
+INSERT_EVENT = 'INSERT OR REPLACE INTO events (id, date, title, place, start, end, color) VALUES (?, ?, ?, ?, ?, ?, ?)'
+
+
+def record(event_id, start, end, day=MONDAY):
+    return EventRecord(event_id, day, "Busy", "", start, end, 0x4DABF7)
+
+
+def test_day_and_time_conversions():
+    assert day_to_iso(MONDAY) == "2026-10-19"
+    assert MONDAY % 7 == 0     # Julian day 0 is a Monday
+    assert parse_hhmm("09:05") == 545
+    assert format_hhmm(545) == "09:05"
+
+
+def test_records_share_values():
+    a = EventRecord(1, MONDAY, "Stand" + "up", "Room 2", 600, 630, 0x123456)
+    b = EventRecord(2, MONDAY, "Standup", "Room 2", 600, 630, 0x123456)
+    assert a.title is b.title and a.start is b.start and a.color is b.color
+
+
+@pytest.mark.parametrize("start, end", [(-1, 60), (0, 24 * 60 + 1), (25 * 60, 26 * 60)])
+def test_out_of_range_minutes_are_rejected(start, end):
+    with pytest.raises(ValueError):
+        record(1, start, end)
+
+
+def test_rows_with_impossible_times_are_rejected():
+    with pytest.raises(ValueError):
+        EventRecord.from_row((1, "2026-10-19", "Busy", "", "09:00", "25:00", "#4dabf7"))
+
+
+def test_failed_record_update_changes_nothing():
+    rec = record(1, 600, 660)
+    with pytest.raises(ValueError):
+        rec.update(title="Moved", start=540, end=24 * 60 + 5)
+    assert (rec.title, rec.start, rec.end) == ("Busy", 600, 660)
+
+
+def test_failed_cache_update_keeps_the_interval_index(store):
+    cache = EventCache(store)
+    cache.loaded_weeks.add(MONDAY // 7)
+    cache.add(record(1, 600, 660))
+    with pytest.raises(ValueError):
+        cache.update(1, start=-5)
+    assert cache.day_index(MONDAY).overlapping(600, 601) == [1]
+
+    cache.update(1, start=720, end=780)
+    index = cache.day_index(MONDAY)
+    assert index.overlapping(600, 700) == []
+    assert index.overlapping(700, 730) == [1]
+
+
+def test_weeks_load_lazily_and_evict(store):
+    conn = store.connection()
+    with conn:
+        conn.execute(INSERT_EVENT, (1, "2026-10-19", "This week", "", "09:00", "10:00", "#4dabf7"))
+        conn.execute(INSERT_EVENT, (2, "2026-11-30", "Six weeks on", "", "09:00", "10:00", "#4dabf7"))
+        conn.execute(INSERT_EVENT, (3, "2026-10-20", "Broken", "", "09:00", "25:00", "#4dabf7"))
+    cache = EventCache(store)
+    cache.load_around(MONDAY, 1)
+    assert set(cache.by_id) == {1}      # the broken row is skipped, the far week not loaded
+    assert set(cache.day_events(MONDAY + 42)) == {2}
+    cache.evict_far(MONDAY, 1)
+    assert set(cache.by_id) == {1}
+    assert cache.remove(1).title == "This week"
+    assert len(cache) == 0
+
+
+def index_of(*spans):
+    index = DayIndex()
+    for event_id, (start, end) in enumerate(spans, start=1):
+        index.insert(record(event_id, start, end))
+    return index
+
+
+def test_touching_events_do_not_overlap():
+    index = index_of((540, 600), (600, 660), (660, 720))
+    assert index.overlapping(600, 660) == [2]
+    assert index.overlapping(599, 661) == [1, 2, 3]
+    assert index.is_free(720, 780)
+    assert not index.is_free(719, 720)
+
+
+def test_zero_length_events():
+    index = index_of((600, 600), (540, 660), (800, 800))
+    # an empty event covers nothing, not even its own minute
+    assert index.overlapping(600, 601) == [2]
+    assert index.overlapping(0, 24 * 60) == [2]
+    assert index.overlapping(799, 801) == []
+    assert index.is_free(800, 801)
+    assert index.free_slots(0, 24 * 60) == [(0, 540), (660, 24 * 60)]
+
+
+def test_long_event_found_far_back():
+    index = index_of((0, 24 * 60), (600, 630))
+    assert index.overlapping(1000, 1001) == [1]
+    index.remove(record(1, 0, 24 * 60))
+    assert index.max_length == 30
+    assert index.overlapping(1000, 1001) == []
+
+
+def test_next_after_and_free_slots():
+    index = index_of((540, 600), (570, 630), (700, 720))
+    assert index.next_after(541) == 2
+    assert index.next_after(631) == 3
+    assert index.next_after(721) is None
+    assert index.free_slots(480, 1080) == [(480, 540), (630, 700), (720, 1080)]
+    assert index.free_slots(560, 650) == [(630, 650)]
+
+
+def test_weeks_fetched_off_the_cache_merge_in(store):
+    conn = store.connection()
+    with conn:
+        conn.execute(INSERT_EVENT, (1, "2026-10-19", "This week", "", "09:00", "10:00", "#4dabf7"))
+        conn.execute(INSERT_EVENT, (2, "2026-10-27", "Next week", "", "09:00", "10:00", "#4dabf7"))
+        conn.execute(INSERT_EVENT, (3, "2026-11-16", "Four weeks on", "", "09:00", "10:00", "#4dabf7"))
+    cache = EventCache(store)
+    week = MONDAY // 7
+    assert cache.missing_weeks(MONDAY, 1) == [week - 1, week, week + 1]
+
+    result = cache.fetch_weeks([week - 1, week, week + 1, week + 4])
+    assert len(cache) == 0              # fetching leaves the cache alone
+    cache.load_week(week)
+    cache.update(1, title="Edited meanwhile")
+    assert cache.merge_weeks(result) == [week - 1, week + 1, week + 4]
+    assert cache.get(1).title == "Edited meanwhile"
+    assert set(cache.by_id) == {1, 2, 3}
+    assert cache.missing_weeks(MONDAY, 1) == []
+
+
+def test_fetch_started_before_a_clear_is_dropped(store):
+    cache = EventCache(store)
+    result = cache.fetch_weeks([MONDAY // 7])
+    cache.clear()
+    assert cache.merge_weeks(result) == []
+    assert not cache.loaded_weeks
+
+
+def test_weeks_stay_loaded_while_writes_are_queued(store):
+    cache = EventCache(store)
+    cache.load_week(MONDAY // 7 + 6)
+    store.enqueue(INSERT_EVENT, (1, "2026-11-30", "Queued", "", "09:00", "10:00", "#4dabf7"))
+    cache.evict_far(MONDAY, 1)
+    assert cache.loaded_weeks == {MONDAY // 7 + 6}
+    store.flush()
+    cache.evict_far(MONDAY, 1)
+    assert not cache.loaded_weeks
@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from ChangeBus import Change, EVENT, INSERT, RELOAD, COMMIT
+from EventStore import EventStore, SCHEMA_VERSION, to_iso_date
+
+
+def make_legacy_db(path, statement, rows):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(statement)
+        table = statement.split()[2]
+        marks = ", ".join("?" * len(rows[0]))
+        conn.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+    conn.close()
+
+
+@pytest.fixture
+def misc(tmp_path, monkeypatch):
+    # LEGACY_DBS are relative to the working directory, as in the installed app
+    monkeypatch.chdir(tmp_path)
+    misc = tmp_path / "resources" / "misc"
+    misc.mkdir(parents=True)
+    return misc
+
+
+def test_legacy_databases_are_copied_once(misc):
+    make_legacy_db(misc / "todos.db",
+                   "CREATE TABLE todos (id INTEGER PRIMARY KEY, date TEXT, time TEXT, description TEXT, status TEXT)",
+                   [(1, "2026-10-19", "09:00", "Dentist appointment", "Pending")])
+    make_legacy_db(misc / "events.db",
+                   "CREATE TABLE events (id INTEGER PRIMARY KEY, date TEXT, title TEXT, place TEXT, "
+                   "start TEXT, end TEXT, color TEXT)",
+                   [(7, "2026-10-20", "Review", "Room 2", "14:00", "15:00", "#0078d4")])
+
+    path = str(misc / "tempopilot.db")
+    store = EventStore(path)
+    try:
+        conn = store.connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert store.todos_for_date("2026-10-19") == [(1, "09:00", "Dentist appointment", "Pending")]
+        assert store.events_between("2026-10-20", "2026-10-20")[0][:3] == (7, "2026-10-20", "Review")
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"todos", "reminders", "special_dates", "events", "recurring_events"} <= tables
+    finally:
+        store.close()
+
+    # the legacy files are still there, but only a new database imports them
+    store = EventStore(path)
+    try:
+        assert len(store.todos_for_date("2026-10-19")) == 1
+    finally:
+        store.close()
+
+
+def test_reopening_runs_no_migration_twice(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "tempopilot.db")
+    store = EventStore(path)
+    store.add_todo("2026-10-19", "09:00", "Dentist", "Pending")
+    store.close()
+
+    store = EventStore(path)
+    try:
+        assert store.count_todos("2026-10-19") == 1
+        assert store.connection().execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    finally:
+        store.close()
+
+
+def test_qdate_text_dates_are_migrated_to_iso(misc):
+    make_legacy_db(misc / "todos.db",
+                   "CREATE TABLE todos (id INTEGER PRIMARY KEY, date TEXT, time TEXT, description TEXT, status TEXT)",
+                   [(1, "Mon Oct 19 2026", "09:00", "Dentist", "Pending"),
+                    (2, "not a date", "10:00", "Left alone", "Pending")])
+    make_legacy_db(misc / "reminders.db",
+                   "CREATE TABLE reminders (id INTEGER PRIMARY KEY, date TEXT, time TEXT, description TEXT)",
+                   [(1, "Tue Oct 20 2026", "08:00", "Call back")])
+
+    store = EventStore(str(misc / "tempopilot.db"))
+    try:
+        conn = store.connection()
+        assert conn.execute("SELECT id, date FROM todos ORDER BY id").fetchall() == \
+            [(1, "2026-10-19"), (2, "not a date")]
+        assert store.reminders_for_date("2026-10-20")[0][1:] == ("08:00", "Call back")
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_todos_date", "idx_reminders_date", "idx_events_date"} <= indexes
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2026-10-19", "2026-10-19"),
+    ("Mon Oct 19 2026", "2026-10-19"),
+    ("  Sat Feb 1 2025 ", "2025-02-01"),
+    ("Mon Feb 30 2026", None),
+    ("", None),
+    (None, None),
+])
+def test_to_iso_date(text, expected):
+    assert to_iso_date(text) == expected
+
+
+def test_queued_writes_survive_a_crash(store):
+    store.enqueue('INSERT OR REPLACE INTO events (id, date, title, place, start, end, color) '
+                  'VALUES (?, ?, ?, ?, ?, ?, ?)', (1, "2026-10-19", "Standup", "", "09:00", "09:30", "#0078d4"))
+    # a new store on the same file replays the journal the first one left behind
+    replayed = EventStore(store.path)
+    try:
+        assert [row[2] for row in replayed.events_between("2026-10-19", "2026-10-19")] == ["Standup"]
+    finally:
+        replayed.close()
+
+
+def test_failing_write_is_dropped_alone(store):
+    seen = []
+    store.changes.subscribe(seen.append, {EVENT})
+    insert = 'INSERT INTO events (id, date, title, place, start, end, color) VALUES (?, ?, ?, ?, ?, ?, ?)'
+    store.enqueue(insert, (1, "2026-10-19", "Standup", "", "09:00", "09:30", "#0078d4"),
+                  Change(EVENT, "2026-10-19", 1, INSERT))
+    # same primary key: IntegrityError
+    store.enqueue(insert, (1, "2026-10-20", "Clash", "", "10:00", "10:30", "#0078d4"),
+                  Change(EVENT, "2026-10-20", 1, INSERT))
+    store.enqueue(insert, (2, "2026-10-21", "Review", "", "11:00", "12:00", "#0078d4"),
+                  Change(EVENT, "2026-10-21", 2, INSERT))
+
+    assert store.flush()
+    assert not store.has_pending()
+    assert [row[2] for row in store.events_between("2026-10-19", "2026-10-21")] == ["Standup", "Review"]
+    assert Change(EVENT, "2026-10-20", 1, RELOAD) in seen
+    assert [c.date for c in seen if c.op == COMMIT] == ["2026-10-19", "2026-10-21"]
+    with open(store.journal_path + ".failed", encoding="utf-8") as quarantine:
+        (line,) = quarantine.read().splitlines()
+    assert "Clash" in line
+    # the next flush has nothing left to replay
+    assert store.flush()
+
+
+def test_replay_skips_unreadable_journal_lines(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "tempopilot.db")
+    EventStore(path).close()
+    insert = 'INSERT OR REPLACE INTO events (id, date, title, place, start, end, color) VALUES (?, ?, ?, ?, ?, ?, ?)'
+    with open(path + ".pending", "w", encoding="utf-8") as journal:
+        journal.write(json.dumps([insert, [1, "2026-10-19", "Standup", "", "09:00", "09:30", "#0078d4"]]) + "\n")
+        journal.write('["INSERT INTO events (id, date) VAL\n')
+        journal.write("42\n")
+        journal.write(json.dumps([insert, [2, "2026-10-19", "Review", "", "11:00", "12:00", "#0078d4"]]) + "\n")
+        journal.write(json.dumps(["INSERT INTO no_such_table VALUES (?)", [1]]) + "\n")
+
+    store = EventStore(path)
+    try:
+        assert [row[2] for row in store.events_between("2026-10-19", "2026-10-19")] == ["Standup", "Review"]
+        assert not os.path.exists(path + ".pending")
+        assert os.path.exists(path + ".pending.failed")
+    finally:
+        store.close()
@@ -0,0 +1,56 @@
+import csv
+
+from Export import export
+from ICSImport import import_ics, iter_vevents
+
+
+def add_weekly_sync(store):
+    series_id = store.add_recurring_event("2026-10-19", "Weekly sync", "Room 2", "10:00", "11:00",
+                                          "#0078d4", "FREQ=WEEKLY;BYDAY=MO;COUNT=4")
+    store.add_recurrence_exception(series_id, "2026-10-26")
+    return series_id
+
+
+def test_series_is_one_vevent_with_rrule_and_exdate(store, tmp_path):
+    series_id = add_weekly_sync(store)
+    path = tmp_path / "out.ics"
+    counts = export(str(path), store=store)
+    assert counts == {"events": 0, "recurring_events": 1, "todos": 0, "reminders": 0}
+
+    with open(path, encoding="utf-8", newline="") as f:
+        (event,) = list(iter_vevents(f))
+    assert event["UID"][1] == f"tempopilot-series-{series_id}"
+    assert event["DTSTART"][1] == "20261019T100000"
+    assert event["RRULE"][1] == "FREQ=WEEKLY;BYDAY=MO;COUNT=4"
+    assert event["EXDATE"] == [({}, "20261026T100000")]
+
+
+def test_series_round_trips_through_import(store, tmp_path):
+    add_weekly_sync(store)
+    path = tmp_path / "out.ics"
+    export(str(path), tables=("recurring_events",), store=store)
+    store.delete_recurring_event(store.recurring_events()[0][0])
+
+    assert import_ics(str(path), store=store)["series"] == 1
+    (series,) = store.recurring_events()
+    assert series[1:] == ("2026-10-19", "Weekly sync", "Room 2", "10:00", "11:00", "#0078d4",
+                          "FREQ=WEEKLY;BYDAY=MO;COUNT=4")
+    assert store.recurrence_exceptions() == [(series[0], "2026-10-26")]
+
+
+def test_series_range_keeps_series_started_earlier(store, tmp_path):
+    add_weekly_sync(store)   # last occurrence 2026-11-09
+    path = tmp_path / "out.csv"
+    assert export(str(path), start="2026-11-01", store=store)["recurring_events"] == 1
+    assert export(str(path), start="2026-11-10", store=store)["recurring_events"] == 0
+
+
+def test_series_csv_row(store, tmp_path):
+    series_id = add_weekly_sync(store)
+    path = tmp_path / "out.csv"
+    export(str(path), store=store)
+    with open(path, encoding="utf-8", newline="") as f:
+        (row,) = list(csv.DictReader(f))
+    assert row["type"] == "series" and row["id"] == str(series_id)
+    assert row["rrule"] == "FREQ=WEEKLY;BYDAY=MO;COUNT=4"
+    assert row["exdates"] == "2026-10-26"
@@ -0,0 +1,50 @@
+import pytest
+
+from FreeSlots import find_free_slots
+from Recurrence import SeriesCache
+
+MONDAY = "2026-10-19"
+
+
+def add_event(store, date, start, end, title="Busy"):
+    event_id = store.allocate_event_id()
+    store.enqueue('INSERT OR REPLACE INTO events (id, date, title, place, start, end, color) '
+                  'VALUES (?, ?, ?, ?, ?, ?, ?)', (event_id, date, title, "", start, end, "#0078d4"))
+
+
+def test_empty_day_is_one_work_hours_slot(store):
+    assert find_free_slots(store, MONDAY, MONDAY, 30) == [(MONDAY, 9 * 60, 18 * 60)]
+
+
+def test_buffer_is_kept_around_events(store):
+    add_event(store, MONDAY, "10:00", "11:00")
+    slots = find_free_slots(store, MONDAY, MONDAY, 30, buffer=15)
+    assert slots == [(MONDAY, 9 * 60, 9 * 60 + 45), (MONDAY, 11 * 60 + 15, 18 * 60)]
+
+
+def test_gap_shorter_than_the_buffers_is_not_offered(store):
+    add_event(store, MONDAY, "10:00", "11:00")
+    add_event(store, MONDAY, "11:40", "12:00")
+    slots = find_free_slots(store, MONDAY, MONDAY, 30, buffer=10)
+    assert (MONDAY, 11 * 60 + 10, 11 * 60 + 30) not in slots
+    assert [s[1] for s in slots] == [9 * 60, 12 * 60 + 10]
+
+
+def test_excluded_weekdays_are_skipped(store):
+    # Monday 19th to Sunday 25th, weekends and Wednesday excluded
+    slots = find_free_slots(store, MONDAY, "2026-10-25", 60, excluded_weekdays=(3, 6, 7))
+    assert [date for date, _, _ in slots] == ["2026-10-19", "2026-10-20", "2026-10-22", "2026-10-23"]
+
+
+def test_series_occurrences_count_as_busy(store):
+    store.add_recurring_event(MONDAY, "Standup", "", "09:00", "09:30", "#0078d4", "FREQ=DAILY")
+    slots = find_free_slots(store, MONDAY, "2026-10-20", 30, buffer=5, series=SeriesCache(store))
+    assert slots == [(MONDAY, 9 * 60 + 35, 18 * 60), ("2026-10-20", 9 * 60 + 35, 18 * 60)]
+
+
+def test_not_before_and_ranking(store):
+    add_event(store, MONDAY, "12:00", "13:00")
+    slots = find_free_slots(store, MONDAY, MONDAY, 30, not_before=10 * 60, rank="roomiest")
+    assert slots == [(MONDAY, 13 * 60, 18 * 60), (MONDAY, 10 * 60, 12 * 60)]
+    with pytest.raises(ValueError):
+        find_free_slots(store, MONDAY, MONDAY, 30, rank="latest")
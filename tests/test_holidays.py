@@ -0,0 +1,79 @@
+import time
+
+import pytest
+import requests
+
+import Holidays
+from Holidays import HolidayCache, HolidaysUnavailable
+
+YEAR_2026 = [("2026-12-25", "Christmas Day", "Christmas Day is a public holiday"),
+             ("2026-12-26", "Boxing Day", "")]
+
+
+class FakeCalendarific:
+    """ stands in for Holidays.fetch_year: records (country, year) and answers with .reply """
+
+    def __init__(self):
+        self.calls = []
+        self.reply = YEAR_2026
+
+    def __call__(self, api_key, country, year, client=None):
+        self.calls.append((country, year))
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    fake = FakeCalendarific()
+    monkeypatch.setattr(Holidays, "fetch_year", fake)
+    return fake
+
+
+def test_year_is_fetched_once(store, fetches):
+    cache = HolidayCache("key", "GB", store=store)
+    assert cache.holidays_on("2026-12-25") == [
+        {"name": "Christmas Day", "description": "Christmas Day is a public holiday"}]
+    assert cache.holidays_on("2026-12-26")[0]["name"] == "Boxing Day"
+    assert cache.holidays_on("2026-07-01") == []
+    assert fetches.calls == [("GB", 2026)]
+
+
+def test_failed_fetch_is_not_an_empty_day(store, fetches):
+    fetches.reply = requests.HTTPError("401 Client Error: Unauthorized")
+    cache = HolidayCache("bad key", "GB", store=store)
+    with pytest.raises(HolidaysUnavailable):
+        cache.holidays_on("2026-12-25")
+    # not asked again straight away, and still not mistaken for "no holidays"
+    with pytest.raises(HolidaysUnavailable):
+        cache.holidays_on("2026-12-26")
+    assert fetches.calls == [("GB", 2026)]
+
+    fetches.reply = YEAR_2026
+    cache.configure("good key", "GB")
+    assert cache.holidays_on("2026-12-25")[0]["name"] == "Christmas Day"
+
+
+def test_stale_year_is_served_and_refreshed_later(store, fetches, monkeypatch):
+    store.replace_holiday_year("GB", 2026, YEAR_2026, time.time() - 3600)
+    cache = HolidayCache("key", "GB", store=store, ttl=60)
+    refreshed = []
+    monkeypatch.setattr(cache, "refresh_in_background", refreshed.append)
+    fetches.reply = requests.ConnectionError("offline")
+    assert cache.holidays_on("2026-12-25")[0]["name"] == "Christmas Day"
+    assert refreshed == [2026] and fetches.calls == []
+
+
+def test_failed_refresh_keeps_the_cached_year(store, fetches):
+    store.replace_holiday_year("GB", 2026, YEAR_2026, 0)
+    cache = HolidayCache("key", "GB", store=store)
+    fetches.reply = ValueError("unexpected Calendarific response")
+    assert not cache.refresh(2026)
+    assert len(store.holidays_on("GB", "2026-12-25")) == 1
+
+
+def test_without_key_or_country_nothing_is_fetched(store, fetches):
+    assert HolidayCache("", "GB", store=store).holidays_on("2026-12-25") == []
+    assert HolidayCache("key", "", store=store).holidays_on("2026-12-25") == []
+    assert fetches.calls == []
@@ -0,0 +1,118 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import Http
+
+ETAG = '"v1"'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """ /page answers 200 with an ETag, or 304 when revalidated; /down always answers 503 """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.hits += 1
+        if self.path.startswith("/down"):
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", "5")
+            self.end_headers()
+            self.wfile.write(b"hello")
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    srv.hits = 0
+    thread = threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # no transport retries, so every 503 counts as one failure
+    monkeypatch.setattr(Http, "RETRIES", Http.Retry(total=0))
+    client = Http.HttpClient(policies={"127.0.0.1": Http.HostPolicy(failure_threshold=2, reset_after=0.2)})
+    yield client
+    client.close()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_port}{path}"
+
+
+def test_revalidation_returns_cached_body(server, client):
+    first = client.get(url(server, "/page"))
+    assert (first.status_code, first.text, first.from_cache) == (200, "hello", False)
+    second = client.get(url(server, "/page"))
+    assert (second.status_code, second.text, second.from_cache) == (200, "hello", True)
+    assert server.hits == 2
+    assert client.metrics()["127.0.0.1"]["not_modified"] == 1
+
+
+def test_circuit_opens_then_recovers(server, client):
+    for _ in range(2):
+        assert client.get(url(server, "/down")).status_code == 503
+    hits = server.hits
+    with pytest.raises(Http.CircuitOpenError):
+        client.get(url(server, "/page"))
+    assert server.hits == hits     # rejected without touching the network
+
+    time.sleep(0.25)
+    assert client.get(url(server, "/page")).text == "hello"
+    stats = client.metrics()["127.0.0.1"]
+    assert stats["circuit"] == "closed"
+    assert (stats["requests"], stats["errors"], stats["rejected"], stats["last_status"]) == (3, 2, 1, 200)
+    assert stats["latency_max"] >= stats["latency_avg"] > 0
+
+
+def test_failed_trial_reopens_the_circuit(server, client):
+    for _ in range(2):
+        client.get(url(server, "/down"))
+    time.sleep(0.25)
+    assert client.get(url(server, "/down")).status_code == 503
+    with pytest.raises(Http.CircuitOpenError):
+        client.get(url(server, "/page"))
+    assert client.metrics()["127.0.0.1"]["circuit"] == "open"
+
+
+def test_trial_is_released_when_send_raises(server, client, monkeypatch):
+    for _ in range(2):
+        client.get(url(server, "/down"))
+    time.sleep(0.25)
+
+    def broken_send(*args, **kwargs):
+        raise RuntimeError("not a RequestException")
+    real_send = client.session.send
+    monkeypatch.setattr(client.session, "send", broken_send)
+    with pytest.raises(RuntimeError):
+        client.get(url(server, "/page"))
+
+    # the next caller gets the trial instead of CircuitOpenError forever
+    monkeypatch.setattr(client.session, "send", real_send)
+    assert client.get(url(server, "/page")).text == "hello"
+    assert client.metrics()["127.0.0.1"]["circuit"] == "closed"
+
+
+def test_worst_case_covers_every_try_and_backoff():
+    # calendarific: 3 tries of (3.05 + 5) s, plus the backoff in between
+    worst = Http.worst_case_seconds("calendarific.com")
+    assert worst >= 3 * 8.05 + 0.5 + 1
+    assert Http.worst_case_seconds("calendarific.com", Http.Retry(total=0)) == pytest.approx(8.05)
+    connect, read = Http.DEFAULT_POLICY.timeout
+    assert Http.worst_case_seconds("example.org", Http.Retry(total=0)) == pytest.approx(connect + read)
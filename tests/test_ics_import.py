@@ -0,0 +1,118 @@
+from ChangeBus import SERIES, RELOAD
+from ICSImport import import_ics
+
+CALENDAR = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:standup@example.com
+DTSTART:20261019T090000
+DTEND:20261019T093000
+SUMMARY:Standup
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:20261020T140000
+DTEND:20261020T150000
+SUMMARY:Review
+LOCATION:Room 2
+END:VEVENT
+END:VCALENDAR
+"""
+
+RECURRING = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:sync@example.com
+RECURRENCE-ID:20261102T100000
+DTSTART:20261103T100000
+DTEND:20261103T110000
+SUMMARY:Weekly sync (moved)
+END:VEVENT
+BEGIN:VEVENT
+UID:sync@example.com
+DTSTART:20261019T100000
+DTEND:20261019T110000
+RRULE:FREQ=WEEKLY;BYDAY=MO;COUNT=4
+EXDATE:20261026T100000
+SUMMARY:Weekly sync
+END:VEVENT
+BEGIN:VEVENT
+UID:first-monday@example.com
+DTSTART:20261102T080000
+DTEND:20261102T083000
+RRULE:FREQ=MONTHLY;BYDAY=1MO
+SUMMARY:Planning
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def write_ics(tmp_path, text=CALENDAR):
+    path = tmp_path / "calendar.ics"
+    path.write_text(text.replace("\n", "\r\n"), encoding="utf-8")
+    return str(path)
+
+
+def event_count(store):
+    return store.connection().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+
+def test_import_counts_rows_not_trigger_writes(store, tmp_path):
+    # the search index and daily summary triggers must not inflate the counts
+    stats = import_ics(write_ics(tmp_path), store=store)
+    assert stats == {"events": 2, "inserted": 2, "series": 0, "duplicates": 0, "invalid": 0, "unsupported_rrule": 0}
+    assert event_count(store) == 2
+
+
+def test_reimport_skips_everything(store, tmp_path):
+    path = write_ics(tmp_path)
+    import_ics(path, store=store)
+    stats = import_ics(path, store=store)
+    assert stats == {"events": 2, "inserted": 0, "series": 0, "duplicates": 2, "invalid": 0, "unsupported_rrule": 0}
+    assert event_count(store) == 2
+    assert store.day_summary("2026-10-19")["events"] == 1
+
+
+def test_small_batches_count_the_same(store, tmp_path):
+    path = write_ics(tmp_path)
+    assert import_ics(path, store=store, batch_size=1)["inserted"] == 2
+    assert import_ics(path, store=store, batch_size=1)["duplicates"] == 2
+
+
+def test_rrule_is_stored_as_one_series(store, tmp_path):
+    seen = []
+    store.changes.subscribe(seen.append, {SERIES})
+    stats = import_ics(write_ics(tmp_path, RECURRING), store=store)
+    assert stats == {"events": 3, "inserted": 2, "series": 1, "duplicates": 0, "invalid": 0,
+                     "unsupported_rrule": 1}
+
+    (series,) = store.recurring_events()
+    assert series[1:] == ("2026-10-19", "Weekly sync", "", "10:00", "11:00", "#0078d4",
+                          "FREQ=WEEKLY;BYDAY=MO;COUNT=4")
+    # the EXDATE and the occurrence replaced through RECURRENCE-ID
+    assert sorted(store.recurrence_exceptions()) == [(series[0], "2026-10-26"), (series[0], "2026-11-02")]
+    assert [(c.kind, c.op) for c in seen] == [(SERIES, RELOAD)]
+
+
+def test_unsupported_rule_keeps_first_occurrence(store, tmp_path):
+    # Recurrence.Rule ignores BYDAY on monthly rules, so this one is not stored as a series
+    stats = import_ics(write_ics(tmp_path, RECURRING), store=store)
+    assert stats["unsupported_rrule"] == 1
+    titles = [row[0] for row in store.connection().execute("SELECT title FROM events ORDER BY date")]
+    assert titles == ["Planning", "Weekly sync (moved)"]
+
+
+def test_reimported_series_is_a_duplicate(store, tmp_path):
+    path = write_ics(tmp_path, RECURRING)
+    import_ics(path, store=store)
+    stats = import_ics(path, store=store)
+    assert stats["series"] == 0 and stats["duplicates"] == 3
+    assert len(store.recurring_events()) == 1
+
+
+def test_unsupported_rules_are_counted(store, tmp_path):
+    text = CALENDAR.replace("SUMMARY:Standup", "SUMMARY:Standup\nRRULE:FREQ=MONTHLY;BYDAY=2TU") \
+                   .replace("SUMMARY:Review", "SUMMARY:Review\nRRULE:FREQ=MONTHLY;BYMONTHDAY=20;BYSETPOS=1")
+    stats = import_ics(write_ics(tmp_path, text), store=store)
+    assert stats == {"events": 2, "inserted": 2, "series": 0, "duplicates": 0, "invalid": 0, "unsupported_rrule": 2}
+    # a re-import still says the rules were not followed
+    assert import_ics(write_ics(tmp_path, text), store=store)["unsupported_rrule"] == 2
@@ -0,0 +1,63 @@
+import pytest
+
+from EventCache import iso_to_day, day_to_iso
+from Recurrence import Rule, Series, SeriesCache, occurrence_id, split_occurrence_id, is_occurrence
+
+MONDAY = iso_to_day("2026-10-19")
+
+
+def occurrence_dates(series, first, days):
+    return [day_to_iso(day) for day in range(first, first + days) if series.occurs_on(day)]
+
+
+def make_series(rrule, exceptions=()):
+    return Series(1, MONDAY, "Sync", "", 10 * 60, 11 * 60, 0x0078D4, rrule, exceptions)
+
+
+def test_weekly_byday_with_interval():
+    series = make_series("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH")
+    assert occurrence_dates(series, MONDAY, 21) == ["2026-10-19", "2026-10-22", "2026-11-02", "2026-11-05"]
+
+
+def test_monthly_bymonthday_and_yearly():
+    monthly = make_series("FREQ=MONTHLY;BYMONTHDAY=1,19")
+    assert occurrence_dates(monthly, MONDAY, 40) == ["2026-10-19", "2026-11-01", "2026-11-19"]
+    yearly = make_series("FREQ=YEARLY")
+    assert occurrence_dates(yearly, MONDAY, 800) == ["2026-10-19", "2027-10-19", "2028-10-19"]
+
+
+def test_count_and_until_end_the_series():
+    assert day_to_iso(Rule("FREQ=DAILY;COUNT=3").last_day(MONDAY)) == "2026-10-21"
+    assert day_to_iso(Rule("FREQ=WEEKLY;UNTIL=20261102T235959Z").last_day(MONDAY)) == "2026-11-02"
+    assert Rule("FREQ=DAILY").last_day(MONDAY) is None
+    assert occurrence_dates(make_series("FREQ=DAILY;COUNT=3"), MONDAY, 10) == \
+        ["2026-10-19", "2026-10-20", "2026-10-21"]
+
+
+def test_exceptions_are_skipped():
+    series = make_series("FREQ=DAILY;COUNT=3", exceptions={MONDAY + 1})
+    assert occurrence_dates(series, MONDAY, 5) == ["2026-10-19", "2026-10-21"]
+
+
+def test_unsupported_rules_and_times_are_rejected():
+    with pytest.raises(ValueError):
+        Rule("FREQ=HOURLY")
+    with pytest.raises(ValueError):
+        Series(1, MONDAY, "Sync", "", 10 * 60, 25 * 60, 0, "FREQ=DAILY")
+
+
+def test_occurrence_ids_pack_series_and_day():
+    event_id = occurrence_id(42, MONDAY)
+    assert is_occurrence(event_id)
+    assert split_occurrence_id(event_id) == (42, MONDAY)
+
+
+def test_series_cache_expands_from_the_store(store):
+    series_id = store.add_recurring_event("2026-10-19", "Sync", "", "10:00", "11:00", "#0078d4",
+                                          "FREQ=WEEKLY;COUNT=2")
+    store.add_recurrence_exception(series_id, "2026-10-26")
+    cache = SeriesCache(store)
+    (record,) = cache.day_occurrences(MONDAY).values()
+    assert (record.id, record.start, record.end) == (occurrence_id(series_id, MONDAY), 600, 660)
+    assert cache.day_occurrences(MONDAY + 7) == {}
+    assert cache.day_occurrences(MONDAY + 14) == {}
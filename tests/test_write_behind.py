@@ -0,0 +1,36 @@
+from ChangeBus import Change, EVENT, INSERT, COMMIT
+
+INSERT_EVENT = 'INSERT OR REPLACE INTO events (id, date, title, place, start, end, color) VALUES (?, ?, ?, ?, ?, ?, ?)'
+
+
+def queue_event(store, date, title="Standup"):
+    event_id = store.allocate_event_id()
+    store.enqueue(INSERT_EVENT, (event_id, date, title, "", "09:00", "09:30", "#0078d4"),
+                  Change(EVENT, date, event_id, INSERT))
+    return event_id
+
+
+def test_summary_reads_leave_the_queue_alone(store):
+    queue_event(store, "2026-10-19")
+    assert store.day_summary("2026-10-19")["events"] == 0
+    assert store.has_pending()
+    assert store.day_summary("2026-10-19", flush=True)["events"] == 1
+    assert not store.has_pending()
+
+
+def test_flush_publishes_one_commit_per_date(store):
+    seen = []
+    store.changes.subscribe(seen.append, {EVENT})
+    queue_event(store, "2026-10-19")
+    queue_event(store, "2026-10-19", "Review")
+    queue_event(store, "2026-10-20")
+    assert [change.op for change in seen] == [INSERT] * 3
+
+    assert store.flush()
+    commits = [change for change in seen if change.op == COMMIT]
+    assert [(c.kind, c.date) for c in commits] == [(EVENT, "2026-10-19"), (EVENT, "2026-10-20")]
+    # the summary read by a COMMIT subscriber already includes the write
+    assert store.day_summary("2026-10-19")["events"] == 2
+
+    assert store.flush()
+    assert len([change for change in seen if change.op == COMMIT]) == 2